@@ -0,0 +1,68 @@
+"""
+Throughput of load_records compared to the previous line by line reader
+
+Usage: PYTHONPATH=. python benchmarks/load_records.py [rows]
+"""
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+from turkle_client import readers
+
+
+def previous_load_records(file_path):
+    # the reader before mmap and orjson
+    ext = os.path.splitext(file_path)[1].lower()
+    with open(file_path, 'r', encoding='utf-8') as fh:
+        if ext == '.jsonl':
+            for lineno, line in enumerate(fh, start=1):
+                if not line.strip():
+                    continue
+                yield json.loads(line)
+        else:
+            yield from csv.DictReader(fh)
+
+
+def make_files(directory, rows):
+    fields = ['username', 'password', 'first_name', 'last_name', 'email', 'is_active']
+    jsonl_path = os.path.join(directory, 'users.jsonl')
+    csv_path = os.path.join(directory, 'users.csv')
+    with open(jsonl_path, 'w') as jsonl_fh, open(csv_path, 'w', newline='') as csv_fh:
+        writer = csv.writer(csv_fh)
+        writer.writerow(fields)
+        for i in range(rows):
+            row = [f"user{i}", 'p@ssw0rd', 'George', 'Smith', f"user{i}@example.org", 'true']
+            jsonl_fh.write(json.dumps(dict(zip(fields, row))) + '\n')
+            writer.writerow(row)
+    return jsonl_path, csv_path
+
+
+def timed(fn):
+    start = time.perf_counter()
+    count = sum(1 for _ in fn())
+    return count, time.perf_counter() - start
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print(f"json backend: {'orjson' if readers.orjson else 'json'}")
+    with tempfile.TemporaryDirectory() as directory:
+        jsonl_path, csv_path = make_files(directory, rows)
+        size = os.path.getsize(jsonl_path) / 1e6
+        cases = [
+            ('jsonl previous', lambda: previous_load_records(jsonl_path)),
+            ('jsonl mmap', lambda: readers.load_records(jsonl_path)),
+            ('csv previous', lambda: previous_load_records(csv_path)),
+            ('csv', lambda: readers.load_records(csv_path)),
+        ]
+        print(f"{rows} rows, {size:.0f} MB of jsonl")
+        for name, fn in cases:
+            count, seconds = timed(fn)
+            print(f"{name:20} {seconds:7.2f} s {count / seconds:12,.0f} records/s")
+
+
+if __name__ == '__main__':
+    main()
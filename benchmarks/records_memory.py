@@ -0,0 +1,76 @@
+"""
+Memory used by listed objects as dicts and as compact records
+
+Projects are measured with their templates stored as is and compressed, with
+the CPU time taken to convert the listed dicts to records.
+
+Usage: PYTHONPATH=. python benchmarks/records_memory.py [count]
+"""
+import functools
+import json
+import sys
+import time
+import tracemalloc
+
+from turkle_client.records import Batch, Project, User
+
+TEMPLATE = '<div><p>${text}</p><input type="text" name="answer"/></div>\n' * 40
+
+
+def make_objects(kind, count):
+    # decoded from json like the API responses so strings are not shared between objects
+    if kind == 'users':
+        objs = [{'id': i, 'username': f"user{i}", 'first_name': 'First', 'last_name': 'Last',
+                 'email': f"user{i}@example.org", 'is_active': True, 'is_staff': False,
+                 'is_superuser': False, 'date_joined': '2025-06-18T19:35:25.361141-04:00',
+                 'groups': [1, 2]} for i in range(count)]
+    elif kind == 'batches':
+        objs = [{'id': i, 'name': f"Batch {i}", 'created_at': '2025-06-18T19:37:29.868664-04:00',
+                 'created_by': 2, 'project': i % 100, 'filename': f"batch_{i}.csv",
+                 'allotted_assignment_time': 24, 'assignments_per_task': 1, 'login_required': True,
+                 'custom_permissions': False, 'active': True, 'completed': False, 'published': True}
+                for i in range(count)]
+    else:
+        objs = [{'id': i, 'name': f"Project {i}", 'created_at': '2025-06-18T19:37:29.868664-04:00',
+                 'created_by': 2, 'updated_at': '2025-06-18T19:37:29.868664-04:00', 'updated_by': 2,
+                 'active': True, 'allotted_assignment_time': 24, 'assignments_per_task': 1,
+                 'login_required': True, 'custom_permissions': False, 'filename': 'template.html',
+                 'html_template': TEMPLATE} for i in range(count)]
+    return json.dumps(objs)
+
+
+def measure(text, convert):
+    tracemalloc.start()
+    objs = json.loads(text)
+    if convert:
+        objs = [convert(obj) for obj in objs]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current
+
+
+def convert_seconds(text, convert):
+    objs = json.loads(text)
+    start = time.process_time()
+    for obj in objs:
+        convert(obj)
+    return time.process_time() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"{'type':20} {'dicts MB':>10} {'records MB':>12} {'ratio':>7} {'convert s':>10}")
+    kinds = [('users', User, False), ('batches', Batch, False), ('projects', Project, False),
+             ('projects compressed', Project, True)]
+    for kind, record_class, compact in kinds:
+        text = make_objects(kind.split()[0], count)
+        convert = functools.partial(record_class.from_json, compact=compact)
+        dicts = measure(text, None)
+        records = measure(text, convert)
+        seconds = convert_seconds(text, convert)
+        print(f"{kind:20} {dicts / 1e6:10.1f} {records / 1e6:12.1f} {dicts / records:7.2f} "
+              f"{seconds:10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Client-side cost of a workload replayed from recorded traffic
+
+The workload lists users, projects and batches and then reads the progress
+and results of each batch. Record it against a site once, or synthesize a
+recording of any size, and replay it offline to measure the time, CPU and
+memory used by the client itself.
+
+Usage:
+  PYTHONPATH=. python benchmarks/replay_workload.py record URL TOKEN traffic.jsonl.gz
+  PYTHONPATH=. python benchmarks/replay_workload.py synthesize traffic.jsonl.gz [batches] [rows]
+  PYTHONPATH=. python benchmarks/replay_workload.py replay traffic.jsonl.gz [latency_scale]
+"""
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+import tracemalloc
+
+from turkle_client.client import Client
+from turkle_client.parallel import bounded_map
+from turkle_client.replay import Recorder, Replay, encode_exchange
+
+SITE = 'http://turkle.example.org'
+PAGE_SIZE = 100
+
+
+def workload(client, workers=8):
+    users = client.users.list(records=True)
+    projects = client.projects.list(records=True)
+    batches = client.batches.list(records=True)
+    batch_ids = [batch.id for batch in batches]
+    progress = list(bounded_map(client.batches.progress, batch_ids, workers))
+    tables = bounded_map(client.batches.results_table, batch_ids, workers)
+    rows = sum(table.num_rows for table in tables)
+    return {'users': len(users), 'projects': len(projects), 'batches': len(batches),
+            'progress': len(progress), 'result rows': rows}
+
+
+def list_pages(path, objs):
+    url = f"{SITE}{path}"
+    for start in range(0, max(len(objs), 1), PAGE_SIZE):
+        number = start // PAGE_SIZE + 1
+        page_url = url if number == 1 else f"{url}?page={number}"
+        more = start + PAGE_SIZE < len(objs)
+        data = {'count': len(objs), 'next': f"{url}?page={number + 1}" if more else None,
+                'previous': None, 'results': objs[start:start + PAGE_SIZE]}
+        yield page_url, json.dumps(data).encode('utf-8')
+
+
+def results_csv(batch_id, rows):
+    fh = io.StringIO()
+    writer = csv.writer(fh)
+    writer.writerow(['HITId', 'WorkerId', 'WorkTimeInSeconds', 'SubmitTime', 'Input.text',
+                     'Answer.label'])
+    for i in range(rows):
+        writer.writerow([i, f"worker{i % 17}", 20 + i % 40, '2024-05-01T10:00:00Z',
+                         f"sentence {i} of batch {batch_id}", ['yes', 'no'][i % 2]])
+    return fh.getvalue().encode('utf-8')
+
+
+def synthesize(path, num_batches=500, rows=200):
+    """Write a recording of a site with num_batches batches of rows results each"""
+    users = [{'id': i, 'username': f"user{i}", 'first_name': 'George', 'last_name': 'Smith',
+              'email': f"user{i}@example.org", 'is_active': True, 'is_staff': False,
+              'is_superuser': False, 'date_joined': '2024-01-01T00:00:00Z', 'groups': [1]}
+             for i in range(1, 1001)]
+    projects = [{'id': i, 'name': f"Project {i}", 'html_template': '<p>${text}</p>' * 50,
+                 'active': True, 'login_required': True, 'custom_permissions': False}
+                for i in range(1, num_batches // 10 + 2)]
+    batches = [{'id': i, 'name': f"Batch {i}", 'project': i // 10 + 1, 'active': True,
+                'completed': False, 'created_at': '2024-05-01T10:00:00Z'}
+               for i in range(1, num_batches + 1)]
+    json_type = 'application/json'
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as fh:
+        def write(url, content, content_type=json_type, seconds=0.02):
+            fh.write(json.dumps(encode_exchange('GET', url, None, 200, content_type, seconds,
+                                                content), separators=(',', ':')) + '\n')
+        for path_, objs in [('/api/users/', users), ('/api/projects/', projects),
+                            ('/api/batches/', batches)]:
+            for url, content in list_pages(path_, objs):
+                write(url, content)
+                count += 1
+        for batch in batches:
+            progress = {'total_tasks': rows, 'total_task_assignments': rows,
+                        'total_finished_tasks': rows, 'total_finished_task_assignments': rows}
+            write(f"{SITE}/api/batches/{batch['id']}/progress/", json.dumps(progress).encode())
+            write(f"{SITE}/api/batches/{batch['id']}/results/", results_csv(batch['id'], rows),
+                  'text/csv', 0.1)
+            count += 2
+    return count
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__)
+        return
+    mode = sys.argv[1]
+    if mode == 'record':
+        url, token, path = sys.argv[2:5]
+        with Recorder(path) as recorder:
+            counts = workload(Client(url, token, transport=recorder.transport))
+        print(f"{recorder.count} exchanges recorded to {path}: {counts}")
+    elif mode == 'synthesize':
+        path = sys.argv[2]
+        num_batches = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+        rows = int(sys.argv[4]) if len(sys.argv) > 4 else 200
+        print(f"{synthesize(path, num_batches, rows)} exchanges written to {path}")
+    elif mode == 'replay':
+        path = sys.argv[2]
+        scale = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+        # the url only has to match the recording
+        with gzip.open(path, 'rt') as fh:
+            site = json.loads(fh.readline())['u'].split('/api/')[0]
+        replay = Replay(path, latency_scale=scale)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        counts = workload(Client(site, 'token', transport=replay.transport))
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        # memory is measured in a second run because tracing slows everything down
+        tracemalloc.start()
+        workload(Client(site, 'token', transport=Replay(path, latency_scale=0).transport))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{replay.count} exchanges, latency scale {scale}: {counts}")
+        print(f"wall {wall:.2f} s  cpu {cpu:.2f} s  peak traced memory {peak / 1e6:.1f} MB")
+    else:
+        print(__doc__)
+
+
+if __name__ == '__main__':
+    main()
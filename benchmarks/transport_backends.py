@@ -0,0 +1,130 @@
+"""
+Concurrent progress polls and page fetches over the requests and http2 transports
+
+A local stand-in for a Turkle site that speaks HTTP/1.1 and cleartext HTTP/2
+answers after a fixed latency. The site is plain http, so the http2 transport
+sends HTTP/1.1 with httpx and h2c sends HTTP/2. Each transport polls the progress of every
+batch from a pool of threads and then walks the batch list, and the run
+reports the time taken and how many connections the server saw.
+
+Requires hypercorn and turkle-client[http2].
+
+Usage:
+  PYTHONPATH=. python benchmarks/transport_backends.py [batches] [workers] [latency_ms]
+"""
+import asyncio
+import json
+import socket
+import sys
+import threading
+import time
+
+from turkle_client.client import Client
+from turkle_client.parallel import bounded_map
+
+try:
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+except ImportError:
+    sys.exit("This benchmark requires hypercorn (pip install hypercorn)")
+
+PAGE_SIZE = 100
+
+
+class StandIn:
+    """ASGI app serving batch lists and progress that records the connections it sees"""
+    def __init__(self, num_batches, latency):
+        self.num_batches = num_batches
+        self.latency = latency
+        self.connections = set()
+        self.versions = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        self.connections.add(tuple(scope['client']))
+        self.versions.add(scope['http_version'])
+        await asyncio.sleep(self.latency)
+        body = json.dumps(self.answer(scope)).encode('utf-8')
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/json'),
+                                (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    def answer(self, scope):
+        parts = scope['path'].strip('/').split('/')
+        if parts[-1] == 'progress':
+            return {'total_tasks': 100, 'total_finished_tasks': int(parts[-2]) % 100}
+        query = dict(item.split('=') for item in scope['query_string'].decode().split('&') if item)
+        page = int(query.get('page', 1))
+        start = (page - 1) * PAGE_SIZE
+        ids = range(start + 1, min(start + PAGE_SIZE, self.num_batches) + 1)
+        more = start + PAGE_SIZE < self.num_batches
+        url = f"{scope['scheme']}://{scope['server'][0]}:{scope['server'][1]}{scope['path']}"
+        return {'count': self.num_batches, 'next': f"{url}?page={page + 1}" if more else None,
+                'previous': None, 'results': [{'id': i, 'name': f"Batch {i}"} for i in ids]}
+
+
+def start_server(app):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.accesslog = None
+    shutdown = {}
+
+    async def run_server():
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        shutdown['set'] = lambda: loop.call_soon_threadsafe(event.set)
+        await serve(app, config, shutdown_trigger=event.wait)
+
+    thread = threading.Thread(target=asyncio.run, args=(run_server(),), daemon=True)
+    thread.start()
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+
+    def stop():
+        shutdown['set']()
+        thread.join(5)
+    return f"http://127.0.0.1:{port}", stop
+
+
+def run(url, app, transport, num_batches, workers):
+    app.connections.clear()
+    app.versions.clear()
+    client = Client(url, 'token', pool_size=workers, transport=transport)
+    start = time.perf_counter()
+    progress = list(bounded_map(client.batches.progress, range(1, num_batches + 1), workers))
+    polls = time.perf_counter() - start
+    batches = client.batches.list()
+    total = time.perf_counter() - start
+    assert len(progress) == len(batches) == num_batches
+    client.pool.session.close()
+    return polls, total, len(app.connections), ', '.join(sorted(app.versions))
+
+
+def main():
+    num_batches = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    latency = (float(sys.argv[3]) if len(sys.argv) > 3 else 20) / 1000
+    app = StandIn(num_batches, latency)
+    url, stop = start_server(app)
+    try:
+        print(f"{num_batches} progress polls from {workers} threads, "
+              f"{num_batches // PAGE_SIZE + 1} list pages, {latency * 1000:.0f} ms latency")
+        for transport in ['requests', 'http2', 'h2c']:
+            polls, total, connections, versions = run(url, app, transport, num_batches, workers)
+            print(f"{transport:>8}: polls {polls:.2f} s ({num_batches / polls:.0f}/s)  "
+                  f"total {total:.2f} s  connections {connections}  HTTP {versions}")
+    finally:
+        stop()
+
+
+if __name__ == '__main__':
+    main()
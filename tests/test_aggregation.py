@@ -0,0 +1,143 @@
+import csv
+import io
+import json
+import math
+from unittest.mock import MagicMock
+
+import pytest
+
+from turkle_client.table import ResultsTable
+
+np = pytest.importorskip('numpy')
+
+from turkle_client.aggregation import LabelAggregator  # noqa: E402
+
+RESULTS = """HITId,AssignmentId,Turkle.Username,Answer.label
+1,1,ann,cat
+1,2,bob,cat
+1,3,cy,dog
+2,4,ann,dog
+2,5,bob,dog
+2,6,cy,dog
+3,7,ann,cat
+3,8,bob,dog
+3,9,cy,
+"""
+
+
+def make_table(text=RESULTS):
+    return ResultsTable.from_rows(csv.reader(io.StringIO(text)))
+
+
+def test_add_table_and_labels():
+    aggregator = LabelAggregator('Answer.label')
+    assert aggregator.add_table(make_table()) == 8
+    labels = {row['task']: row for row in aggregator.labels()}
+    assert labels['1'] == {'task': '1', 'label': 'cat', 'votes': 2, 'total': 3, 'majority': True,
+                           'tie': False}
+    assert labels['2']['label'] == 'dog'
+    assert labels['3']['tie'] is True
+    assert labels['3']['majority'] is False
+
+def test_duplicate_assignments_are_skipped():
+    aggregator = LabelAggregator('Answer.label')
+    aggregator.add_table(make_table())
+    assert aggregator.add_table(make_table()) == 0
+    assert len(aggregator) == 8
+
+def test_blank_label_is_added_by_a_later_table():
+    aggregator = LabelAggregator('Answer.label')
+    aggregator.add_table(make_table())
+    assert aggregator.add_table(make_table(RESULTS.replace('3,9,cy,', '3,9,cy,cat'))) == 1
+    assert len(aggregator) == 9
+
+def test_add_rows_matches_add_table():
+    from_rows = LabelAggregator('Answer.label')
+    from_rows.add_rows(csv.DictReader(io.StringIO(RESULTS)))
+    from_table = LabelAggregator('Answer.label')
+    from_table.add_table(make_table())
+    assert from_rows.count_matrix().sum() == from_table.count_matrix().sum()
+    assert from_rows.fleiss_kappa() == pytest.approx(from_table.fleiss_kappa())
+
+def test_rows_and_typed_table_share_codes():
+    ratings = "HITId,AssignmentId,Turkle.Username,Answer.label\n1,1,ann,1\n1,2,bob,2\n2,3,ann,2\n"
+    aggregator = LabelAggregator('Answer.label')
+    aggregator.add_rows(csv.DictReader(io.StringIO(ratings)))
+    table = make_table(ratings.replace(',1,ann,1', ',7,ann,1').replace(',2,bob,2', ',8,bob,2')
+                       .replace(',3,ann,2', ',9,ann,2'))
+    assert table['Answer.label'].type == 'int'
+    aggregator.add_table(table)
+    assert aggregator.categories == ['1', '2']
+    assert aggregator.tasks == ['1', '2']
+    assert aggregator.workers == ['ann', 'bob']
+    assert len(aggregator) == 6
+
+def test_fleiss_kappa():
+    # example from Fleiss (1971) as used on Wikipedia: 10 subjects, 14 raters, 5 categories
+    table = [
+        [0, 0, 0, 0, 14], [0, 2, 6, 4, 2], [0, 0, 3, 5, 6], [0, 3, 9, 2, 0], [2, 2, 8, 1, 1],
+        [7, 7, 0, 0, 0], [3, 2, 6, 3, 0], [2, 5, 3, 2, 2], [6, 5, 2, 1, 0], [0, 2, 2, 3, 7],
+    ]
+    aggregator = LabelAggregator('label')
+    for task, counts in enumerate(table):
+        worker = 0
+        for label, count in enumerate(counts):
+            for _ in range(count):
+                aggregator.add(task, worker, label)
+                worker += 1
+    assert aggregator.fleiss_kappa() == pytest.approx(0.210, abs=1e-3)
+
+def test_krippendorff_alpha():
+    aggregator = LabelAggregator('label')
+    for task, labels in enumerate([['a', 'a'], ['b', 'b'], ['a', 'b'], ['b', 'b']]):
+        for worker, label in enumerate(labels):
+            aggregator.add(task, worker, label)
+    # 8 values: coincidences o_aa=2, o_bb=4, o_ab=o_ba=1, n_a=3, n_b=5
+    assert aggregator.krippendorff_alpha() == pytest.approx(1 - 7 * 2 / (8 * 8 - 9 - 25))
+
+def test_perfect_agreement():
+    aggregator = LabelAggregator('label')
+    for task, label in enumerate(['x', 'y', 'x']):
+        aggregator.add(task, 'a', label)
+        aggregator.add(task, 'b', label)
+    assert aggregator.cohen_kappa('a', 'b') == pytest.approx(1.0)
+    assert aggregator.krippendorff_alpha() == pytest.approx(1.0)
+    assert math.isnan(aggregator.cohen_kappa('a', 'nobody'))
+
+def test_pairwise_and_summary():
+    aggregator = LabelAggregator('Answer.label')
+    aggregator.add_table(make_table())
+    pairs = aggregator.pairwise_cohen_kappa(min_shared=3)
+    assert [(pair['worker_a'], pair['worker_b']) for pair in pairs] == [('ann', 'bob')]
+    summary = aggregator.summary()
+    assert summary['tasks'] == 3
+    assert summary['workers'] == 3
+    assert summary['assignments'] == 8
+
+def test_pairwise_matches_cohen_kappa():
+    rng = np.random.default_rng(3)
+    aggregator = LabelAggregator('label')
+    for task in range(40):
+        for worker in rng.choice(6, size=rng.integers(1, 5), replace=False):
+            aggregator.add(task, f'w{worker}', rng.choice(['a', 'b', 'c']))
+    aggregator.add(0, 'w0', 'b')  # a second label on a task counts once, like cohen_kappa
+    pairs = aggregator.pairwise_cohen_kappa()
+    assert len(pairs) == 15
+    for pair in pairs:
+        expected = aggregator.cohen_kappa(pair['worker_a'], pair['worker_b'])
+        assert pair['kappa'] == pytest.approx(expected, nan_ok=True)
+
+def test_summary_without_agreement_is_json():
+    aggregator = LabelAggregator('label')
+    aggregator.add(1, 'a', 'x')
+    summary = aggregator.summary()
+    assert summary['fleiss_kappa'] is None
+    assert summary['mean_cohen_kappa'] is None
+    assert json.loads(json.dumps(summary, allow_nan=False)) == summary
+
+def test_add_batch():
+    client = MagicMock()
+    client.batches.results_table.return_value = make_table()
+    aggregator = LabelAggregator('Answer.label')
+    assert aggregator.add_batch(client, 5) == 8
+    assert client.batches.results_table.call_args[1]['types']['Answer.label'] == 'category'
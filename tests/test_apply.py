@@ -0,0 +1,139 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from turkle_client.apply import Applier, diff_user, load_state, upsert_users
+from turkle_client.exceptions import TurkleClientException
+
+
+def make_client():
+    client = MagicMock()
+    client.users.list.return_value = [
+        {'id': 3, 'username': 'user1', 'first_name': 'Bob', 'email': '', 'is_active': True},
+        {'id': 4, 'username': 'user2', 'first_name': 'Sue', 'email': '', 'is_active': True},
+    ]
+    client.groups.list.return_value = [{'id': 2, 'name': 'Group1', 'users': [3]}]
+    client.projects.list.return_value = [{'id': 1, 'name': 'Translate'}]
+    client.batches.list.return_value = [{'id': 7, 'name': 'Dickens', 'project': 1}]
+    client.permissions.retrieve.side_effect = lambda kind, pid: {
+        ('project', 1): {'users': [3], 'groups': []},
+        ('batch', 7): {'users': [3, 4], 'groups': [2]},
+    }[(kind, pid)]
+    client.users.create.side_effect = lambda user: {'id': 9, **user}
+    client.groups.create.side_effect = lambda group: {'id': 5, **group}
+    return client
+
+
+STATE = {
+    'users': [
+        {'username': 'user1', 'first_name': 'Bob', 'password': 'ignored'},
+        {'username': 'user2', 'first_name': 'Susan', 'is_active': 'false'},
+        {'username': 'user5', 'password': 'secret'},
+    ],
+    'groups': [
+        {'name': 'Group1', 'users': ['user1', 'user5']},
+        {'name': 'New', 'users': [4, 'user5']},
+    ],
+    'permissions': [
+        {'project': 'Translate', 'users': ['user1'], 'groups': ['New']},
+        {'batch': 7, 'users': ['user1'], 'groups': ['Group1']},
+    ],
+}
+
+
+def test_diff_user():
+    current = {'id': 3, 'username': 'user1', 'first_name': 'Bob', 'is_active': True}
+    assert diff_user(current, {'username': 'user1', 'first_name': 'Bob', 'is_active': 'true'}) == {}
+    assert diff_user(current, {'first_name': 'Rob', 'password': 'x'}) == {'first_name': 'Rob'}
+
+def test_plan():
+    applier = Applier(make_client())
+    actions = applier.plan(STATE)
+    assert [action['description'] for action in actions] == [
+        'update user user2: first_name, is_active',
+        'create user user5',
+        'add 1 users to group Group1',
+        'create group New with 2 users',
+        'add permissions to project 1',
+        'replace permissions of batch 7',
+    ]
+    assert actions[0]['data'] == {'first_name': 'Susan', 'is_active': False}
+    assert actions[4]['data'] == {'users': [], 'groups': ['New']}
+
+def test_execute_resolves_new_ids():
+    client = make_client()
+    applier = Applier(client)
+    assert applier.execute(applier.plan(STATE)) == 6
+    client.users.update.assert_called_once_with({'id': 4, 'first_name': 'Susan', 'is_active': False})
+    client.groups.add_users.assert_called_once_with(2, [9])
+    client.groups.create.assert_called_once_with({'name': 'New', 'users': [4, 9]})
+    client.permissions.add.assert_called_once_with('project', 1, {'users': [], 'groups': [5]})
+    client.permissions.replace.assert_called_once_with('batch', 7, {'users': [3], 'groups': [2]})
+
+def test_execute_creates_users_without_read_only_fields():
+    client = make_client()
+    applier = Applier(client)
+    state = {'users': [{'username': 'user6', 'password': 'secret', 'date_joined': '2024-01-01',
+                        'groups': [2]}], 'groups': [], 'permissions': []}
+    assert applier.execute(applier.plan(state)) == 1
+    client.users.create.assert_called_once_with({'username': 'user6', 'password': 'secret'})
+
+def test_no_changes():
+    applier = Applier(make_client())
+    state = {'users': [{'username': 'user1', 'first_name': 'Bob'}], 'groups': [],
+             'permissions': [{'batch': 'Dickens', 'users': [3, 4], 'groups': ['Group1']}]}
+    assert applier.plan(state) == []
+
+def test_unknown_references():
+    applier = Applier(make_client())
+    with pytest.raises(TurkleClientException, match="New user user6 needs a password"):
+        applier.plan({'users': [{'username': 'user6'}], 'groups': [], 'permissions': []})
+    with pytest.raises(TurkleClientException, match="Unknown project: Missing"):
+        applier.plan({'users': [], 'groups': [], 'permissions': [{'project': 'Missing'}]})
+
+def test_extra_group_users_are_warnings():
+    applier = Applier(make_client())
+    applier.plan({'users': [], 'groups': [{'name': 'Group1', 'users': []}], 'permissions': []})
+    assert applier.warnings == ["Group Group1 has users that cannot be removed: ['user1']"]
+
+def test_load_state_jsonl(tmp_path):
+    path = tmp_path / 'state.jsonl'
+    path.write_text('\n'.join(json.dumps(obj) for obj in [
+        {'kind': 'user', 'username': 'a', 'password': 'b'},
+        {'kind': 'permissions', 'batch': 7, 'users': [], 'groups': []},
+    ]))
+    state = load_state(str(path))
+    assert state['users'] == [{'username': 'a', 'password': 'b'}]
+    assert state['groups'] == []
+    assert len(state['permissions']) == 1
+
+def test_load_state_yaml(tmp_path):
+    pytest.importorskip('yaml')
+    path = tmp_path / 'state.yaml'
+    path.write_text("users:\n  - {username: a, password: b}\ngroups:\n")
+    assert load_state(str(path)) == {'users': [{'username': 'a', 'password': 'b'}], 'groups': [],
+                                     'permissions': []}
+
+def test_upsert_users():
+    client = make_client()
+    records = [
+        {'username': 'user1', 'first_name': 'Bob', 'password': 'x'},
+        {'username': 'user2', 'email': 'sue@example.org'},
+        {'username': 'user5', 'password': 'secret', 'date_joined': '2024-01-01', 'groups': [1]},
+    ]
+    stats = upsert_users(client.users, records)
+    assert stats == {'created': 1, 'updated': 1, 'unchanged': 1}
+    client.users.update.assert_called_once_with({'id': 4, 'email': 'sue@example.org'})
+    client.users.create.assert_called_once_with({'username': 'user5', 'password': 'secret'})
+    client.users.list.assert_called_once()
+
+def test_upsert_users_errors():
+    client = make_client()
+    with pytest.raises(TurkleClientException, match="Duplicate username user1 on line 2"):
+        upsert_users(client.users, [{'username': 'user1'}, {'username': 'user1'}])
+    with pytest.raises(TurkleClientException, match="New user user7 on line 1 needs a password"):
+        upsert_users(client.users, [{'username': 'user7'}])
+    client.users.update.side_effect = TurkleClientException("email - bad")
+    with pytest.raises(TurkleClientException, match="Failure on line 1: email - bad"):
+        upsert_users(client.users, [{'username': 'user1', 'email': 'bad'}])
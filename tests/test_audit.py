@@ -0,0 +1,74 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from turkle_client.audit import AccessAudit
+from turkle_client.exceptions import TurkleClientException
+
+
+def make_client():
+    client = MagicMock()
+    client.users.list.return_value = [
+        {'id': 3, 'username': 'user1', 'is_active': True},
+        {'id': 4, 'username': 'user2', 'is_active': True},
+        {'id': 5, 'username': 'user3', 'is_active': True},
+        {'id': 6, 'username': 'retired', 'is_active': False},
+    ]
+    client.groups.list.return_value = [{'id': 2, 'name': 'Group1', 'users': [4, 6]}]
+    client.projects.list.return_value = [
+        {'id': 1, 'name': 'Open', 'login_required': False, 'custom_permissions': False},
+        {'id': 2, 'name': 'Restricted', 'login_required': True, 'custom_permissions': True},
+    ]
+    client.batches.list.return_value = [
+        {'id': 7, 'name': 'Public', 'project': 1, 'login_required': False, 'custom_permissions': False},
+        {'id': 8, 'name': 'Group only', 'project': 1, 'login_required': True, 'custom_permissions': True},
+        {'id': 9, 'name': 'Inherits', 'project': 2, 'login_required': True, 'custom_permissions': False},
+        {'id': 10, 'name': 'Both', 'project': 2, 'login_required': True, 'custom_permissions': True},
+    ]
+    client.permissions.retrieve.side_effect = lambda kind, obj_id: {
+        ('project', 2): {'users': [3, 4], 'groups': []},
+        ('batch', 8): {'users': [], 'groups': [2]},
+        ('batch', 10): {'users': [4, 5], 'groups': []},
+    }[(kind, obj_id)]
+    return client
+
+
+def test_build():
+    audit = AccessAudit(make_client())
+    stats = audit.build()
+    assert stats == {'users': 3, 'projects': 2, 'batches': 4, 'requests': 7}
+    assert audit.users_for_batch(7) == ['user1', 'user2', 'user3']
+    # groups are expanded and inactive users are skipped
+    assert audit.users_for_batch(8) == ['user2']
+    assert audit.users_for_batch(9) == ['user1', 'user2']
+    # batch access requires project access
+    assert audit.users_for_batch(10) == ['user2']
+    assert audit.users_for_project(2) == ['user1', 'user2']
+    assert audit.access_for_user('user1') == {'user': 'user1', 'projects': [1, 2], 'batches': [7, 9]}
+    assert audit.access_for_user(5) == {'user': 'user3', 'projects': [1], 'batches': [7]}
+    assert audit.anonymous_batches() == [7]
+
+def test_unknown_user():
+    audit = AccessAudit(make_client())
+    audit.build()
+    with pytest.raises(TurkleClientException, match="Unknown or inactive user: retired"):
+        audit.access_for_user('retired')
+
+def test_save_and_load(tmp_path):
+    audit = AccessAudit(make_client())
+    audit.build()
+    path = str(tmp_path / 'access.json')
+    audit.save(path)
+    loaded = AccessAudit.load(path)
+    assert loaded.users_for_batch(10) == ['user2']
+    assert loaded.access_for_user('user2') == audit.access_for_user('user2')
+    assert loaded.to_dict() == audit.to_dict()
+
+def test_to_dict_keeps_open_objects_separate():
+    audit = AccessAudit(make_client())
+    audit.build()
+    data = audit.to_dict()
+    assert data['open_projects'] == [1]
+    assert data['open_batches'] == [7]
+    assert data['by_user']['user1'] == {'projects': [2], 'batches': [9]}
+    assert data['by_user']['user3'] == {'projects': [], 'batches': []}
@@ -13,6 +13,7 @@ def test_goal_reached_triggers_callback():
         "total_finished_task_assignments": 4
     }
     mock_client.batches.progress.return_value = mock_progress
+    mock_client.batches.with_deadline.return_value = mock_client.batches
 
     goal_fn = lambda progress: progress['total_finished_tasks'] == progress['total_tasks']
     callback_fn = MagicMock()
@@ -37,6 +38,7 @@ def test_timeout_raises_error():
         "total_finished_task_assignments": 0
     }
     mock_client.batches.progress.return_value = mock_progress
+    mock_client.batches.with_deadline.return_value = mock_client.batches
 
     goal_fn = lambda progress: progress['total_finished_tasks'] == progress['total_tasks']
     callback_fn = MagicMock()
@@ -53,3 +55,21 @@ def test_timeout_raises_error():
         monitor.wait(timeout=0.5)
 
     callback_fn.assert_not_called()
+
+
+def test_progress_requests_end_by_timeout():
+    mock_client = MagicMock()
+    mock_client.batches.progress.return_value = {'total_tasks': 1, 'total_finished_tasks': 1}
+    mock_client.batches.with_deadline.return_value = mock_client.batches
+
+    monitor = BatchMonitor(
+        client=mock_client,
+        batch_id=1,
+        goal_fn=lambda progress: True,
+        callback_fn=MagicMock(),
+        interval=0.1
+    )
+
+    monitor.wait(timeout=5)
+    seconds = mock_client.batches.with_deadline.call_args[0][0]
+    assert 4 < seconds <= 5
@@ -1,3 +1,5 @@
+from unittest.mock import MagicMock, patch
+
 import pytest
 import vcr
 
@@ -31,3 +33,18 @@ def test_add_tasks():
     text = client.input(2)
     assert "car" in text
     assert "http://example.org" in text
+
+def test_iter_results_streams_across_chunks():
+    client = Batches(url, token)
+    response = MagicMock()
+    response.headers = {'Content-Type': 'text/csv'}
+    response.iter_content.return_value = [
+        b'"Input.text","Answer.label"\r\n"two\n', b'lines","caf\xc3', b'\xa9"\r\n"last","row"'
+    ]
+    with patch.object(Batches, '_get', return_value=response):
+        rows = list(client.iter_results(1))
+    assert rows == [
+        {'Input.text': 'two\nlines', 'Answer.label': 'café'},
+        {'Input.text': 'last', 'Answer.label': 'row'},
+    ]
+    response.close.assert_called_once()
@@ -0,0 +1,99 @@
+import io
+from unittest.mock import MagicMock
+
+import pytest
+
+from turkle_client.bulk import apply_permissions, load_targets, select_targets
+from turkle_client.exceptions import TurkleClientException
+from turkle_client.output import write_output
+from turkle_client.readers import load_records
+from turkle_client.wrappers import PermissionsWrapper
+
+
+def test_load_targets():
+    targets = load_targets([
+        {'batch': 12, 'users': [3], 'groups': [2]},
+        {'type': 'project', 'id': '4', 'groups': [2]},
+    ])
+    assert targets == [
+        {'type': 'batch', 'id': 12, 'users': [3], 'groups': [2]},
+        {'type': 'project', 'id': 4, 'users': [], 'groups': [2]},
+    ]
+
+def test_load_targets_from_json_array(tmp_path):
+    path = tmp_path / 'targets.json'
+    path.write_text('[{"batch": 12, "users": [3]}, {"project": 4}]')
+    targets = load_targets(load_records(str(path), ['.jsonl', '.json']))
+    assert [(target['type'], target['id']) for target in targets] == [('batch', 12), ('project', 4)]
+
+def test_load_targets_with_duplicate():
+    with pytest.raises(TurkleClientException, match="Duplicate target batch 12 on line 2"):
+        load_targets([{'batch': 12}, {'type': 'batch', 'id': 12}])
+
+def test_load_targets_without_instance():
+    with pytest.raises(TurkleClientException, match="Failure on line 1: Target needs a project or batch"):
+        load_targets([{'users': [3]}])
+
+def test_select_targets():
+    projects = MagicMock()
+    projects.batches.return_value = [{'id': 7}, {'id': 8}]
+    targets = select_targets(projects, 'project:3/batches, batch:8,project:1', {'groups': [2]})
+    projects.batches.assert_called_once_with(3)
+    assert [(target['type'], target['id']) for target in targets] == \
+        [('batch', 7), ('batch', 8), ('project', 1)]
+    assert all(target['groups'] == [2] for target in targets)
+
+def test_select_targets_with_bad_selector():
+    with pytest.raises(TurkleClientException, match="Unrecognized selector: batches:3"):
+        select_targets(MagicMock(), 'batches:3', {})
+    with pytest.raises(TurkleClientException, match="Only projects have batches"):
+        select_targets(MagicMock(), 'batch:3/batches', {})
+
+def test_apply_permissions_reports_each_target():
+    permissions = MagicMock()
+
+    def replace(instance_type, instance_id, perms):
+        if instance_id == 8:
+            raise TurkleClientException("No Batch matches the given query.")
+        return {'users': perms['users'], 'groups': perms['groups']}
+    permissions.replace.side_effect = replace
+    targets = load_targets([{'batch': 7, 'groups': [2]}, {'batch': 8, 'groups': [2]}])
+    results = apply_permissions(permissions, targets, mode='replace', max_workers=2)
+    assert results == [
+        {'type': 'batch', 'id': 7, 'status': 'ok', 'users': [], 'groups': [2]},
+        {'type': 'batch', 'id': 8, 'status': 'error', 'error': 'No Batch matches the given query.'},
+    ]
+    permissions.add.assert_not_called()
+
+def test_apply_permissions_with_bad_mode():
+    with pytest.raises(TurkleClientException, match="Unrecognized permissions mode"):
+        apply_permissions(MagicMock(), [], mode='remove')
+
+def test_wrapper_bulk_with_json_array(tmp_path):
+    path = tmp_path / 'targets.json'
+    path.write_text('[{"batch": 3, "users": [1]}, {"project": 2, "groups": [4]}]')
+    permissions = MagicMock()
+    permissions.add.side_effect = lambda instance_type, instance_id, perms: perms
+    results = PermissionsWrapper(permissions).bulk(str(path), None, 'add', 2, False)
+    assert sorted(call.args[:2] for call in permissions.add.call_args_list) == [('batch', 3), ('project', 2)]
+    assert results == [
+        {'type': 'batch', 'id': 3, 'status': 'ok', 'users': [1], 'groups': [], 'error': None},
+        {'type': 'project', 'id': 2, 'status': 'ok', 'users': [], 'groups': [4], 'error': None},
+    ]
+
+def test_wrapper_bulk_reports_each_target(tmp_path, capsys):
+    path = tmp_path / 'targets.jsonl'
+    path.write_text('{"batch": 7, "groups": [2]}\n{"batch": 8, "groups": [2]}\n')
+    permissions = MagicMock()
+
+    def replace(instance_type, instance_id, perms):
+        if instance_id == 8:
+            raise TurkleClientException("No Batch matches the given query.")
+        return perms
+    permissions.replace.side_effect = replace
+    results = PermissionsWrapper(permissions).bulk(str(path), None, 'replace', 2, False)
+    output = io.StringIO()
+    assert write_output(results, output, 'csv', ['id', 'status', 'error']) == 2
+    assert output.getvalue().splitlines() == [
+        'id,status,error', '7,ok,', '8,error,No Batch matches the given query.']
+    assert capsys.readouterr().err == '1 target updated, 1 failed\n'
@@ -1,9 +1,15 @@
+import os
+import pickle
+import threading
+import time
+
 import pytest
+import requests
 import vcr
 
 from .config import token, url
 
-from turkle_client.client import ClientBase
+from turkle_client.client import Client, ClientBase
 from turkle_client.exceptions import TurkleClientException
 
 my_vcr = vcr.VCR(
@@ -23,3 +29,241 @@ def test_404():
     client = ClientBase(url, token)
     with pytest.raises(TurkleClientException, match="No User matches the given query"):
         client._get("http://localhost:8000/api/users/999999/")
+
+
+def test_client_sections_share_session():
+    client = Client(url, token, pool_size=4)
+    assert client.users.session is client.session
+    assert client.permissions.session is client.session
+    assert client.session.get_adapter(url)._pool_maxsize == 4
+
+
+def test_threads_share_session_unless_per_thread():
+    for per_thread in (False, True):
+        client = Client(url, token, per_thread=per_thread)
+        sessions = []
+        threads = [threading.Thread(target=lambda: sessions.append(client.users.session))
+                   for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert (sessions[0] is sessions[1]) != per_thread
+
+
+def test_pickle_keeps_settings_not_connections():
+    client = Client(url, token, debug=True, pool_size=4)
+    session = client.session
+    copy = pickle.loads(pickle.dumps(client))
+    assert copy.batches.base_url == client.batches.base_url
+    assert copy.batches.debug is True
+    assert copy.session is not session
+    assert copy.users.session is copy.session
+    assert copy.session.get_adapter(url)._pool_maxsize == 4
+
+
+def test_given_session_is_used():
+    session = requests.Session()
+    assert ClientBase(url, token, session=session).session is session
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_fork_gets_new_session():
+    client = Client(url, token)
+    parent = client.users.session
+    parent.parent_marker = True
+    pid = os.fork()
+    if pid == 0:
+        child = client.users.session
+        os._exit(0 if not getattr(child, 'parent_marker', False) and child is client.session else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert client.users.session is parent
+
+
+def test_concurrent_identical_gets_are_coalesced():
+    client = Client(url, token)
+    release = threading.Event()
+    sent = []
+
+    def get(request_url, *args, **kwargs):
+        sent.append(request_url)
+        release.wait(5)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"id": 3}'
+        return response
+
+    client.session.get = get
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.projects.retrieve(3)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while sum(client.pool.singleflight.stats().values()) < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [{'id': 3}] * 4
+    assert len(sent) == 1
+    assert client.pool.singleflight.stats() == {'calls': 1, 'shared': 3}
+
+
+def start_blocked_get(client, release):
+    sent = []
+
+    def get(request_url, *args, **kwargs):
+        sent.append(request_url)
+        release.wait(5)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"id": 3}'
+        return response
+
+    client.session.get = get
+    thread = threading.Thread(target=lambda: client.projects.retrieve(3))
+    thread.start()
+    while client.pool.singleflight.stats()['calls'] < 1:
+        time.sleep(0.001)
+    return thread, sent
+
+
+def test_coalesced_get_is_limited_by_deadline():
+    client = Client(url, token)
+    release = threading.Event()
+    thread, sent = start_blocked_get(client, release)
+    with pytest.raises(TurkleClientException, match="Deadline exceeded"):
+        client.with_deadline(0.05).projects.retrieve(3)
+    release.set()
+    thread.join()
+    assert len(sent) == 1
+
+
+def test_get_after_write_is_not_coalesced_with_earlier_get():
+    client = Client(url, token)
+    release = threading.Event()
+    thread, sent = start_blocked_get(client, release)
+    client.session.patch = lambda *args, **kwargs: make_response()
+    client.projects.update({'id': 3, 'name': 'renamed'})
+    later = threading.Thread(target=lambda: client.projects.retrieve(3))
+    later.start()
+    while len(sent) < 2:
+        time.sleep(0.001)
+    release.set()
+    for t in [thread, later]:
+        t.join()
+    assert client.pool.singleflight.stats() == {'calls': 2, 'shared': 0}
+
+
+def make_response(status=200, content=b'{"id": 3}'):
+    response = requests.Response()
+    response.status_code = status
+    response._content = content
+    response._content_consumed = True
+    return response
+
+
+def test_requests_have_timeouts_limited_by_deadline():
+    client = Client(url, token, timeout=(5, 30))
+    timeouts = []
+
+    def get(request_url, *args, timeout=None, **kwargs):
+        timeouts.append(timeout)
+        return make_response()
+
+    client.session.get = get
+    client.projects.retrieve(3)
+    client.with_deadline(2).projects.retrieve(3)
+    assert timeouts[0] == (5, 30)
+    assert all(0 < value <= 2 for value in timeouts[1])
+    with pytest.raises(TurkleClientException, match='Deadline exceeded'):
+        client.projects.with_deadline(0).retrieve(3)
+
+
+def test_busy_and_timed_out_gets_are_retried(monkeypatch):
+    monkeypatch.setattr('turkle_client.client.RETRY_BACKOFF', 0)
+    client = Client(url, token, retries=2)
+    responses = [make_response(503, b'{"detail": "busy"}'), requests.exceptions.ReadTimeout(),
+                 make_response()]
+
+    def get(request_url, *args, **kwargs):
+        result = responses.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    client.session.get = get
+    busy = responses[0]
+    busy.close = lambda: closed.append(busy)
+    closed = []
+    assert client.batches.progress(3) == {'id': 3}
+    assert closed == [busy]
+    responses[:] = [requests.exceptions.ReadTimeout()] * 3
+    with pytest.raises(TurkleClientException, match='timed out'):
+        client.batches.progress(3)
+    assert responses == []
+
+
+def test_html_error_pages_are_reported():
+    client = Client(url, token, retries=0)
+    client.session.get = lambda *args, **kwargs: make_response(502, b'<html>Bad Gateway</html>')
+    with pytest.raises(TurkleClientException, match='^502 <html>Bad Gateway</html>$'):
+        client.batches.progress(3)
+
+
+def test_writes_wait_for_the_answer_and_say_a_timeout_may_have_applied():
+    client = Client(url, token)
+    timeouts = []
+
+    def patch(request_url, *args, timeout=None, **kwargs):
+        timeouts.append(timeout)
+        raise requests.exceptions.ReadTimeout()
+
+    client.session.patch = patch
+    with pytest.raises(TurkleClientException, match='PATCH request .* may have been applied'):
+        client.projects.update({'id': 3, 'name': 'renamed'})
+    with pytest.raises(TurkleClientException):
+        client.with_deadline(5).projects.update({'id': 3, 'name': 'renamed'})
+    assert timeouts[0] == (10, None)
+    assert all(4 < part <= 5 for part in timeouts[1])
+    assert Client(url, token, write_timeout=30).projects.write_timeout == (30, 30)
+
+
+def test_retries_stop_at_deadline():
+    client = Client(url, token, retries=5)
+    calls = []
+
+    def get(request_url, *args, **kwargs):
+        calls.append(request_url)
+        return make_response(503, b'{"detail": "busy"}')
+
+    client.session.get = get
+    with pytest.raises(TurkleClientException, match='busy'):
+        client.with_deadline(0.2).batches.progress(3)
+    assert len(calls) == 1
+
+
+def test_slow_get_is_hedged():
+    client = Client(url, token, hedge=True)
+    for _ in range(20):
+        client.pool.latency.add(0.01)
+    calls = []
+    closed = threading.Event()
+
+    def get(request_url, *args, **kwargs):
+        calls.append(request_url)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            response = make_response(content=b'{"copy": 1}')
+            response.close = closed.set
+            return response
+        return make_response(content=b'{"copy": 2}')
+
+    client.session.get = get
+    start = time.monotonic()
+    assert client.projects.retrieve(3) == {'copy': 2}
+    assert time.monotonic() - start < 0.4
+    assert client.pool.hedged == 1
+    # the slower copy is closed when it finishes
+    assert closed.wait(2)
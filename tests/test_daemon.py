@@ -0,0 +1,113 @@
+import io
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from turkle_client import daemon
+from turkle_client.__version__ import __version__
+
+
+@pytest.fixture
+def running(tmp_path):
+    path = str(tmp_path / 'd.sock')
+    server = daemon.Daemon(path, idle_timeout=30)
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    for _ in range(200):
+        if daemon.control('status', path):
+            break
+        time.sleep(0.01)
+    yield server, path
+    daemon.control('stop', path)
+    thread.join(5)
+
+
+def run(path, *argv):
+    out = io.BytesIO()
+    err = io.BytesIO()
+    code = daemon.forward(list(argv), path, out, err)
+    return code, out.getvalue().decode(), err.getvalue().decode()
+
+
+def test_forward_without_daemon(tmp_path):
+    assert daemon.forward(['--version'], str(tmp_path / 'none.sock')) is None
+
+def test_forward_runs_command(running):
+    server, path = running
+    assert run(path, '--version') == (0, f"Turkle client version {__version__}\n", '')
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+def test_bad_arguments_exit_like_the_cli(running):
+    server, path = running
+    code, out, err = run(path, 'users', 'bogus')
+    assert code == 2
+    assert "invalid choice: 'bogus'" in err
+
+def test_clients_are_cached_between_commands(running):
+    server, path = running
+    for _ in range(2):
+        code, out, err = run(path, '-u', 'http://localhost:1', '-t', 'abc', 'users', 'list')
+        assert out.startswith('Error: Unable to connect')
+    assert list(server.cli.clients) == [('http://localhost:1', 'abc', False)]
+    assert daemon.control('status', path)['commands'] == 2
+
+def test_paths_are_resolved_in_callers_directory(running, tmp_path, monkeypatch):
+    server, path = running
+    (tmp_path / 'work').mkdir()
+    monkeypatch.chdir(tmp_path / 'work')
+    # the daemon's directory is shared by every command so it must not change
+    monkeypatch.setattr(os, 'chdir', None)
+    code, out, err = run(path, '-u', 'http://localhost:1', '-t', 'abc', 'warehouse', 'query',
+                         '--db', 'site.db', '--sql', 'select 1 as one')
+    assert (code, out) == (0, '{"one": 1}\n')
+    assert (tmp_path / 'work' / 'site.db').exists()
+
+def test_commands_that_change_the_site_run_in_caller(running):
+    server, path = running
+    for argv in [['users', 'create', '--file', 'users.jsonl'], ['permissions', 'bulk'],
+                 ['apply', 'state.yaml'], ['exec', 'script.jsonl']]:
+        assert run(path, '-u', 'http://localhost:1', '-t', 'abc', *argv) == (None, '', '')
+    assert daemon.control('status', path)['commands'] == 0
+
+def test_other_environment_runs_in_caller(running, monkeypatch):
+    server, path = running
+    monkeypatch.setenv('HTTPS_PROXY', 'http://proxy.example.org:3128')
+    assert run(path, '--version') == (None, '', '')
+    assert daemon.control('status', path)['commands'] == 0
+
+def test_other_version_runs_in_caller_and_stops_daemon(running):
+    server, path = running
+    with daemon.connect(path) as sock:
+        daemon.request(sock, {'argv': ['--version'], 'version': '0.0.1', 'env': daemon.environment()})
+        assert [tag for tag, _ in daemon.read_frames(sock)] == [daemon.REPLY]
+    for _ in range(200):
+        if not server.running:
+            break
+        time.sleep(0.01)
+    assert not server.running
+
+def test_stuck_peer_does_not_block_commands(running, monkeypatch):
+    server, path = running
+    monkeypatch.setattr(daemon, 'REQUEST_TIMEOUT', 0.1)
+    stuck = daemon.connect(path)
+    stuck.sendall(b'{"argv": ')
+    try:
+        assert run(path, '--version')[0] == 0
+    finally:
+        stuck.close()
+
+def test_idle_daemon_exits_and_cleans_up(tmp_path):
+    path = str(tmp_path / 'd.sock')
+    open(path, 'w').close()  # stale socket left by a killed daemon
+    server = daemon.Daemon(path, idle_timeout=0.1)
+    server.serve()
+    assert not os.path.exists(path)
+    assert daemon.status(path) == "Daemon is not running"
+
+def test_command_of():
+    assert daemon.command_of(['-t', 'abc', '--url', 'http://x', 'daemon', 'stop']) == 'daemon'
+    assert daemon.command_of(['-d', 'users', 'list']) == 'users'
+    assert daemon.command_of(['--version']) is None
@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from turkle_client.exceptions import TurkleClientException
+from turkle_client.export import write_merged_results
+from turkle_client.wrappers import BatchesWrapper
+
+RESULTS = {
+    1: "Input.text,Answer.label\nhello,greeting\nbye,farewell\n",
+    2: "Input.text,Answer.label,Answer.comment\nhi,greeting,short\n",
+}
+
+
+def make_batches():
+    batches = MagicMock()
+    batches.iter_results.side_effect = lambda bid: csv.DictReader(io.StringIO(RESULTS[bid]))
+    return batches
+
+
+def test_csv_union_of_headers():
+    fh = io.StringIO()
+    count = write_merged_results(make_batches(), [1, 2], fh, 'csv', max_workers=2)
+    assert count == 3
+    rows = list(csv.DictReader(io.StringIO(fh.getvalue())))
+    assert list(rows[0].keys()) == ['batch_id', 'Input.text', 'Answer.label', 'Answer.comment']
+    assert rows[0] == {'batch_id': '1', 'Input.text': 'hello', 'Answer.label': 'greeting',
+                       'Answer.comment': ''}
+    assert rows[2]['batch_id'] == '2'
+    assert rows[2]['Answer.comment'] == 'short'
+
+def test_jsonl_tags_batch_id():
+    fh = io.StringIO()
+    count = write_merged_results(make_batches(), [2, 1], fh, 'jsonl')
+    assert count == 3
+    rows = [json.loads(line) for line in fh.getvalue().splitlines()]
+    assert [row['batch_id'] for row in rows] == [2, 1, 1]
+    assert rows[0] == {'batch_id': 2, 'Input.text': 'hi', 'Answer.label': 'greeting',
+                       'Answer.comment': 'short'}
+
+def test_empty_batch():
+    batches = MagicMock()
+    batches.iter_results.side_effect = lambda bid: csv.DictReader(io.StringIO(""))
+    fh = io.StringIO()
+    assert write_merged_results(batches, [1], fh, 'csv') == 0
+    assert fh.getvalue().strip() == 'batch_id'
+
+def test_bad_format():
+    with pytest.raises(TurkleClientException, match="Unsupported results format: xml"):
+        write_merged_results(make_batches(), [1], io.StringIO(), 'xml')
+
+def test_wrapper_rejects_format_before_opening_output(tmp_path):
+    output = tmp_path / 'merged.csv'
+    output.write_text('keep me')
+    wrapper = BatchesWrapper(MagicMock())
+    with pytest.raises(TurkleClientException,
+                       match="--format for 'batches results' must be one of csv, jsonl"):
+        wrapper.results(None, 'manifest.json', 'parquet', str(output), 4)
+    assert output.read_text() == 'keep me'
@@ -0,0 +1,111 @@
+import datetime
+from unittest.mock import MagicMock
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+from turkle_client.client import Batches, Projects, Users
+from turkle_client.exceptions import TurkleClientException
+from turkle_client.filters import BATCH_FILTERS, USER_FILTERS, make_predicate, query_params, \
+    resolve_filters
+from turkle_client.records import Batch
+from turkle_client.wrappers import parse_filters
+
+BATCHES = [
+    {'id': 1, 'project': 1, 'active': True, 'completed': False, 'created_at': '2024-01-05T10:00:00Z'},
+    {'id': 2, 'project': 2, 'active': True, 'completed': True, 'created_at': '2024-02-01T10:00:00Z'},
+    {'id': 3, 'project': 1, 'active': False, 'completed': True, 'created_at': '2024-03-01T10:00:00Z'},
+    {'id': 4, 'project': 1, 'active': True, 'completed': True, 'created_at': '2024-04-01T10:00:00Z'},
+]
+
+
+def mock_get(client, objs, page_size=2):
+    # a site that ignores filter parameters but honors page_size
+    requested = []
+
+    def get(url, **kwargs):
+        requested.append(url)
+        query = dict(parse_qsl(urlsplit(url).query))
+        size = int(query.get('page_size', page_size))
+        number = int(query.get('page', 1)) - 1
+        start = number * size
+        next_url = None
+        if start + size < len(objs):
+            next_url = f"{url.split('?')[0]}?{urlsplit(url).query}&page={number + 2}"
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {'count': len(objs), 'next': next_url, 'previous': None,
+                                      'results': objs[start:start + size]}
+        return response
+    client._get = get
+    return requested
+
+
+def query_of(url):
+    return dict(parse_qsl(urlsplit(url).query))
+
+
+def test_query_params():
+    resolved = resolve_filters(BATCH_FILTERS, {'project': 3, 'completed': 'false',
+                                               'created_since': '2024-01-01', 'active': None})
+    assert query_params(resolved, 500) == {'project': 3, 'completed': 'false',
+                                           'created_at__gte': '2024-01-01T00:00:00Z',
+                                           'page_size': 500}
+
+def test_resolve_rejects_unknown_and_bad_values():
+    with pytest.raises(TurkleClientException, match='Unknown filter colour'):
+        resolve_filters(BATCH_FILTERS, {'colour': 'red'})
+    with pytest.raises(TurkleClientException, match='true or false'):
+        resolve_filters(BATCH_FILTERS, {'active': 'maybe'})
+    with pytest.raises(TurkleClientException, match='date or timestamp'):
+        resolve_filters(BATCH_FILTERS, {'created_since': 'last week'})
+
+def test_predicate():
+    since = datetime.datetime(2024, 2, 15, tzinfo=datetime.timezone.utc)
+    keep = make_predicate(resolve_filters(BATCH_FILTERS, {'project': '1', 'created_since': since}))
+    assert [batch['id'] for batch in BATCHES if keep(batch)] == [3, 4]
+    keep = make_predicate(resolve_filters(USER_FILTERS, {'active': True}))
+    assert keep({'is_active': True}) and not keep({'is_active': False})
+    assert make_predicate([]) is None
+
+def test_list_sends_filters_and_applies_fallback():
+    client = Batches('http://localhost:8000', 'token')
+    requested = mock_get(client, BATCHES)
+    batches = client.list(project=1, completed=True, page_size=10)
+    assert [batch['id'] for batch in batches] == [3, 4]
+    assert len(requested) == 1
+    assert query_of(requested[0]) == {'project': '1', 'completed': 'true', 'page_size': '10'}
+
+def test_list_without_filters_is_unchanged():
+    client = Batches('http://localhost:8000', 'token')
+    requested = mock_get(client, BATCHES)
+    assert client.list() == BATCHES
+    assert requested[0] == 'http://localhost:8000/api/batches/'
+
+def test_iter_list_filters_every_page():
+    client = Batches('http://localhost:8000', 'token')
+    mock_get(client, BATCHES)
+    batches = list(client.iter_list(records=True, active=True))
+    assert all(isinstance(batch, Batch) for batch in batches)
+    assert [batch.id for batch in batches] == [1, 2, 4]
+
+def test_lazy_list_rejects_filters():
+    client = Users('http://localhost:8000', 'token')
+    mock_get(client, [])
+    with pytest.raises(TurkleClientException, match='lazy'):
+        client.list(lazy=True, active=True)
+
+def test_project_batches_filters():
+    client = Projects('http://localhost:8000', 'token')
+    requested = mock_get(client, BATCHES)
+    batches = list(client.iter_batches(1, completed=False))
+    assert [batch['id'] for batch in batches] == [1]
+    assert urlsplit(requested[0]).path == '/api/projects/1/batches/'
+    assert query_of(requested[0]) == {'completed': 'false'}
+
+def test_parse_filters():
+    assert parse_filters(['active=true', 'created_since = 2024-01-01']) == \
+        {'active': 'true', 'created_since': '2024-01-01'}
+    assert parse_filters(None) == {}
+    with pytest.raises(TurkleClientException):
+        parse_filters(['active'])
@@ -0,0 +1,63 @@
+import json
+import os
+from unittest.mock import MagicMock
+
+from turkle_client.mirror import BlobStore, Mirror
+
+
+def make_client(finished=0):
+    client = MagicMock()
+    client.users.base_url = 'http://localhost:8000'
+    client.users.list.return_value = [{'id': 1, 'username': 'admin'}]
+    client.groups.list.return_value = [{'id': 2, 'name': 'Group1', 'users': [1]}]
+    client.projects.list.return_value = [{'id': 3, 'name': 'Translate'}]
+    client.projects.retrieve.return_value = {'id': 3, 'name': 'Translate', 'html_template': '<p/>'}
+    client.batches.list.return_value = [{'id': 4, 'project': 3, 'name': 'Dickens'}]
+    client.batches.retrieve.return_value = {'id': 4, 'project': 3, 'name': 'Dickens'}
+    client.batches.progress.return_value = {'total_tasks': 2, 'total_finished_tasks': finished}
+    client.batches.input.return_value = "text\nhello\n"
+    client.batches.results.return_value = f"text,answer\nhello,{finished}\n"
+    client.permissions.retrieve.return_value = {'users': [], 'groups': [2]}
+    return client
+
+
+def test_blob_store(tmp_path):
+    store = BlobStore(str(tmp_path))
+    digest = store.put("hello")
+    assert store.put(b"hello") == digest
+    assert digest in store
+    assert store.get(digest) == b"hello"
+    assert os.path.exists(os.path.join(str(tmp_path), digest[:2], digest))
+
+def test_first_run_downloads_everything(tmp_path):
+    stats = Mirror(make_client(), str(tmp_path)).run()
+    assert stats == {'users': 1, 'groups': 1, 'projects': 1, 'batches': 1, 'downloaded': 2}
+    with open(tmp_path / 'manifest.json') as fh:
+        manifest = json.load(fh)
+    store = BlobStore(str(tmp_path / 'objects'))
+    assert store.get_json(manifest['projects']['3']['detail'])['html_template'] == '<p/>'
+    assert store.get(manifest['batches']['4']['input']) == b"text\nhello\n"
+    assert store.get_json(manifest['batches']['4']['permissions']) == {'users': [], 'groups': [2]}
+    assert store.get_json(manifest['users']['1'])['username'] == 'admin'
+    assert len(os.listdir(tmp_path / 'snapshots')) == 1
+
+def test_second_run_skips_unchanged(tmp_path):
+    Mirror(make_client(), str(tmp_path)).run()
+    client = make_client()
+    stats = Mirror(client, str(tmp_path)).run()
+    assert stats['downloaded'] == 0
+    client.projects.retrieve.assert_not_called()
+    client.batches.results.assert_not_called()
+    client.permissions.retrieve.assert_called()
+
+def test_progress_change_downloads_results_only(tmp_path):
+    Mirror(make_client(), str(tmp_path)).run()
+    client = make_client(finished=1)
+    stats = Mirror(client, str(tmp_path)).run()
+    assert stats['downloaded'] == 1
+    client.batches.results.assert_called_once_with(4)
+    client.batches.input.assert_not_called()
+    with open(tmp_path / 'manifest.json') as fh:
+        manifest = json.load(fh)
+    results = BlobStore(str(tmp_path / 'objects')).get(manifest['batches']['4']['results'])
+    assert results == b"text,answer\nhello,1\n"
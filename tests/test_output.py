@@ -0,0 +1,55 @@
+import io
+import json
+
+import pytest
+
+from turkle_client.exceptions import TurkleClientException
+from turkle_client.output import parse_fields, write_output
+from turkle_client.records import Group
+
+GROUPS = [{'id': 1, 'name': 'A', 'users': [3, 4]}, {'id': 2, 'name': 'B', 'users': []}]
+
+
+def records():
+    # an iterator so the writers cannot rely on a list
+    return iter(GROUPS)
+
+
+def test_jsonl():
+    fh = io.StringIO()
+    assert write_output(records(), fh) == 2
+    assert [json.loads(line) for line in fh.getvalue().splitlines()] == GROUPS
+
+def test_json_array():
+    fh = io.StringIO()
+    write_output(records(), fh, 'json')
+    assert json.loads(fh.getvalue()) == GROUPS
+    fh = io.StringIO()
+    write_output(iter([]), fh, 'json')
+    assert json.loads(fh.getvalue()) == []
+
+def test_single_record():
+    fh = io.StringIO()
+    write_output({'id': 1, 'name': 'A'}, fh, 'json', fields=['name'])
+    assert json.loads(fh.getvalue()) == {'name': 'A'}
+
+def test_csv_with_fields():
+    fh = io.StringIO()
+    write_output(records(), fh, 'csv', fields=parse_fields('name, users'))
+    assert fh.getvalue().splitlines() == ['name,users', 'A,"[3, 4]"', 'B,[]']
+
+def test_records_objects():
+    fh = io.StringIO()
+    write_output((Group.from_json(group) for group in GROUPS), fh)
+    assert [json.loads(line) for line in fh.getvalue().splitlines()] == GROUPS
+
+def test_parquet():
+    pq = pytest.importorskip('pyarrow.parquet')
+    fh = io.BytesIO()
+    assert write_output(records(), fh, 'parquet', fields=['id', 'name']) == 2
+    fh.seek(0)
+    assert pq.read_table(fh).to_pylist() == [{'id': 1, 'name': 'A'}, {'id': 2, 'name': 'B'}]
+
+def test_bad_format():
+    with pytest.raises(TurkleClientException, match="Unsupported output format: xml"):
+        write_output(records(), io.StringIO(), 'xml')
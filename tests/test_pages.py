@@ -0,0 +1,90 @@
+from unittest.mock import MagicMock
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+from turkle_client.pages import PagedList
+
+URL = 'http://localhost:8000/api/batches/'
+
+
+def make_client(count, page_size, scheme='page'):
+    items = [{'id': i} for i in range(count)]
+    client = MagicMock()
+    requested = []
+
+    def get(url):
+        requested.append(url)
+        query = dict(parse_qsl(urlsplit(url).query))
+        if scheme == 'page':
+            number = int(query.get('page', 1)) - 1
+        elif scheme == 'offset':
+            number = int(query.get('offset', 0)) // page_size
+        else:
+            number = int(query.get('cursor', 0))
+        start = number * page_size
+        next_url = None
+        if start + page_size < count:
+            next_url = {'page': f"{URL}?page={number + 2}",
+                        'offset': f"{URL}?limit={page_size}&offset={start + page_size}",
+                        'links': f"{URL}?cursor={number + 1}"}[scheme]
+        response = MagicMock()
+        response.json.return_value = {'count': count, 'next': next_url, 'previous': None,
+                                      'results': items[start:start + page_size]}
+        return response
+    client._get.side_effect = get
+    return client, requested
+
+
+def test_len_only_fetches_first_page():
+    client, requested = make_client(95, 10)
+    pages = PagedList(client, URL)
+    assert len(pages) == 95
+    assert pages.num_pages == 10
+    assert requested == [URL]
+
+def test_index_fetches_covering_page():
+    client, requested = make_client(95, 10)
+    pages = PagedList(client, URL)
+    assert pages[57] == {'id': 57}
+    assert pages[-1] == {'id': 94}
+    assert requested[1:] == [f"{URL}?page=6", f"{URL}?page=10"]
+    with pytest.raises(IndexError):
+        pages[95]
+
+def test_slice_fetches_only_needed_pages():
+    client, requested = make_client(95, 10, 'offset')
+    pages = PagedList(client, URL)
+    assert [item['id'] for item in pages[-12:]] == list(range(83, 95))
+    offsets = sorted(int(dict(parse_qsl(urlsplit(url).query))['offset']) for url in requested[1:])
+    assert offsets == [80, 90]
+    assert [item['id'] for item in pages[5:1:-2]] == [5, 3]
+    assert pages[10:10] == []
+
+def test_lru_cache():
+    client, requested = make_client(95, 10)
+    pages = PagedList(client, URL, cache_pages=2)
+    pages[15]
+    pages[25]
+    pages[16]
+    assert len(requested) == 3
+    pages[5]
+    assert len(requested) == 4
+
+def test_iteration():
+    for scheme in ['page', 'offset', 'links']:
+        client, requested = make_client(95, 10, scheme)
+        assert [item['id'] for item in PagedList(client, URL)] == list(range(95))
+        assert len(requested) == 10
+
+def test_random_access_follows_links():
+    client, requested = make_client(35, 10, 'links')
+    pages = PagedList(client, URL)
+    assert pages[31] == {'id': 31}
+    assert requested[1:] == [f"{URL}?cursor=1", f"{URL}?cursor=2", f"{URL}?cursor=3"]
+
+def test_single_page():
+    client, requested = make_client(3, 10)
+    pages = PagedList(client, URL)
+    assert list(pages) == [{'id': 0}, {'id': 1}, {'id': 2}]
+    assert len(requested) == 1
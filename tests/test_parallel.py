@@ -0,0 +1,115 @@
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import pytest
+
+from turkle_client.parallel import Singleflight, bounded_map
+
+
+def test_results_in_input_order():
+    def slow_square(x):
+        time.sleep(0.01 * (5 - x))
+        return x * x
+
+    assert list(bounded_map(slow_square, range(5), max_workers=3)) == [0, 1, 4, 9, 16]
+
+def test_limits_calls_in_flight():
+    lock = threading.Lock()
+    state = {'current': 0, 'max': 0}
+
+    def work(x):
+        with lock:
+            state['current'] += 1
+            state['max'] = max(state['max'], state['current'])
+        time.sleep(0.01)
+        with lock:
+            state['current'] -= 1
+        return x
+
+    assert list(bounded_map(work, range(20), max_workers=2)) == list(range(20))
+    assert state['max'] <= 2
+
+def test_exception_is_raised():
+    def fail(x):
+        raise ValueError("bad item")
+
+    with pytest.raises(ValueError, match="bad item"):
+        list(bounded_map(fail, [1, 2]))
+
+def test_singleflight_shares_concurrent_calls():
+    flight = Singleflight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'page'
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(flight.do('url', fetch)))
+    first.start()
+    started.wait(5)
+    others = [threading.Thread(target=lambda: results.append(flight.do('url', fetch)))
+              for _ in range(3)]
+    for thread in others:
+        thread.start()
+    while flight.stats()['shared'] < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [first] + others:
+        thread.join()
+    assert results == ['page'] * 4
+    assert len(calls) == 1
+    assert flight.stats() == {'calls': 1, 'shared': 3}
+    # nothing is cached once the call is done
+    assert flight.do('url', lambda: 'new') == 'new'
+
+def test_singleflight_shares_exceptions():
+    flight = Singleflight()
+    release = threading.Event()
+    errors = []
+
+    def fail():
+        release.wait(5)
+        raise ValueError("down")
+
+    def call():
+        try:
+            flight.do('url', fail)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    while sum(flight.stats().values()) < 2:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert errors == ['down', 'down']
+    assert flight.stats() == {'calls': 1, 'shared': 1}
+
+
+def test_singleflight_followers_wait_up_to_timeout():
+    flight = Singleflight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fetch():
+        started.set()
+        release.wait(5)
+        return 'page'
+
+    leader = threading.Thread(target=lambda: flight.do('url', fetch))
+    leader.start()
+    started.wait(5)
+    with pytest.raises(FutureTimeout):
+        flight.do('url', fetch, timeout=0.01)
+    release.set()
+    leader.join()
+    assert flight.stats() == {'calls': 1, 'shared': 1}
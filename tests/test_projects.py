@@ -18,6 +18,14 @@ def test_batches():
     assert len(batches) == 1
     assert batches[0]['name'] == 'Dickens'
 
+@my_vcr.use_cassette('test_batches')
+def test_batches_lazy_records():
+    client = Projects(url, token)
+    batches = client.batches(1, lazy=True, records=True)
+    assert len(batches) == 1
+    assert batches[0].name == 'Dickens'
+    assert batches[0].project == 1
+
 @my_vcr.use_cassette()
 def test_retrieve_on_bad_project():
     client = Projects(url, token)
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from turkle_client.readers import load_records
+
+
+def write_jsonl(path, count, blank_every=0):
+    lines = []
+    for i in range(count):
+        lines.append(json.dumps({'id': i, 'text': 'x' * (i % 7)}))
+        if blank_every and i % blank_every == 0:
+            lines.append('')
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+def test_jsonl(tmp_path):
+    path = write_jsonl(tmp_path / 'records.jsonl', 20, blank_every=5)
+    assert [record['id'] for record in load_records(path)] == list(range(20))
+
+def test_jsonl_error_line(tmp_path):
+    path = tmp_path / 'records.jsonl'
+    path.write_text('{"id": 1}\n\n{"id": \n')
+    with pytest.raises(ValueError, match="Invalid JSON on line 3 in"):
+        list(load_records(str(path)))
+
+def test_empty_jsonl(tmp_path):
+    path = tmp_path / 'records.jsonl'
+    path.write_text('')
+    assert list(load_records(str(path))) == []
+
+def test_csv_matches_dict_reader(tmp_path):
+    path = tmp_path / 'users.csv'
+    path.write_text('username,first_name\nuser1,"Bob\nby"\n\nuser2\nuser3,Sue,extra\n')
+    assert list(load_records(str(path))) == [
+        {'username': 'user1', 'first_name': 'Bob\nby'},
+        {'username': 'user2', 'first_name': None},
+        {'username': 'user3', 'first_name': 'Sue', None: ['extra']},
+    ]
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported file format: .txt"):
+        list(load_records(str(tmp_path / 'users.txt')))
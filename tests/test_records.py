@@ -0,0 +1,68 @@
+import json
+import pickle
+
+import pytest
+import requests
+
+from turkle_client.client import Client
+from turkle_client.records import Batch, PermissionSet, Project, User
+
+
+def test_from_json():
+    user = User.from_json({'id': 3, 'username': 'user1', 'is_active': True, 'nickname': 'bob'})
+    assert user.id == 3
+    assert user['username'] == 'user1'
+    assert user.email is None
+    # unknown fields are kept
+    assert user['nickname'] == 'bob'
+    assert 'nickname' in user
+    assert user.get('missing', 5) == 5
+    with pytest.raises(KeyError):
+        user['missing']
+
+def test_read_only():
+    batch = Batch.from_json({'id': 7, 'name': 'Dickens'})
+    with pytest.raises(AttributeError):
+        batch.name = 'Austen'
+    with pytest.raises(AttributeError):
+        batch.nickname = 'Austen'
+
+def test_no_instance_dict():
+    batch = Batch.from_json({'id': 7, 'name': 'Dickens'})
+    assert not hasattr(batch, '__dict__')
+
+def test_project_template():
+    template = '<p>${text}</p>' * 1000
+    project = Project.from_json({'id': 1, 'name': 'Translate', 'html_template': template})
+    assert project._html_template is template
+    project = Project.from_json({'id': 1, 'name': 'Translate', 'html_template': template}, compact=True)
+    assert len(project._html_template) < len(template)
+    assert project.html_template == template
+    assert project.to_dict()['html_template'] == template
+    assert Project.from_json({'id': 2}).html_template is None
+
+def test_compact_records_are_chosen_per_call():
+    template = '<p>${text}</p>' * 1000
+    project = {'id': 1, 'name': 'Translate', 'html_template': template}
+    pages = {'http://localhost/api/projects/': {'next': None, 'results': [project]},
+             'http://localhost/api/projects/1/': project}
+
+    def get(url, *args, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps(pages[url]).encode('utf-8')
+        return response
+
+    client = Client('http://localhost', 'token')
+    client.session.get = get
+    compact, = client.projects.list(records='compact')
+    assert isinstance(compact._html_template, bytes)
+    assert compact.html_template == template
+    plain, = client.projects.list(records=True)
+    assert plain._html_template == template
+    assert isinstance(client.projects.retrieve(1, records='compact')._html_template, bytes)
+
+def test_equality_and_pickle():
+    perms = PermissionSet.from_json({'users': [3], 'groups': []})
+    assert perms == {'users': [3], 'groups': []}
+    assert pickle.loads(pickle.dumps(perms)) == perms
@@ -0,0 +1,124 @@
+import gzip
+import json
+import time
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from turkle_client.client import Client
+from turkle_client.exceptions import TurkleClientException
+from turkle_client.replay import Recorder, Replay
+
+
+class FakeSite(BaseAdapter):
+    """Adapter that answers from a dict of url to (status, content type, content)"""
+    def __init__(self, pages):
+        super().__init__()
+        self.pages = pages
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        status, content_type, content = self.pages[request.url]
+        response = requests.Response()
+        response.status_code = status
+        response.headers['Content-Type'] = content_type
+        response._content = content
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def record(path, pages, work):
+    site = FakeSite(pages)
+    with Recorder(str(path)) as recorder:
+        def transport(pool_size):
+            session = recorder.transport(pool_size)
+            session.mount('http://', site)
+            return session
+        result = work(Client('http://turkle.example.org', 'secret', transport=transport))
+    return site, result
+
+
+USERS = json.dumps({'count': 1, 'next': None, 'previous': None,
+                    'results': [{'id': 1, 'username': 'alice'}]}).encode('utf-8')
+PROGRESS = b'{"total_tasks": 10, "total_finished_tasks": 4}'
+
+
+def test_record_and_replay(tmp_path):
+    path = tmp_path / 'traffic.jsonl.gz'
+    pages = {
+        'http://turkle.example.org/api/users/': (200, 'application/json', USERS),
+        'http://turkle.example.org/api/batches/7/progress/': (200, 'application/json', PROGRESS),
+    }
+    site, recorded = record(path, pages, lambda client: (client.users.list(),
+                                                         client.batches.progress(7)))
+    assert len(site.requests) == 2
+
+    with gzip.open(path, 'rt') as fh:
+        text = fh.read()
+    assert 'secret' not in text
+    assert json.loads(text.splitlines()[0])['s'] == 200
+
+    replay = Replay(str(path), latency_scale=0)
+    client = Client('http://turkle.example.org', 'other', transport=replay.transport)
+    assert (client.users.list(), client.batches.progress(7)) == recorded
+    assert replay.count == 2
+
+def test_repeated_requests_replay_in_order(tmp_path):
+    path = tmp_path / 'traffic.jsonl.gz'
+    url = 'http://turkle.example.org/api/batches/7/progress/'
+    pages = {url: (200, 'application/json', b'{"total_finished_tasks": 1}')}
+
+    def work(client):
+        client.batches.progress(7)
+        pages[url] = (200, 'application/json', b'{"total_finished_tasks": 2}')
+        client.batches.progress(7)
+
+    record(path, pages, work)
+
+    replay = Replay(str(path), latency_scale=0)
+    client = Client('http://turkle.example.org', 'token', transport=replay.transport)
+    assert [client.batches.progress(7)['total_finished_tasks'] for _ in range(3)] == [1, 2, 2]
+
+def test_latency_is_scaled(tmp_path):
+    path = tmp_path / 'traffic.jsonl.gz'
+    url = 'http://turkle.example.org/api/batches/7/progress/'
+    with gzip.open(path, 'wt') as fh:
+        fh.write(json.dumps({'m': 'GET', 'u': url, 'b': None, 's': 200,
+                             'ct': 'application/json', 't': 0.5, 'c': '{}'}) + '\n')
+    client = Client('http://turkle.example.org', 'token',
+                    transport=Replay(str(path), latency_scale=0.1).transport)
+    start = time.monotonic()
+    client.batches.progress(7)
+    assert 0.05 <= time.monotonic() - start < 0.5
+
+def test_unknown_request(tmp_path):
+    path = tmp_path / 'traffic.jsonl.gz'
+    with gzip.open(path, 'wt'):
+        pass
+    client = Client('http://turkle.example.org', 'token',
+                    transport=Replay(str(path), latency_scale=0).transport)
+    with pytest.raises(TurkleClientException, match="No recorded response for GET"):
+        client.batches.progress(7)
+
+def test_binary_content(tmp_path):
+    path = tmp_path / 'traffic.jsonl.gz'
+    binary = bytes(range(256))
+    pages = {'http://turkle.example.org/api/batches/7/input/':
+             (200, 'application/octet-stream', binary)}
+    record(path, pages, lambda client: client.session.get(
+        'http://turkle.example.org/api/batches/7/input/'))
+
+    replay = Replay(str(path), latency_scale=0)
+    session = replay.transport()
+    response = session.get('http://turkle.example.org/api/batches/7/input/')
+    assert response.content == binary
+    assert list(response.iter_content(100)) == [binary[:100], binary[100:200], binary[200:]]
+    # other methods on the same url were not recorded
+    with pytest.raises(TurkleClientException):
+        session.post('http://turkle.example.org/api/batches/7/input/', data=b'x')
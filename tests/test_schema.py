@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from turkle_client.exceptions import TurkleClientException
+from turkle_client.schema import SCHEMAS, check_type, validate_file, validate_or_raise
+
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_check_type():
+    assert check_type('12', 'an integer')
+    assert check_type(12, 'an integer')
+    assert not check_type(True, 'an integer')
+    assert not check_type('1.5', 'an integer')
+    assert check_type('False', 'a boolean')
+    assert not check_type('maybe', 'a boolean')
+    assert check_type([1, '2'], 'a list of integers')
+
+def test_users_csv_reports_all_errors(tmp_path):
+    path = write(tmp_path / 'users.csv',
+                 'username,password,is_active\nuser1,pw,true\n,pw,true\nuser1,pw,maybe\n')
+    count, errors = validate_file(path, 'users create')
+    assert count == 3
+    assert errors == [
+        'line 3: missing username',
+        'line 4: is_active must be a boolean',
+        'line 4: duplicate username user1 (first on line 2)',
+    ]
+
+def test_listed_users_can_be_updated(tmp_path):
+    # users list writes read-only fields that are accepted and dropped before sending
+    user = {'id': 3, 'username': 'user1', 'email': 'a@example.org', 'is_active': True,
+            'date_joined': '2024-01-01T00:00:00Z', 'groups': [1, 2]}
+    path = write(tmp_path / 'users.jsonl', json.dumps(user) + '\n')
+    assert validate_file(path, 'users update') == (1, [])
+    assert validate_file(path, 'users upsert') == (1, [])
+    path = write(tmp_path / 'users.csv', 'id,username,date_joined,groups\n3,user1,2024-01-01,"[1, 2]"\n')
+    assert validate_file(path, 'users update') == (1, [])
+
+def test_jsonl_continues_after_bad_line(tmp_path):
+    path = write(tmp_path / 'groups.jsonl',
+                 '{"name": "A", "users": [1]}\n{"name": \n\n{"name": "B", "users": ["x"], "color": 1}\n')
+    count, errors = validate_file(path, 'groups create')
+    assert count == 3
+    assert errors[0].startswith('line 2: invalid JSON')
+    assert errors[1:] == ['line 4: users must be a list of integers', 'line 4: unknown field color']
+
+def test_batch_csv_files_are_checked_once(tmp_path):
+    write(tmp_path / 'good.csv', 'text,id\n"a\nb",1\n')
+    write(tmp_path / 'bad.csv', 'text,text\na,1,2\n')
+    records = [
+        {'name': 'one', 'project': 1, 'filename': str(tmp_path / 'good.csv')},
+        {'name': 'two', 'project': 1, 'filename': str(tmp_path / 'bad.csv')},
+        {'name': 'three', 'project': 1, 'filename': str(tmp_path / 'bad.csv')},
+        {'name': 'four', 'project': '1', 'filename': str(tmp_path / 'missing.csv')},
+        {'name': 'one', 'project': 2, 'filename': str(tmp_path / 'good.csv')},
+    ]
+    path = write(tmp_path / 'batches.jsonl', '\n'.join(json.dumps(record) for record in records))
+    _, errors = validate_file(path, 'batches create')
+    bad = str(tmp_path / 'bad.csv')
+    assert errors[:4] == [
+        f"line 2: task CSV {bad} has duplicate columns: text",
+        f"line 2: task CSV {bad} line 2 has 3 fields instead of 2",
+        f"line 3: task CSV {bad} has duplicate columns: text",
+        f"line 3: task CSV {bad} line 2 has 3 fields instead of 2",
+    ]
+    assert errors[4].startswith('line 4: cannot read task CSV')
+    assert len(errors) == 5
+
+def test_project_needs_template(tmp_path):
+    write(tmp_path / 'empty.html', ' \n')
+    path = write(tmp_path / 'projects.jsonl',
+                 '{"name": "A"}\n{"name": "B", "filename": "%s"}\n' % (tmp_path / 'empty.html'))
+    _, errors = validate_file(path, SCHEMAS['projects create'])
+    assert errors == ['line 1: needs one of html_template, filename',
+                      f"line 2: template {tmp_path / 'empty.html'} is empty"]
+
+def test_permission_targets(tmp_path):
+    path = write(tmp_path / 'targets.jsonl',
+                 '{"batch": 3}\n{"type": "batch", "id": 3}\n{"type": "task", "id": 4}\n{"users": [1]}\n')
+    _, errors = validate_file(path, 'permissions bulk')
+    assert errors == [
+        'line 2: duplicate key batch/3 (first on line 1)',
+        'line 3: type must be project or batch',
+        'line 4: needs one of project, batch, type',
+    ]
+
+def test_permission_targets_json_array(tmp_path):
+    path = write(tmp_path / 'targets.json', '[{"batch": 3, "users": [1]}, {"project": 2, "groups": [4]}]')
+    assert validate_file(path, 'permissions bulk', ['.jsonl', '.json']) == (2, [])
+    path = write(tmp_path / 'bad.json', '[{"batch": 3}, {"users": [1]}, 5]')
+    assert validate_file(path, 'permissions bulk', ['.jsonl', '.json'])[1] == [
+        'object 2: needs one of project, batch, type',
+        'object 3: expected an object but found int',
+    ]
+    # other commands take one object from a .json file
+    assert validate_file(path, 'groups create', ['.jsonl', '.json'])[1] == [
+        'object 1: expected an object but found list']
+
+def test_validate_or_raise(tmp_path):
+    path = write(tmp_path / 'users.jsonl', '{"id": 3}\n{"id": "x"}\n')
+    with pytest.raises(TurkleClientException, match="1 errors in .*\nline 2: id must be an integer"):
+        validate_or_raise(path, 'users update')
+    assert validate_or_raise(write(tmp_path / 'ok.jsonl', '{"id": 3}\n'), 'users update') == 1
@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from turkle_client.exceptions import TurkleClientException
+from turkle_client.table import ResultsTable
+
+np = pytest.importorskip('numpy')
+
+from turkle_client.scoring import GoldScorer  # noqa: E402
+
+RESULTS = """Input.image,Input.size,Answer.label,Turkle.Username,WorkTimeInSeconds
+a.jpg,small,cat,ann,10
+b.jpg,small,dog,ann,20
+c.jpg,small,dog,ann,60
+a.jpg,small,dog,bob,5
+b.jpg,small,,bob,7
+z.jpg,small,cat,cy,3
+"""
+GOLD = [
+    {'image': 'a.jpg', 'size': 'small', 'label': 'cat'},
+    {'Input.image': 'b.jpg', 'Input.size': 'small', 'label': 'dog'},
+]
+
+
+def make_table():
+    return ResultsTable.from_rows(csv.reader(io.StringIO(RESULTS)))
+
+
+def make_scorer():
+    scorer = GoldScorer(GOLD, ['image', 'Input.size'], 'Answer.label')
+    scorer.add_table(make_table())
+    return scorer
+
+
+def test_scores():
+    scores = {score['worker']: score for score in make_scorer().scores(min_accuracy=0.75)}
+    assert scores['ann']['assignments'] == 3
+    assert scores['ann']['gold_items'] == 2
+    assert scores['ann']['accuracy'] == 1.0
+    assert scores['ann']['mean_seconds'] == 30
+    assert scores['ann']['median_seconds'] == 20
+    assert scores['ann']['below_threshold'] is False
+    assert scores['bob']['correct'] == 0
+    assert scores['bob']['median_seconds'] == 6
+    assert scores['bob']['below_threshold'] is True
+    assert scores['cy']['accuracy'] is None
+    assert scores['cy']['below_threshold'] is False
+
+def test_confusion_matrices():
+    confusion = make_scorer().confusion_matrices()
+    assert confusion['ann'] == {'cat': {'cat': 1}, 'dog': {'dog': 1}}
+    assert confusion['bob'] == {'cat': {'dog': 1}, 'dog': {'(blank)': 1}}
+    assert confusion['cy'] == {}
+
+def test_numeric_labels_on_inferred_table():
+    ratings = "Input.item,Answer.rating,Turkle.Username\n1,5,ann\n2,3,ann\n1,4,bob\n"
+    table = ResultsTable.from_rows(csv.reader(io.StringIO(ratings)))
+    assert table['Answer.rating'].type == 'int'
+    # gold keys may come from csv strings or json numbers
+    scorer = GoldScorer([{'item': '1', 'rating': '5'}, {'item': 2, 'rating': 3.0}], ['item'],
+                        'Answer.rating')
+    scorer.add_table(table)
+    scores = {score['worker']: score for score in scorer.scores()}
+    assert scores['ann']['accuracy'] == 1.0
+    assert scores['bob']['accuracy'] == 0.0
+    assert scorer.confusion_matrices()['bob'] == {'5': {'4': 1}}
+
+def test_many_tables_in_one_pass():
+    scorer = GoldScorer(GOLD, ['image', 'size'], 'Answer.label')
+    client = MagicMock()
+    client.batches.results_table.side_effect = lambda batch_id, types: make_table()
+    assert scorer.add_batches(client, [1, 2]) == 8
+    scores = {score['worker']: score for score in scorer.scores()}
+    assert scores['ann']['gold_items'] == 4
+
+def test_write_reports(tmp_path):
+    assert make_scorer().write_reports(str(tmp_path)) == 3
+    with open(tmp_path / 'bob.json') as fh:
+        report = json.load(fh)
+    assert report['gold_items'] == 2
+    assert report['confusion']['cat'] == {'dog': 1}
+
+def reject_constant(name):
+    raise ValueError(f"{name} is not valid json")
+
+def test_worker_without_gold_items_is_valid_json(tmp_path):
+    scorer = GoldScorer(GOLD, ['image', 'size'], 'Answer.label', time_field='Answer.seconds')
+    scorer.add_table(make_table())
+    scores = {score['worker']: score for score in scorer.scores()}
+    assert scores['cy'] == {'worker': 'cy', 'assignments': 1, 'gold_items': 0, 'correct': 0,
+                            'accuracy': None, 'mean_seconds': None, 'median_seconds': None}
+    scorer.write_reports(str(tmp_path))
+    with open(tmp_path / 'cy.json') as fh:
+        assert json.load(fh, parse_constant=reject_constant)['accuracy'] is None
+
+def test_missing_gold_field():
+    with pytest.raises(TurkleClientException, match="Gold record 1 is missing label"):
+        GoldScorer([{'image': 'a.jpg'}], ['image'], 'Answer.label')
+
+def test_missing_results_column():
+    scorer = GoldScorer(GOLD, ['image'], 'Answer.kind', gold_field='label')
+    with pytest.raises(TurkleClientException, match="missing the Answer.kind column"):
+        scorer.add_table(make_table())
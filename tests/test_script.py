@@ -0,0 +1,112 @@
+import io
+import json
+import threading
+import time
+
+import pytest
+
+from turkle_client.bin import Cli
+from turkle_client.exceptions import TurkleClientException
+from turkle_client.records import User
+from turkle_client.script import load_script, run_commands
+
+
+def write_script(tmp_path, lines):
+    path = tmp_path / 'commands.jsonl'
+    path.write_text(''.join(json.dumps(line) + '\n' for line in lines))
+    return str(path)
+
+
+class FakeCli:
+    """Runs commands by their --id so tests can control timing and failures"""
+    def __init__(self):
+        self.parser = Cli().parser
+        self.started = []
+        self.lock = threading.Lock()
+
+    def run_command(self, args, url, token):
+        with self.lock:
+            self.started.append(args.id)
+        if args.id == 'fail':
+            raise TurkleClientException("no such user")
+        if args.id == 'slow':
+            time.sleep(0.1)
+        if args.id == 'print':
+            print("a,b")
+            return None
+        if args.id == 'list':
+            return iter([{'id': 1, 'username': 'a'}, User.from_json({'id': 2, 'username': 'b'})])
+        return {'id': args.id}
+
+
+def run(tmp_path, lines, workers=4):
+    cli = FakeCli()
+    commands = load_script(write_script(tmp_path, lines), cli.parser)
+    fh = io.StringIO()
+    counts = run_commands(cli, commands, fh, 'http://localhost', 'token', workers)
+    return cli, counts, [json.loads(line) for line in fh.getvalue().splitlines()]
+
+
+def test_load_script(tmp_path):
+    path = write_script(tmp_path, [
+        {'id': 'a', 'args': ['users', 'retrieve', '--id', '3']},
+        {'args': 'batches progress --id 7', 'depends_on': 'a'},
+    ])
+    commands = load_script(path, Cli().parser)
+    assert [command.id for command in commands] == ['a', '2']
+    assert commands[1].name == 'batches progress'
+    assert commands[1].args.id == '7'
+    assert commands[1].depends_on == ['a']
+
+def test_load_script_reports_all_errors(tmp_path):
+    path = write_script(tmp_path, [
+        {'args': ['users', 'bogus']},
+        {'args': ['daemon', 'stop']},
+        {'args': ['users', 'list'], 'depends_on': ['later']},
+        {'id': 'later', 'args': ['users', 'list']},
+        {'id': 'later', 'args': ['users', 'list']},
+        {'id': 'x'},
+    ])
+    with pytest.raises(TurkleClientException) as e:
+        load_script(path, Cli().parser)
+    message = str(e.value)
+    assert message.startswith('5 errors')
+    assert "line 1: turkle-client users: error: argument subcommand: invalid choice" in message
+    assert "line 2: cannot run 'daemon'" in message
+    assert "line 3: depends_on must name earlier commands: later" in message
+    assert "line 5: duplicate id later" in message
+    assert "line 6: missing args" in message
+
+def test_results_in_file_order(tmp_path):
+    cli, counts, records = run(tmp_path, [
+        {'args': 'users retrieve --id slow'},
+        {'args': 'users retrieve --id fast'},
+        {'args': 'users list --id list --fields username'},
+    ])
+    assert counts == {'ok': 3, 'error': 0, 'skipped': 0}
+    assert [record['id'] for record in records] == ['1', '2', '3']
+    assert records[0]['result'] == {'id': 'slow'}
+    assert records[2]['result'] == [{'username': 'a'}, {'username': 'b'}]
+    # independent commands run concurrently
+    assert cli.started.index('fast') < 2
+
+def test_dependencies_order_and_skip(tmp_path):
+    cli, counts, records = run(tmp_path, [
+        {'id': 'a', 'args': 'users retrieve --id slow'},
+        {'id': 'b', 'args': 'users retrieve --id after', 'depends_on': ['a']},
+        {'id': 'c', 'args': 'users retrieve --id fail'},
+        {'id': 'd', 'args': 'users retrieve --id never', 'depends_on': ['c']},
+        {'id': 'e', 'args': 'users retrieve --id never', 'depends_on': ['d']},
+    ])
+    assert cli.started.index('after') > cli.started.index('slow')
+    assert 'never' not in cli.started
+    assert [record['status'] for record in records] == ['ok', 'ok', 'error', 'skipped', 'skipped']
+    assert records[2]['error'] == 'no such user'
+    assert records[3]['error'] == 'c did not succeed'
+    assert counts == {'ok': 2, 'error': 1, 'skipped': 2}
+
+def test_printed_output_is_captured(tmp_path, capsys):
+    cli, counts, records = run(tmp_path, [{'args': 'batches results --id print'}])
+    assert records[0]['output'] == 'a,b\n'
+    assert 'result' in records[0] and records[0]['result'] is None
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,62 @@
+import io
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from turkle_client.exceptions import TurkleClientException
+from turkle_client.sharding import create_sharded_batch, iter_shards, manifest_batch_ids
+
+
+CSV = 'text,id\r\nfirst,1\r\n"two\r\nlines",2\r\nthird,3\r\n'
+
+
+def test_iter_shards():
+    shards = list(iter_shards(io.StringIO(CSV, newline=''), 2))
+    assert shards == [
+        (1, 1, 2, 'text,id\r\nfirst,1\r\n"two\r\nlines",2\r\n'),
+        (2, 3, 1, 'text,id\r\nthird,3\r\n'),
+    ]
+
+def test_iter_shards_with_exact_multiple():
+    shards = list(iter_shards(io.StringIO(CSV, newline=''), 3))
+    assert [(index, rows) for index, _, rows, _ in shards] == [(1, 3)]
+
+def test_iter_shards_with_empty_file():
+    with pytest.raises(TurkleClientException, match="The task CSV is empty"):
+        list(iter_shards(io.StringIO(''), 2))
+
+def test_create_sharded_batch(tmp_path):
+    batches = MagicMock()
+    batches.create.side_effect = lambda batch: {'id': 20 + int(batch['name'][-1])}
+    permissions = MagicMock()
+    permissions.retrieve.return_value = {'users': [3], 'groups': [2]}
+    batch = {'project': 4, 'name': 'Dickens', 'filename': 'dickens.csv'}
+    manifest = create_sharded_batch(batches, permissions, batch, io.StringIO(CSV, newline=''), 2,
+                                    template_batch=9, max_workers=2)
+
+    created = sorted((call.args[0] for call in batches.create.call_args_list), key=lambda b: b['name'])
+    assert [(b['name'], b['filename'], b['project']) for b in created] == \
+        [('Dickens-001', 'dickens-001.csv', 4), ('Dickens-002', 'dickens-002.csv', 4)]
+    permissions.retrieve.assert_called_once_with('batch', 9)
+    assert permissions.replace.call_count == 2
+    assert [(entry['batch_id'], entry['first_row'], entry['rows'], entry['status'])
+            for entry in manifest['batches']] == [(21, 1, 2, 'ok'), (22, 3, 1, 'ok')]
+
+    path = tmp_path / 'manifest.json'
+    path.write_text(json.dumps(manifest))
+    assert manifest_batch_ids(str(path)) == [21, 22]
+
+def test_create_sharded_batch_continues_after_failure():
+    batches = MagicMock()
+
+    def create(batch):
+        if batch['name'] == 'Dickens-001':
+            raise TurkleClientException("Bad CSV")
+        return {'id': 22}
+    batches.create.side_effect = create
+    manifest = create_sharded_batch(batches, MagicMock(), {'project': 4, 'name': 'Dickens'},
+                                    io.StringIO(CSV, newline=''), 2)
+    assert [(entry['status'], entry['batch_id']) for entry in manifest['batches']] == \
+        [('error', None), ('ok', 22)]
+    assert manifest['batches'][0]['error'] == 'Bad CSV'
@@ -0,0 +1,90 @@
+import csv
+import io
+import math
+
+import pytest
+
+from turkle_client.exceptions import TurkleClientException
+from turkle_client.table import ResultsTable, infer_type, parse_timestamp
+
+RESULTS = """HITId,Input.zip,Answer.label,WorkTimeInSeconds,Answer.score,SubmitTime,Turkle.Username
+1,00123,cat,12,0.5,2025-06-18 19:37:26.328126+00:00,user1
+1,00124,dog,7,,2025-06-18 19:38:26.328126+00:00,user2
+2,00125,cat,30,1.5,,user1
+"""
+
+
+def make_table(types=None):
+    return ResultsTable.from_rows(csv.reader(io.StringIO(RESULTS)), types)
+
+
+def test_column_types():
+    table = make_table()
+    assert len(table) == 3
+    assert table['HITId'].type == 'int'
+    assert table['Input.zip'].type == 'category'
+    assert table['Answer.label'].type == 'category'
+    assert table['WorkTimeInSeconds'].type == 'int'
+    assert table['Answer.score'].type == 'float'
+    assert table['SubmitTime'].type == 'timestamp'
+
+def test_values():
+    table = make_table()
+    assert table['WorkTimeInSeconds'].values.typecode == 'q'
+    assert list(table['WorkTimeInSeconds']) == [12, 7, 30]
+    assert math.isnan(table['Answer.score'][1])
+    assert table['Answer.label'].categories == ['cat', 'dog']
+    assert list(table['Answer.label'].values) == [0, 1, 0]
+    assert table['Answer.label'].to_list() == ['cat', 'dog', 'cat']
+    assert table['SubmitTime'][1] - table['SubmitTime'][0] == pytest.approx(60)
+    assert math.isnan(table['SubmitTime'][2])
+
+def test_type_override():
+    table = make_table({'HITId': 'category'})
+    assert table['HITId'].to_list() == ['1', '1', '2']
+    with pytest.raises(TurkleClientException, match="Unrecognized column type"):
+        make_table({'HITId': 'decimal'})
+
+def test_rows():
+    row = next(make_table().rows())
+    assert row['Answer.label'] == 'cat'
+    assert row['WorkTimeInSeconds'] == 12
+
+def test_empty_csv():
+    table = ResultsTable.from_rows(iter([]))
+    assert len(table) == 0
+    assert table.column_names == []
+
+def test_infer_type():
+    assert infer_type(['1', '-2', '']) == 'int'
+    assert infer_type(['1', '2.5']) == 'float'
+    assert infer_type(['007']) == 'category'
+    assert infer_type(['2025-06-18']) == 'category'
+    assert infer_type(['Wed Jun 18 19:37:26 UTC 2025']) == 'timestamp'
+
+def test_parse_timestamp():
+    assert parse_timestamp('1970-01-01 00:01:00') == 60
+    assert parse_timestamp('yesterday') is None
+
+def test_to_numpy():
+    np = pytest.importorskip('numpy')
+    arrays = make_table().to_numpy()
+    assert arrays['WorkTimeInSeconds'].dtype == np.int64
+    assert list(arrays['Answer.label']) == ['cat', 'dog', 'cat']
+    assert np.isnat(arrays['SubmitTime'][2])
+
+def test_to_pandas():
+    pytest.importorskip('pandas')
+    df = make_table().to_pandas()
+    assert list(df.columns) == make_table().column_names
+    assert str(df['Answer.label'].dtype) == 'category'
+    assert df['WorkTimeInSeconds'].sum() == 49
+
+def test_to_parquet(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'results.parquet')
+    make_table().to_parquet(path)
+    arrow_table = pq.read_table(path)
+    assert arrow_table.num_rows == 3
+    assert arrow_table.column('Answer.label').to_pylist() == ['cat', 'dog', 'cat']
+    assert arrow_table.column('SubmitTime').null_count == 1
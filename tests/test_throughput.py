@@ -0,0 +1,103 @@
+import csv
+import io
+from unittest.mock import MagicMock
+
+import pytest
+
+from turkle_client.exceptions import TurkleClientException
+from turkle_client.table import ResultsTable
+
+np = pytest.importorskip('numpy')
+
+from turkle_client.throughput import ThroughputTracker  # noqa: E402
+
+HEADER = "AssignmentId,Turkle.Username,AcceptTime,SubmitTime,WorkTimeInSeconds\n"
+FIRST = (
+    "1,ann,2025-06-18 10:00:00+00:00,2025-06-18 10:01:00+00:00,60\n"
+    "2,ann,2025-06-18 10:01:00+00:00,2025-06-18 10:05:00+00:00,240\n"
+    "3,bob,2025-06-18 10:00:00+00:00,2025-06-18 11:30:00+00:00,\n"
+)
+SECOND = "4,ann,2025-06-18 12:00:00+00:00,2025-06-18 12:00:30+00:00,30\n"
+
+
+def make_table(rows):
+    return ResultsTable.from_rows(csv.reader(io.StringIO(HEADER + rows)))
+
+
+def test_summary_by_worker():
+    tracker = ThroughputTracker()
+    assert tracker.add_table(7, make_table(FIRST)) == 3
+    summary = {row['worker']: row for row in tracker.summary()}
+    assert summary['ann']['items'] == 2
+    assert summary['ann']['active_hours'] == 1
+    assert summary['ann']['items_per_hour'] == 2
+    assert summary['ann']['median_work_seconds'] == pytest.approx(150, rel=0.02)
+    assert summary['ann']['first_bin'] == '2025-06-18T10:00:00+00:00'
+    # work time falls back to submit - accept
+    assert summary['bob']['median_work_seconds'] == pytest.approx(5400, rel=0.02)
+
+def test_summary_by_batch():
+    tracker = ThroughputTracker()
+    tracker.add_table(7, make_table(FIRST))
+    summary = tracker.summary(by='batch')
+    assert summary[0]['batch'] == '7'
+    assert summary[0]['items'] == 3
+    assert summary[0]['active_hours'] == 2
+    with pytest.raises(TurkleClientException, match="Unrecognized throughput grouping"):
+        tracker.summary(by='project')
+
+def test_incremental_rerun_only_adds_new(tmp_path):
+    path = str(tmp_path / 'state.json')
+    tracker = ThroughputTracker()
+    tracker.add_table(7, make_table(FIRST))
+    tracker.save(path)
+
+    tracker = ThroughputTracker.load(path)
+    assert tracker.add_table(7, make_table(FIRST + SECOND)) == 1
+    summary = {row['worker']: row for row in tracker.summary()}
+    assert summary['ann']['items'] == 3
+    assert summary['ann']['active_hours'] == 2
+
+def test_state_must_match_options(tmp_path):
+    path = str(tmp_path / 'state.json')
+    tracker = ThroughputTracker(bin_seconds=900)
+    tracker.add_table(7, make_table(FIRST))
+    tracker.save(path)
+    assert ThroughputTracker.load(path, bin_seconds=None).bin_seconds == 900
+    with pytest.raises(TurkleClientException, match="saved with bin_seconds 900, not 3600"):
+        ThroughputTracker.load(path, bin_seconds=3600)
+    with pytest.raises(TurkleClientException, match="saved with worker_field Turkle.Username"):
+        ThroughputTracker.load(path, worker_field='Answer.worker')
+
+def test_work_times_are_summarized(tmp_path):
+    rows = ''.join(f"{i},ann,,2025-06-18 10:00:{i % 60:02d}+00:00,{i % 600}\n" for i in range(5000))
+    tracker = ThroughputTracker()
+    tracker.add_table(7, make_table(rows))
+    histogram = tracker.groups['worker']['ann']['work_histogram']
+    assert sum(histogram.values()) == 5000
+    assert len(histogram) < 300
+    median = np.median([i % 600 for i in range(5000)])
+    assert tracker.summary()[0]['median_work_seconds'] == pytest.approx(median, rel=0.02)
+
+def test_summary_without_work_times_is_json():
+    rows = "1,ann,,2025-06-18 10:01:00+00:00,\n"
+    tracker = ThroughputTracker()
+    tracker.add_table(7, make_table(rows))
+    assert tracker.summary()[0]['median_work_seconds'] is None
+
+def test_series_rolling_window():
+    tracker = ThroughputTracker()
+    tracker.add_table(7, make_table(FIRST + SECOND))
+    series = [row for row in tracker.series(window=3) if row['worker'] == 'ann']
+    assert [row['items'] for row in series] == [2, 1]
+    assert [row['items_per_hour'] for row in series] == [2 / 3, 1]
+    assert series[1]['bin'] == '2025-06-18T12:00:00+00:00'
+
+def test_add_batches_skips_unchanged():
+    client = MagicMock()
+    client.batches.progress.return_value = {'total_finished_task_assignments': 3}
+    client.batches.results_table.return_value = make_table(FIRST)
+    tracker = ThroughputTracker()
+    assert tracker.add_batches(client, [7]) == 3
+    assert tracker.add_batches(client, [7]) == 0
+    assert client.batches.results_table.call_count == 1
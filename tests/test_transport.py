@@ -0,0 +1,169 @@
+import json
+import sys
+import types
+
+import pytest
+
+from turkle_client.client import Client
+from turkle_client.exceptions import TurkleClientException
+from turkle_client.transport import Http2Session, get_transport, make_session
+
+
+class FakeHttpxResponse:
+    def __init__(self, url, status_code, content, content_type='application/json'):
+        self.url = url
+        self.status_code = status_code
+        self.headers = {'Content-Type': content_type}
+        self.charset_encoding = None
+        self.http_version = 'HTTP/2'
+        self._content = content
+        self.closed = False
+
+    def read(self):
+        return self._content
+
+    @property
+    def text(self):
+        return self._content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self._content)
+
+    def iter_bytes(self, chunk_size):
+        for i in range(0, len(self._content), chunk_size):
+            yield self._content[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+def fake_httpx(pages):
+    """Module with the parts of httpx used by Http2Session that answers from pages"""
+    httpx = types.ModuleType('httpx')
+
+    class TransportError(Exception):
+        pass
+
+    class TimeoutException(TransportError):
+        pass
+
+    class RemoteProtocolError(TransportError):
+        pass
+
+    class Client:
+        def __init__(self, http1=True, http2=False, limits=None):
+            self.http1 = http1
+            self.requests = []
+
+        def build_request(self, method, url, params=None, json=None, headers=None, timeout=None):
+            return {'method': method, 'url': url, 'json': json, 'headers': headers,
+                    'timeout': timeout}
+
+        def send(self, request, stream=False):
+            self.requests.append(request)
+            page = pages[request['url']]
+            if isinstance(page, list):
+                page = page.pop(0)
+            if isinstance(page, Exception):
+                raise page
+            return FakeHttpxResponse(request['url'], *page)
+
+        def close(self):
+            pass
+
+    httpx.Client = Client
+    httpx.Limits = lambda **kwargs: kwargs
+    httpx.Timeout = lambda read, connect=None: (connect, read)
+    httpx.TransportError = TransportError
+    httpx.TimeoutException = TimeoutException
+    httpx.RemoteProtocolError = RemoteProtocolError
+    httpx.pages = pages
+    return httpx
+
+
+@pytest.fixture
+def httpx(monkeypatch):
+    httpx = fake_httpx({})
+    monkeypatch.setitem(sys.modules, 'httpx', httpx)
+    monkeypatch.setitem(sys.modules, 'h2', types.ModuleType('h2'))
+    return httpx
+
+
+def test_get_transport():
+    assert get_transport(None) is make_session
+    assert get_transport('requests') is make_session
+
+    def transport(pool_size):
+        return None
+    assert get_transport(transport) is transport
+    with pytest.raises(TurkleClientException, match="Unknown transport http3"):
+        get_transport('http3')
+
+def test_http2_requires_extra(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'httpx', None)
+    with pytest.raises(TurkleClientException, match=r"turkle-client\[http2\]"):
+        Client('http://localhost', 'token', transport='http2').batches.progress(7)
+
+def test_http2_requests(httpx):
+    pages = httpx.pages
+    pages['http://localhost/api/batches/7/progress/'] = (200, b'{"total_tasks": 10}')
+    pages['http://localhost/api/batches/'] = (201, b'{"id": 8}')
+    client = Client('http://localhost', 'token', transport='http2', timeout=(3, 20))
+    assert client.batches.progress(7) == {'total_tasks': 10}
+    assert client.batches.create({'name': 'b'}) == {'id': 8}
+
+    session = client.pool.session
+    assert isinstance(session, Http2Session)
+    # plain http sites may only speak HTTP/1.1
+    assert session.client.http1 is True
+    get, post = session.client.requests
+    assert get['headers'] == {'Authorization': 'Token token'}
+    assert get['timeout'] == (3, 20)
+    assert post['method'] == 'POST' and post['json'] == {'name': 'b'}
+
+def test_h2c_uses_prior_knowledge_for_plain_http(httpx):
+    httpx.pages['http://localhost/api/batches/7/progress/'] = (200, b'{}')
+    client = Client('http://localhost', 'token', transport='h2c')
+    client.batches.progress(7)
+    assert client.pool.session.client.http1 is False
+    assert len(client.pool.session.client.requests) == 1
+
+def test_http2_https_uses_negotiating_client(httpx):
+    pages = httpx.pages
+    pages['https://turkle.example.org/api/batches/7/progress/'] = (200, b'{}')
+    client = Client('https://turkle.example.org', 'token', transport='http2')
+    client.batches.progress(7)
+    assert len(client.pool.session.https_client.requests) == 1
+    assert client.pool.session.client.requests == []
+
+def test_http2_streams_results(httpx):
+    pages = httpx.pages
+    csv_data = 'a,b\n1,"x\ny"\n2,é\n'.encode('utf-8')
+    pages['http://localhost/api/batches/7/results/'] = (200, csv_data, 'text/csv')
+    client = Client('http://localhost', 'token', transport='http2')
+    assert list(client.batches.iter_results(7)) == [
+        {'a': '1', 'b': 'x\ny'}, {'a': '2', 'b': 'é'}]
+
+def test_http2_errors(httpx):
+    pages = httpx.pages
+    pages['http://localhost/api/batches/7/progress/'] = httpx.TimeoutException('read')
+    pages['http://localhost/api/batches/8/progress/'] = httpx.TransportError('refused')
+    pages['http://localhost/api/batches/9/progress/'] = (404, b'{"detail": "Not found."}')
+    client = Client('http://localhost', 'token', transport='http2', retries=0)
+    with pytest.raises(TurkleClientException, match="timed out"):
+        client.batches.progress(7)
+    with pytest.raises(TurkleClientException, match="Unable to connect"):
+        client.batches.progress(8)
+    with pytest.raises(TurkleClientException, match="Not found"):
+        client.batches.progress(9)
+
+def test_http2_resends_gets_on_closed_connection(httpx):
+    pages = httpx.pages
+    closed = httpx.RemoteProtocolError('ConnectionTerminated')
+    pages['http://localhost/api/batches/7/progress/'] = [closed, (200, b'{"total_tasks": 10}')]
+    pages['http://localhost/api/batches/'] = [closed, (201, b'{"id": 8}')]
+    client = Client('http://localhost', 'token', transport='h2c')
+    assert client.batches.progress(7) == {'total_tasks': 10}
+    with pytest.raises(TurkleClientException, match="Unable to connect"):
+        client.batches.create({'name': 'b'})
+    assert len(client.pool.session.client.requests) == 3
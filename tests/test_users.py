@@ -35,6 +35,13 @@ def test_list():
     users = client.list()
     assert len(users) == 6
 
+@my_vcr.use_cassette('test_list')
+def test_list_records():
+    client = Users(url, token)
+    users = client.list(records=True)
+    assert len(users) == 6
+    assert users[0].username == users[0]['username'] == 'AnonymousUser'
+
 @my_vcr.use_cassette()
 def test_create():
     client = Users(url, token)
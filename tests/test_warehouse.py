@@ -0,0 +1,101 @@
+from unittest.mock import MagicMock
+
+from turkle_client.warehouse import Warehouse
+
+
+def make_client(finished=1):
+    client = MagicMock()
+    client.projects.list.return_value = [
+        {'id': 1, 'name': 'Translate', 'html_template': '<p>big</p>'},
+        {'id': 2, 'name': 'Image Contains', 'html_template': '<p>big</p>'},
+    ]
+    client.projects.batches.side_effect = lambda pid: {
+        1: [{'id': 10, 'project': 1, 'name': 'Dickens', 'active': True, 'completed': False}],
+        2: [{'id': 20, 'project': 2, 'name': 'Birds', 'active': True, 'completed': False}],
+    }[pid]
+    client.batches.progress.return_value = {
+        'total_tasks': 2, 'total_task_assignments': 2,
+        'total_finished_tasks': finished, 'total_finished_task_assignments': finished,
+    }
+    client.batches.input.return_value = "text\nhello\nworld\n"
+    client.batches.results.return_value = (
+        "Input.text,Answer.translation,Turkle.Username\n"
+        "hello,hola,user1\n"
+    )
+    return client
+
+
+def test_sync_loads_tables(tmp_path):
+    warehouse = Warehouse(make_client(), str(tmp_path / 'w.db'))
+    stats = warehouse.sync()
+    assert stats == {'projects': 2, 'batches': 2, 'refreshed': 2, 'unchanged': 0,
+                     'removed': 0}
+    rows = warehouse.query('SELECT * FROM project_1_results')
+    assert rows == [{'batch_id': 10, 'row_number': 1, 'Input.text': 'hello',
+                     'Answer.translation': 'hola', 'Turkle.Username': 'user1'}]
+    assert len(warehouse.query('SELECT * FROM project_2_input')) == 2
+    batch = warehouse.query('SELECT * FROM batches WHERE id = 20')[0]
+    assert batch['project_id'] == 2
+    assert batch['total_finished_tasks'] == 1
+    project = warehouse.query('SELECT data FROM projects WHERE id = 1')[0]
+    assert 'html_template' not in project['data']
+
+def test_sync_skips_unchanged_batches(tmp_path):
+    path = str(tmp_path / 'w.db')
+    Warehouse(make_client(), path).sync()
+    client = make_client()
+    stats = Warehouse(client, path).sync()
+    assert stats['refreshed'] == 0
+    assert stats['unchanged'] == 2
+    client.batches.results.assert_not_called()
+
+def test_sync_refreshes_changed_batches(tmp_path):
+    path = str(tmp_path / 'w.db')
+    Warehouse(make_client(), path).sync()
+    client = make_client(finished=2)
+    client.batches.results.return_value = (
+        "Input.text,Answer.translation,Turkle.Username,Answer.comment\n"
+        "hello,hola,user1,\n"
+        "world,mundo,user2,easy\n"
+    )
+    warehouse = Warehouse(client, path)
+    stats = warehouse.sync(project_ids=[1])
+    assert stats == {'projects': 1, 'batches': 1, 'refreshed': 1, 'unchanged': 0,
+                     'removed': 0}
+    rows = warehouse.query('SELECT "Answer.comment" FROM project_1_results ORDER BY row_number')
+    assert [row['Answer.comment'] for row in rows] == ['', 'easy']
+
+def test_columns_differing_in_case_share_a_column(tmp_path):
+    path = str(tmp_path / 'w.db')
+    Warehouse(make_client(), path).sync()
+    client = make_client(finished=2)
+    client.batches.results.return_value = (
+        "Input.text,Answer.Translation,Turkle.Username\n"
+        "world,mundo,user2\n"
+    )
+    warehouse = Warehouse(client, path)
+    warehouse.sync(project_ids=[1])
+    rows = warehouse.query('SELECT "Answer.translation" FROM project_1_results')
+    assert rows == [{'Answer.translation': 'mundo'}]
+
+def test_sync_removes_deleted_batches(tmp_path):
+    path = str(tmp_path / 'w.db')
+    Warehouse(make_client(), path).sync()
+    client = make_client()
+    client.projects.batches.side_effect = lambda pid: {
+        1: [],
+        2: [{'id': 20, 'project': 2, 'name': 'Birds', 'active': True, 'completed': False}],
+    }[pid]
+    warehouse = Warehouse(client, path)
+    assert warehouse.sync(project_ids=[2])['removed'] == 0
+    assert warehouse.sync()['removed'] == 1
+    assert warehouse.query('SELECT COUNT(*) AS n FROM project_1_results') == [{'n': 0}]
+    assert warehouse.query('SELECT COUNT(*) AS n FROM project_1_input') == [{'n': 0}]
+    assert [row['id'] for row in warehouse.query('SELECT id FROM batches')] == [20]
+
+def test_query_with_params(tmp_path):
+    warehouse = Warehouse(make_client(), str(tmp_path / 'w.db'))
+    warehouse.sync()
+    rows = warehouse.query(
+        'SELECT COUNT(*) AS n FROM project_2_results WHERE "Turkle.Username" = ?', ['user1'])
+    assert rows == [{'n': 1}]
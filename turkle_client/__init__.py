@@ -1,4 +1,40 @@
+import importlib
+
 from .__version__ import __version__
-from .client import Batches, Client, Groups, Permissions, Projects, Users
 from .exceptions import TurkleClientException
-from .monitor import BatchMonitor
\ No newline at end of file
+
+# classes are imported from their modules when first used so that the
+# command line can hand a command to a running daemon without loading requests
+_exports = {
+    'LabelAggregator': 'aggregation',
+    'Applier': 'apply',
+    'AccessAudit': 'audit',
+    'Batches': 'client',
+    'Client': 'client',
+    'ConnectionPool': 'client',
+    'Groups': 'client',
+    'Permissions': 'client',
+    'Projects': 'client',
+    'Users': 'client',
+    'Mirror': 'mirror',
+    'BatchMonitor': 'monitor',
+    'PagedList': 'pages',
+    'GoldScorer': 'scoring',
+    'ResultsTable': 'table',
+    'ThroughputTracker': 'throughput',
+    'Warehouse': 'warehouse',
+}
+
+__all__ = ['__version__', 'TurkleClientException'] + list(_exports)
+
+
+def __getattr__(name):
+    if name in _exports:
+        value = getattr(importlib.import_module(f'.{_exports[name]}', __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports))
@@ -0,0 +1,361 @@
+from array import array
+
+from .exceptions import TurkleClientException
+from .optional import import_optional
+from .parallel import DEFAULT_WORKERS, bounded_map
+from .table import CATEGORY, encode_column, value_key
+
+TASK_FIELD = 'HITId'
+WORKER_FIELD = 'Turkle.Username'
+ASSIGNMENT_FIELD = 'AssignmentId'
+
+
+class LabelAggregator:
+    """
+    Label aggregation and inter-annotator agreement over batch results
+
+    Assignments are stored as integer codes for task, worker and label so that
+    the statistics are computed with vectorized NumPy operations on a task by
+    label count matrix. Tasks, workers and labels are indexed by their string
+    form so rows, typed tables and csv tables share codes. New assignments can be added at any time and are
+    de-duplicated by assignment id, so the results of a batch can be re-added
+    as it progresses:
+      aggregator = LabelAggregator('Answer.sentiment')
+      aggregator.add_batch(client, 17)
+      aggregator.fleiss_kappa()
+      aggregator.labels()
+    """
+    def __init__(self, label_field, task_field=TASK_FIELD, worker_field=WORKER_FIELD,
+                 assignment_field=ASSIGNMENT_FIELD):
+        """Construct an aggregator
+
+        Args:
+            label_field (str): Results column with the label like Answer.category
+            task_field (str): Results column identifying the task
+            worker_field (str): Results column identifying the annotator
+            assignment_field (str): Results column used to skip assignments already added
+        """
+        self.label_field = label_field
+        self.task_field = task_field
+        self.worker_field = worker_field
+        self.assignment_field = assignment_field
+        self.task_index = {}
+        self.worker_index = {}
+        self.label_index = {}
+        self.seen_assignments = set()
+        self.task_codes = array('i')
+        self.worker_codes = array('i')
+        self.label_codes = array('i')
+
+    def __len__(self):
+        return len(self.label_codes)
+
+    @property
+    def tasks(self):
+        return list(self.task_index)
+
+    @property
+    def workers(self):
+        return list(self.worker_index)
+
+    @property
+    def categories(self):
+        return list(self.label_index)
+
+    @staticmethod
+    def _code(index, value):
+        key = value_key(value)
+        code = index.get(key)
+        if code is None:
+            code = index[key] = len(index)
+        return code
+
+    def add(self, task, worker, label, assignment=None):
+        """Add a single assignment
+
+        Args:
+            task: Task identifier
+            worker: Annotator identifier
+            label: Label given by the annotator (empty labels are skipped)
+            assignment: Optional assignment id used to skip duplicates
+
+        Returns:
+            bool: whether the assignment was added
+        """
+        if label is None or label == '':
+            return False
+        if assignment is not None:
+            if assignment in self.seen_assignments:
+                return False
+            self.seen_assignments.add(assignment)
+        self.task_codes.append(self._code(self.task_index, task))
+        self.worker_codes.append(self._code(self.worker_index, worker))
+        self.label_codes.append(self._code(self.label_index, label))
+        return True
+
+    def add_rows(self, rows):
+        """Add assignments from result row dicts like those from Batches.iter_results
+
+        Args:
+            rows (Iterable): result row dicts
+
+        Returns:
+            int: number of assignments added
+        """
+        return sum(self.add(row[self.task_field], row[self.worker_field], row.get(self.label_field),
+                            row.get(self.assignment_field))
+                   for row in rows)
+
+    def add_table(self, table):
+        """Add assignments from a ResultsTable with vectorized code remapping
+
+        Args:
+            table (ResultsTable): results table with the task, worker and label columns
+
+        Returns:
+            int: number of assignments added
+        """
+        np = import_optional('numpy', 'numpy')
+        for field in [self.task_field, self.worker_field, self.label_field]:
+            if field not in table:
+                raise TurkleClientException(f"Results are missing the {field} column")
+        if len(table) == 0:
+            return 0
+
+        labels = encode_column(table[self.label_field], self.label_index, skip_empty=True)
+        keep = labels >= 0
+        if self.assignment_field in table:
+            # like add, an assignment without a label is not marked as seen so a later batch can add it
+            assignments = table[self.assignment_field].to_list()
+            seen = self.seen_assignments
+            for i in np.flatnonzero(keep).tolist():
+                if assignments[i] in seen:
+                    keep[i] = False
+                else:
+                    seen.add(assignments[i])
+        tasks = encode_column(table[self.task_field], self.task_index)[keep]
+        workers = encode_column(table[self.worker_field], self.worker_index)[keep]
+        self.task_codes.frombytes(tasks.astype(np.int32).tobytes())
+        self.worker_codes.frombytes(workers.astype(np.int32).tobytes())
+        self.label_codes.frombytes(labels[keep].astype(np.int32).tobytes())
+        return int(keep.sum())
+
+    def add_batch(self, client, batch_id):
+        """Download the results of a batch and add its assignments
+
+        Args:
+            client (Client): Turkle client instance
+            batch_id (int): Batch id
+
+        Returns:
+            int: number of assignments added
+        """
+        return self.add_batches(client, [batch_id])
+
+    def add_batches(self, client, batch_ids, max_workers=DEFAULT_WORKERS):
+        """Download the results of several batches concurrently and add their assignments
+
+        Args:
+            client (Client): Turkle client instance
+            batch_ids (list): Batch ids
+            max_workers (int): Number of concurrent downloads
+
+        Returns:
+            int: number of assignments added
+        """
+        types = {field: CATEGORY for field in
+                 [self.task_field, self.worker_field, self.label_field, self.assignment_field]}
+        tables = bounded_map(lambda batch_id: client.batches.results_table(batch_id, types=types),
+                             batch_ids, max_workers)
+        return sum(self.add_table(table) for table in tables)
+
+    def _arrays(self):
+        np = import_optional('numpy', 'numpy')
+        return (np,
+                np.frombuffer(self.task_codes, dtype=np.int32),
+                np.frombuffer(self.worker_codes, dtype=np.int32),
+                np.frombuffer(self.label_codes, dtype=np.int32))
+
+    def count_matrix(self):
+        """Count of each label for each task
+
+        Returns:
+            numpy.ndarray: tasks by categories matrix of counts
+        """
+        np, tasks, _, labels = self._arrays()
+        num_tasks, num_labels = len(self.task_index), len(self.label_index)
+        flat = np.bincount(tasks.astype(np.int64) * num_labels + labels,
+                           minlength=num_tasks * num_labels)
+        return flat.reshape(num_tasks, num_labels)
+
+    def labels(self):
+        """Plurality label for each task
+
+        Returns:
+            list: dicts with task, label, votes, total, majority (more than half) and tie
+        """
+        counts = self.count_matrix()
+        if counts.size == 0:
+            return []
+        votes = counts.max(axis=1)
+        totals = counts.sum(axis=1)
+        ties = (counts == votes[:, None]).sum(axis=1) > 1
+        categories = self.categories
+        return [
+            {'task': task, 'label': categories[label], 'votes': vote, 'total': total,
+             'majority': 2 * vote > total, 'tie': tie}
+            for task, label, vote, total, tie in zip(self.task_index, counts.argmax(axis=1).tolist(),
+                                                     votes.tolist(), totals.tolist(), ties.tolist())
+            if total > 0
+        ]
+
+    def fleiss_kappa(self):
+        """Fleiss' kappa over tasks with at least two labels
+
+        Tasks may have different numbers of labels.
+
+        Returns:
+            float: kappa or nan if it cannot be computed
+        """
+        np = import_optional('numpy', 'numpy')
+        counts = self.count_matrix().astype(np.float64)
+        n = counts.sum(axis=1)
+        counts, n = counts[n >= 2], n[n >= 2]
+        if len(n) == 0:
+            return float('nan')
+        p_item = ((counts ** 2).sum(axis=1) - n) / (n * (n - 1))
+        p_label = counts.sum(axis=0) / n.sum()
+        p_expected = (p_label ** 2).sum()
+        if p_expected == 1:
+            return float('nan')
+        return float((p_item.mean() - p_expected) / (1 - p_expected))
+
+    def krippendorff_alpha(self):
+        """Krippendorff's alpha for nominal labels
+
+        Returns:
+            float: alpha or nan if it cannot be computed
+        """
+        np = import_optional('numpy', 'numpy')
+        counts = self.count_matrix().astype(np.float64)
+        m = counts.sum(axis=1)
+        counts, m = counts[m >= 2], m[m >= 2]
+        if len(m) == 0:
+            return float('nan')
+        # coincidence matrix: each pair of labels within a task weighted by 1/(m-1)
+        weighted = counts / (m - 1)[:, None]
+        coincidence = weighted.T @ counts - np.diag(weighted.sum(axis=0))
+        n_c = coincidence.sum(axis=1)
+        n = n_c.sum()
+        observed = coincidence.sum() - np.trace(coincidence)
+        expected = (n ** 2 - (n_c ** 2).sum()) / (n - 1)
+        if expected == 0:
+            return float('nan')
+        return float(1 - observed / expected)
+
+    def cohen_kappa(self, worker_a, worker_b):
+        """Cohen's kappa between two annotators over their shared tasks
+
+        Args:
+            worker_a: first annotator
+            worker_b: second annotator
+
+        Returns:
+            float: kappa or nan if they share no tasks
+        """
+        np, tasks, workers, labels = self._arrays()
+        worker_a, worker_b = value_key(worker_a), value_key(worker_b)
+        if worker_a not in self.worker_index or worker_b not in self.worker_index:
+            return float('nan')
+        mask_a = workers == self.worker_index[worker_a]
+        mask_b = workers == self.worker_index[worker_b]
+        return self._cohen(np, tasks[mask_a], labels[mask_a], tasks[mask_b], labels[mask_b])[0]
+
+    def _cohen(self, np, tasks_a, labels_a, tasks_b, labels_b):
+        _, index_a, index_b = np.intersect1d(tasks_a, tasks_b, return_indices=True)
+        total = len(index_a)
+        if total == 0:
+            return float('nan'), 0
+        num_labels = len(self.label_index)
+        confusion = np.bincount(labels_a[index_a].astype(np.int64) * num_labels + labels_b[index_b],
+                                minlength=num_labels * num_labels).reshape(num_labels, num_labels)
+        p_observed = np.trace(confusion) / total
+        p_expected = (confusion.sum(axis=1) * confusion.sum(axis=0)).sum() / total ** 2
+        if p_expected == 1:
+            return float('nan'), total
+        return float((p_observed - p_expected) / (1 - p_expected)), total
+
+    def pairwise_cohen_kappa(self, min_shared=1):
+        """Cohen's kappa for each pair of annotators that share tasks
+
+        Args:
+            min_shared (int): Minimum number of shared tasks for a pair to be included
+
+        Returns:
+            list: dicts with worker_a, worker_b, shared and kappa
+        """
+        np, tasks, workers, labels = self._arrays()
+        names = self.workers
+        num_workers, num_labels = len(names), len(self.label_index)
+        # sort by task and worker and keep the first label of a worker on a task like cohen_kappa
+        order = np.lexsort((workers, tasks))
+        tasks, workers, labels = tasks[order], workers[order], labels[order]
+        first = np.ones(len(tasks), dtype=bool)
+        first[1:] = (tasks[1:] != tasks[:-1]) | (workers[1:] != workers[:-1])
+        tasks, workers, labels = tasks[first], workers[first], labels[first]
+
+        # every pair of assignments on the same task, d apart in the sorted order
+        firsts, seconds = [], []
+        for d in range(1, len(tasks)):
+            same = np.flatnonzero(tasks[d:] == tasks[:-d])
+            if len(same) == 0:
+                break
+            firsts.append(same)
+            seconds.append(same + d)
+        if not firsts:
+            return []
+        a_index, b_index = np.concatenate(firsts), np.concatenate(seconds)
+        worker_a, worker_b = workers[a_index].astype(np.int64), workers[b_index].astype(np.int64)
+        label_a, label_b = labels[a_index].astype(np.int64), labels[b_index].astype(np.int64)
+
+        # confusion statistics of each pair of annotators from one group-by
+        pair_keys, pair = np.unique(worker_a * num_workers + worker_b, return_inverse=True)
+        pair = pair.reshape(-1)
+        num_pairs = len(pair_keys)
+        shared = np.bincount(pair, minlength=num_pairs)
+        agreed = np.bincount(pair, weights=label_a == label_b, minlength=num_pairs)
+        counts_a = np.bincount(pair * num_labels + label_a, minlength=num_pairs * num_labels)
+        counts_b = np.bincount(pair * num_labels + label_b, minlength=num_pairs * num_labels)
+        expected = (counts_a * counts_b).reshape(num_pairs, num_labels).sum(axis=1) / shared ** 2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            kappas = np.where(expected == 1, np.nan, (agreed / shared - expected) / (1 - expected))
+
+        pairs = []
+        for key, count, kappa in zip(pair_keys.tolist(), shared.tolist(), kappas.tolist()):
+            if count >= min_shared:
+                a, b = divmod(key, num_workers)
+                pairs.append({'worker_a': names[a], 'worker_b': names[b], 'shared': count,
+                              'kappa': kappa})
+        return pairs
+
+    def summary(self):
+        """Agreement statistics for the assignments added so far
+
+        Statistics that cannot be computed are None so the summary can be written as json.
+
+        Returns:
+            dict: counts and agreement statistics
+        """
+        kappas = [pair['kappa'] for pair in self.pairwise_cohen_kappa()
+                  if pair['kappa'] == pair['kappa']]
+        stats = {
+            'fleiss_kappa': self.fleiss_kappa(),
+            'krippendorff_alpha': self.krippendorff_alpha(),
+            'mean_cohen_kappa': sum(kappas) / len(kappas) if kappas else float('nan'),
+        }
+        return {
+            'tasks': len(self.task_index),
+            'workers': len(self.worker_index),
+            'assignments': len(self),
+            **{name: None if value != value else value for name, value in stats.items()},
+        }
@@ -0,0 +1,343 @@
+import json
+import os.path
+
+from .client import Permissions
+from .exceptions import TurkleClientException
+from .optional import import_optional
+from .parallel import DEFAULT_WORKERS, bounded_map
+from .schema import USER_READ_ONLY_FIELDS
+
+# fields that are never compared when diffing users
+USER_IGNORED_FIELDS = {'id', 'username', 'password', *USER_READ_ONLY_FIELDS}
+
+CREATE_USER = 'create user'
+UPDATE_USER = 'update user'
+CREATE_GROUP = 'create group'
+ADD_GROUP_USERS = 'add users to group'
+ADD_PERMISSIONS = 'add permissions'
+REPLACE_PERMISSIONS = 'replace permissions'
+
+# actions in a phase are independent of each other and can run concurrently
+PHASES = [
+    [CREATE_USER, UPDATE_USER],
+    [CREATE_GROUP, ADD_GROUP_USERS],
+    [ADD_PERMISSIONS, REPLACE_PERMISSIONS],
+]
+
+
+def load_state(file_path):
+    """Load a desired state file
+
+    A yaml or json file has top level users, groups and permissions lists.
+    A jsonl file has one object per line with a kind field of user, group or permissions.
+
+    Args:
+        file_path (str): Path to a .yaml, .yml, .json or .jsonl file
+
+    Returns:
+        dict: users, groups and permissions lists
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    state = {'users': [], 'groups': [], 'permissions': []}
+    try:
+        with open(file_path, 'r', encoding='utf-8') as fh:
+            if ext in ['.yaml', '.yml']:
+                yaml = import_optional('yaml', 'yaml')
+                data = yaml.safe_load(fh) or {}
+            elif ext == '.json':
+                data = json.load(fh)
+            elif ext == '.jsonl':
+                kinds = {'user': 'users', 'group': 'groups', 'permissions': 'permissions'}
+                for lineno, line in enumerate(fh, start=1):
+                    if not line.strip():
+                        continue
+                    obj = json.loads(line)
+                    kind = obj.pop('kind', None)
+                    if kind not in kinds:
+                        raise ValueError(f"Unknown kind {kind!r} on line {lineno} in {file_path}")
+                    state[kinds[kind]].append(obj)
+                return state
+            else:
+                raise ValueError(f"Unsupported file format: {ext}")
+    except OSError as e:
+        raise ValueError(f"Could not open file {file_path}: {e}")
+    for key in state:
+        state[key] = list(data.get(key) or [])
+    return state
+
+
+def normalize(value, current):
+    # csv files give strings so match them to the type on the server before comparing
+    if isinstance(current, bool) and isinstance(value, str):
+        return value.strip().lower() in ['true', '1', 'yes']
+    if value is None and current == '':
+        return ''
+    return value
+
+
+def diff_user(current, desired):
+    """Fields of a user that differ from the desired record
+
+    Args:
+        current (dict): user from the server
+        desired (dict): desired user fields
+
+    Returns:
+        dict: changed fields with their desired values
+    """
+    changes = {}
+    for key, value in desired.items():
+        if key in USER_IGNORED_FIELDS:
+            continue
+        value = normalize(value, current.get(key))
+        if current.get(key) != value:
+            changes[key] = value
+    return changes
+
+
+def writable_user(record):
+    """Copy of a user record without the read-only fields that users list writes"""
+    return {key: value for key, value in record.items() if key not in USER_READ_ONLY_FIELDS}
+
+
+def upsert_users(users_client, records, max_workers=DEFAULT_WORKERS):
+    """Create or update users keyed by username
+
+    The current users are listed once and indexed by username. Each record is
+    classified as a create, an update of only the changed fields, or unchanged,
+    and the needed requests are sent concurrently.
+
+    Args:
+        users_client (Users): Users client
+        records (Iterable): user dicts with at least a username
+        max_workers (int): Number of concurrent requests
+
+    Returns:
+        dict: counts of created, updated and unchanged users
+    """
+    current = {user['username']: user for user in users_client.list()}
+    seen = set()
+    requests = []
+    created = unchanged = 0
+    for lineno, record in enumerate(records, start=1):
+        username = record.get('username')
+        if not username:
+            raise TurkleClientException(f"Missing username on line {lineno}")
+        if username in seen:
+            raise TurkleClientException(f"Duplicate username {username} on line {lineno}")
+        seen.add(username)
+        if username not in current:
+            if not record.get('password'):
+                raise TurkleClientException(f"New user {username} on line {lineno} needs a password")
+            requests.append((lineno, users_client.create, writable_user(record)))
+            created += 1
+            continue
+        changes = diff_user(current[username], record)
+        if changes:
+            requests.append((lineno, users_client.update, {'id': current[username]['id'], **changes}))
+        else:
+            unchanged += 1
+
+    def send(request):
+        lineno, method, data = request
+        try:
+            return method(data)
+        except TurkleClientException as e:
+            raise TurkleClientException(f"Failure on line {lineno}: {e}")
+
+    for _ in bounded_map(send, requests, max_workers):
+        pass
+    return {'created': created, 'updated': len(requests) - created, 'unchanged': unchanged}
+
+
+class Applier:
+    """
+    Converges users, groups and permissions to a desired state
+
+    The current state is fetched with concurrent requests and indexed so the
+    diff is computed with dictionary lookups. Only the needed create, update,
+    add and replace calls are sent, concurrently within each phase (users,
+    then groups, then permissions):
+      applier = Applier(client)
+      actions = applier.plan(load_state('state.yaml'))
+      applier.execute(actions)
+
+    Turkle can only add users to a group, so users in a group that are not in
+    the desired state are reported but not removed.
+    """
+    def __init__(self, client, max_workers=DEFAULT_WORKERS):
+        """Construct an applier
+
+        Args:
+            client (Client): Turkle client instance
+            max_workers (int): Number of concurrent requests
+        """
+        self.client = client
+        self.max_workers = max_workers
+        self.warnings = []
+
+    def fetch(self, state):
+        """Fetch and index the current users, groups, projects, batches and targeted permissions
+
+        Args:
+            state (dict): desired state from load_state
+        """
+        sections = ['users', 'groups', 'projects', 'batches']
+        lists = dict(zip(sections, bounded_map(
+            lambda section: getattr(self.client, section).list(), sections, self.max_workers)))
+        self.users = {user['username']: user for user in lists['users']}
+        self.user_names = {user['id']: user['username'] for user in lists['users']}
+        self.groups = {}
+        for group in lists['groups']:
+            if group['name'] in self.groups:
+                self.warnings.append(f"More than one group is named {group['name']}")
+            self.groups.setdefault(group['name'], group)
+        self.group_names = {group['id']: group['name'] for group in lists['groups']}
+        self.targets = {
+            Permissions.PROJECT: self._name_index(lists['projects']),
+            Permissions.BATCH: self._name_index(lists['batches']),
+        }
+        targets = [self._target(perm) for perm in state['permissions']]
+        self.permissions = dict(zip(targets, bounded_map(
+            lambda target: self.client.permissions.retrieve(*target), targets, self.max_workers)))
+
+    @staticmethod
+    def _name_index(objs):
+        index = {obj['id']: obj['id'] for obj in objs}
+        for obj in objs:
+            index.setdefault(obj['name'], obj['id'])
+        return index
+
+    def _target(self, perm):
+        for instance_type in [Permissions.PROJECT, Permissions.BATCH]:
+            if instance_type in perm:
+                key = perm[instance_type]
+                if key not in self.targets[instance_type]:
+                    raise TurkleClientException(f"Unknown {instance_type}: {key}")
+                return instance_type, self.targets[instance_type][key]
+        raise TurkleClientException(f"Permissions need a project or batch: {perm}")
+
+    def _username(self, ref):
+        # users can be referenced by username or id
+        return self.user_names.get(ref, ref) if isinstance(ref, int) else ref
+
+    def _group_name(self, ref):
+        return self.group_names.get(ref, ref) if isinstance(ref, int) else ref
+
+    def plan(self, state):
+        """Compute the actions needed to reach the desired state
+
+        Args:
+            state (dict): desired state from load_state
+
+        Returns:
+            list: action dicts with op, target, data and description
+        """
+        self.fetch(state)
+        actions = []
+        new_users = set()
+        for user in state['users']:
+            username = user['username']
+            if username not in self.users:
+                if not user.get('password'):
+                    raise TurkleClientException(f"New user {username} needs a password")
+                new_users.add(username)
+                # the same fields as users upsert so a users list file can be applied
+                actions.append(self._action(CREATE_USER, username, writable_user(user),
+                                            f"create user {username}"))
+            else:
+                changes = diff_user(self.users[username], user)
+                if changes:
+                    actions.append(self._action(UPDATE_USER, username, changes,
+                                                f"update user {username}: {', '.join(sorted(changes))}"))
+
+        known_users = set(self.users) | new_users
+        new_groups = set()
+        for group in state['groups']:
+            name = group['name']
+            members = [self._username(ref) for ref in group.get('users', [])]
+            unknown = [ref for ref in members if ref not in known_users]
+            if unknown:
+                raise TurkleClientException(f"Group {name} has unknown users: {unknown}")
+            if name not in self.groups:
+                new_groups.add(name)
+                actions.append(self._action(CREATE_GROUP, name, members,
+                                            f"create group {name} with {len(members)} users"))
+                continue
+            current = {self.user_names.get(user_id) for user_id in self.groups[name]['users']}
+            missing = [username for username in members if username not in current]
+            if missing:
+                actions.append(self._action(ADD_GROUP_USERS, name, missing,
+                                            f"add {len(missing)} users to group {name}"))
+            extra = current - set(members)
+            if extra:
+                self.warnings.append(f"Group {name} has users that cannot be removed: {sorted(extra)}")
+
+        known_groups = set(self.groups) | new_groups
+        for perm in state['permissions']:
+            target = self._target(perm)
+            users = {self._username(ref) for ref in perm.get('users', [])}
+            groups = {self._group_name(ref) for ref in perm.get('groups', [])}
+            unknown = sorted(users - known_users) + sorted(groups - known_groups)
+            if unknown:
+                raise TurkleClientException(f"Permissions for {target[0]} {target[1]} have unknown "
+                                            f"users or groups: {unknown}")
+            current = self.permissions[target]
+            current_users = {self.user_names.get(user_id) for user_id in current['users']}
+            current_groups = {self.group_names.get(group_id) for group_id in current['groups']}
+            if users == current_users and groups == current_groups:
+                continue
+            data = {'users': sorted(users), 'groups': sorted(groups)}
+            if users >= current_users and groups >= current_groups:
+                data = {'users': sorted(users - current_users), 'groups': sorted(groups - current_groups)}
+                actions.append(self._action(ADD_PERMISSIONS, target, data,
+                                            f"add permissions to {target[0]} {target[1]}"))
+            else:
+                actions.append(self._action(REPLACE_PERMISSIONS, target, data,
+                                            f"replace permissions of {target[0]} {target[1]}"))
+        return actions
+
+    @staticmethod
+    def _action(op, target, data, description):
+        return {'op': op, 'target': target, 'data': data, 'description': description}
+
+    def execute(self, actions):
+        """Send the actions to the server
+
+        Args:
+            actions (list): actions from plan
+
+        Returns:
+            int: number of actions executed
+        """
+        count = 0
+        for phase in PHASES:
+            phase_actions = [action for action in actions if action['op'] in phase]
+            for action, result in zip(phase_actions,
+                                      bounded_map(self._send, phase_actions, self.max_workers)):
+                # record new ids so later phases can refer to them
+                if action['op'] == CREATE_USER:
+                    self.users[result['username']] = result
+                elif action['op'] == CREATE_GROUP:
+                    self.groups[result['name']] = result
+                count += 1
+        return count
+
+    def _send(self, action):
+        op, target, data = action['op'], action['target'], action['data']
+        if op == CREATE_USER:
+            return self.client.users.create(data)
+        elif op == UPDATE_USER:
+            return self.client.users.update({'id': self.users[target]['id'], **data})
+        elif op == CREATE_GROUP:
+            return self.client.groups.create({'name': target, 'users': self._user_ids(data)})
+        elif op == ADD_GROUP_USERS:
+            return self.client.groups.add_users(self.groups[target]['id'], self._user_ids(data))
+        ids = {'users': self._user_ids(data['users']),
+               'groups': [self.groups[name]['id'] for name in data['groups']]}
+        if op == ADD_PERMISSIONS:
+            return self.client.permissions.add(*target, ids)
+        return self.client.permissions.replace(*target, ids)
+
+    def _user_ids(self, usernames):
+        return [self.users[username]['id'] for username in usernames]
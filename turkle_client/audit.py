@@ -0,0 +1,243 @@
+import json
+import os
+
+from .client import Permissions
+from .exceptions import TurkleClientException
+from .parallel import DEFAULT_WORKERS, bounded_map
+
+
+class AccessAudit:
+    """
+    Index of which users can work on each project and batch
+
+    Users, groups, projects and batches are listed once and the permissions of
+    every project and batch with custom permissions are fetched concurrently.
+    Groups are expanded to their users and a batch is only available to users
+    that have access to both the batch and its project. The result is an
+    inverted index that answers queries without more requests:
+      audit = AccessAudit(client)
+      audit.build()
+      audit.users_for_batch(812)
+      audit.access_for_user('alice')
+      audit.save('access.json')
+
+    Projects and batches without custom permissions are open to every active
+    user (and to anonymous users if login is not required), so they are kept
+    in separate open sets rather than added to every user's entry.
+    """
+    def __init__(self, client=None, max_workers=DEFAULT_WORKERS):
+        """Construct an audit
+
+        Args:
+            client (Client): Turkle client instance (not needed for a saved index)
+            max_workers (int): Number of concurrent requests
+        """
+        self.client = client
+        self.max_workers = max_workers
+        # user id -> username for active users
+        self.usernames = {}
+        # project or batch id -> entry with name, login_required and users (None when open)
+        self.projects = {}
+        self.batches = {}
+        self._reindex()
+
+    def build(self):
+        """Fetch users, groups, projects, batches and permissions and build the index
+
+        Returns:
+            dict: counts of users, projects, batches and permission requests
+        """
+        if self.client is None:
+            raise TurkleClientException("A client is required to build the access index")
+        sections = ['users', 'groups', 'projects', 'batches']
+        lists = dict(zip(sections, bounded_map(
+            lambda section: getattr(self.client, section).list(), sections, self.max_workers)))
+        self.usernames = {user['id']: user['username'] for user in lists['users'] if user.get('is_active', True)}
+        members = {group['id']: group['users'] for group in lists['groups']}
+
+        targets = [(Permissions.PROJECT, project['id']) for project in lists['projects']
+                   if project.get('custom_permissions', True)]
+        targets += [(Permissions.BATCH, batch['id']) for batch in lists['batches']
+                    if batch.get('custom_permissions', True)]
+        permissions = dict(zip(targets, bounded_map(
+            lambda target: self.client.permissions.retrieve(*target), targets, self.max_workers)))
+
+        def allowed(instance_type, obj):
+            perms = permissions.get((instance_type, obj['id']))
+            if perms is None:
+                return None
+            user_ids = set(perms['users'])
+            for group_id in perms['groups']:
+                user_ids.update(members.get(group_id, []))
+            return user_ids & self.usernames.keys()
+
+        self.projects = {}
+        for project in lists['projects']:
+            self.projects[project['id']] = {
+                'name': project['name'],
+                'login_required': project.get('login_required', True),
+                'users': allowed(Permissions.PROJECT, project),
+            }
+        self.batches = {}
+        for batch in lists['batches']:
+            project = self.projects.get(batch['project'], {'login_required': True, 'users': set()})
+            users = allowed(Permissions.BATCH, batch)
+            # a batch needs access to both itself and its project
+            if project['users'] is not None:
+                users = project['users'] if users is None else users & project['users']
+            self.batches[batch['id']] = {
+                'name': batch['name'],
+                'project': batch['project'],
+                'login_required': batch.get('login_required', True) or project['login_required'],
+                'users': users,
+            }
+        self._reindex()
+        return {
+            'users': len(self.usernames),
+            'projects': len(self.projects),
+            'batches': len(self.batches),
+            'requests': len(sections) + len(targets),
+        }
+
+    def _reindex(self):
+        self.user_ids = {username: user_id for user_id, username in self.usernames.items()}
+        self.user_projects = {}
+        self.user_batches = {}
+        self.open_projects = set()
+        self.open_batches = set()
+        for entries, inverted, open_set in [(self.projects, self.user_projects, self.open_projects),
+                                            (self.batches, self.user_batches, self.open_batches)]:
+            for obj_id, entry in entries.items():
+                if entry['users'] is None:
+                    open_set.add(obj_id)
+                    continue
+                for user_id in entry['users']:
+                    inverted.setdefault(user_id, set()).add(obj_id)
+
+    def _user_id(self, user):
+        # users can be referenced by username or id
+        if user in self.user_ids:
+            return self.user_ids[user]
+        try:
+            user_id = int(user)
+        except (TypeError, ValueError):
+            user_id = None
+        if user_id not in self.usernames:
+            raise TurkleClientException(f"Unknown or inactive user: {user}")
+        return user_id
+
+    def _usernames(self, user_ids):
+        if user_ids is None:
+            user_ids = self.usernames
+        return sorted(self.usernames[user_id] for user_id in user_ids)
+
+    def users_for_project(self, project_id):
+        """Usernames of the active users that can work on a project
+
+        Args:
+            project_id (int): Project id
+
+        Returns:
+            list: sorted usernames
+        """
+        if int(project_id) not in self.projects:
+            raise TurkleClientException(f"Unknown project: {project_id}")
+        return self._usernames(self.projects[int(project_id)]['users'])
+
+    def users_for_batch(self, batch_id):
+        """Usernames of the active users that can work on a batch
+
+        Args:
+            batch_id (int): Batch id
+
+        Returns:
+            list: sorted usernames
+        """
+        if int(batch_id) not in self.batches:
+            raise TurkleClientException(f"Unknown batch: {batch_id}")
+        return self._usernames(self.batches[int(batch_id)]['users'])
+
+    def access_for_user(self, user):
+        """Projects and batches a user can work on
+
+        Args:
+            user (str or int): Username or user id
+
+        Returns:
+            dict: user and sorted lists of project ids and batch ids
+        """
+        user_id = self._user_id(user)
+        return {
+            'user': self.usernames[user_id],
+            'projects': sorted(self.open_projects | self.user_projects.get(user_id, set())),
+            'batches': sorted(self.open_batches | self.user_batches.get(user_id, set())),
+        }
+
+    def anonymous_batches(self):
+        """Batches that can be worked on without logging in
+
+        Returns:
+            list: sorted batch ids
+        """
+        return sorted(batch_id for batch_id in self.open_batches
+                      if not self.batches[batch_id]['login_required'])
+
+    def to_dict(self):
+        """The index as json compatible dicts
+
+        Open projects and batches have users set to null and are listed once in
+        open_projects and open_batches. by_user only has each user's explicit grants.
+
+        Returns:
+            dict: users, projects, batches, the open ids and the inverted index by user
+        """
+        def entries(objs):
+            return {str(obj_id): {**entry, 'users': None if entry['users'] is None else
+                                  self._usernames(entry['users'])}
+                    for obj_id, entry in objs.items()}
+        return {
+            'users': {str(user_id): username for user_id, username in self.usernames.items()},
+            'projects': entries(self.projects),
+            'batches': entries(self.batches),
+            'open_projects': sorted(self.open_projects),
+            'open_batches': sorted(self.open_batches),
+            'by_user': {username: {'projects': sorted(self.user_projects.get(user_id, set())),
+                                   'batches': sorted(self.user_batches.get(user_id, set()))}
+                        for user_id, username in sorted(self.usernames.items())},
+        }
+
+    def save(self, path):
+        """Write the index to a json file
+
+        Args:
+            path (str): Path to the json file
+        """
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as fh:
+            json.dump(self.to_dict(), fh, indent=1)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load an index written by save so it can be queried offline
+
+        Args:
+            path (str): Path to the json file
+
+        Returns:
+            AccessAudit: the audit
+        """
+        with open(path, 'r') as fh:
+            data = json.load(fh)
+        audit = cls()
+        audit.usernames = {int(user_id): username for user_id, username in data['users'].items()}
+
+        def entries(objs):
+            return {int(obj_id): {**entry, 'users': None if entry['users'] is None else
+                                  {audit.user_ids[username] for username in entry['users']}}
+                    for obj_id, entry in objs.items()}
+        audit.user_ids = {username: user_id for user_id, username in audit.usernames.items()}
+        audit.projects = entries(data['projects'])
+        audit.batches = entries(data['batches'])
+        audit._reindex()
+        return audit
@@ -6,9 +6,12 @@ import traceback
 
 import appdirs
 
-from .client import Batches, Groups, Permissions, Projects, Users
+from .client import Batches, Client, Groups, Permissions, Projects, Users
+from . import daemon
+from .script import run_script
 from .wrappers import BatchesWrapper, GroupsWrapper, PermissionsWrapper, ProjectsWrapper, \
-    UsersWrapper
+    UsersWrapper, WarehouseWrapper, AnalysisWrapper, MirrorWrapper, ApplyWrapper, AuditWrapper
+from .output import FORMATS, parse_fields, write_output
 from .__version__ import __version__
 
 
@@ -18,11 +21,12 @@ url    Set the base URL for the Turkle site. Ex: http://localhost:8000/
 print  Print the current configuration values
 """
 
-users_choices = ['list', 'create', 'retrieve', 'update']
+users_choices = ['list', 'create', 'retrieve', 'update', 'upsert']
 users_help = """list      List all users as jsonl
 create    Create new users
 retrieve  Retrieve a user selected by a username or integer identifier
 update    Update users
+upsert    Create new users and update changed users matched by username
 """
 
 groups_choices = ['list', 'create', 'retrieve', 'add_users']
@@ -32,12 +36,13 @@ retrieve  Retrieve a group selected by name or integer identifier
 add_users  Add users to an existing group by passing their ids as list in file
 """
 
-projects_choices = ['list', 'create', 'retrieve', 'update', 'batches']
+projects_choices = ['list', 'create', 'retrieve', 'update', 'batches', 'results']
 projects_help = """list      List all projects as jsonl
 create    Create new projects
 retrieve  Retrieve a project based on integer identifier
 update    Update projects
 batches   List batches for a project
+results   Download the merged results of all batches for a project
 """
 
 batches_choices = ['list', 'create', 'retrieve', 'update', 'add_tasks', 'input', 'results', 'progress']
@@ -51,18 +56,50 @@ results   Download the current results CSV
 progress  Get current progress information
 """
 
-perm_choices = ['retrieve', 'add', 'replace']
+perm_choices = ['retrieve', 'add', 'replace', 'bulk']
 perm_help = """retrieve  Retrieve permissions for a project or batch
 add       Add users or groups to a project's or batch's permissions
 replace   Replace a project's or batch's permissions
+bulk      Add or replace the permissions of many projects and batches
 """
 
+warehouse_choices = ['sync', 'query']
+warehouse_help = """sync   Download new or changed batch inputs and results into a SQLite file
+query  Run a SQL query against the SQLite file
+"""
+
+exec_help = """jsonl file with one command per line like:
+{"id": "new", "args": ["users", "create", "--file", "users.csv"]}
+{"args": "groups add_users --id 4 --file ids.json", "depends_on": ["new"]}
+"""
+
+daemon_choices = ['start', 'stop', 'status']
+daemon_help = """start   Start a background daemon that later commands are sent to
+stop    Stop the daemon
+status  Print whether the daemon is running
+"""
+
+analysis_choices = ['agreement', 'score', 'throughput']
+analysis_help = """agreement  Majority labels and inter-annotator agreement for batches
+score      Score annotators against a gold standard key file
+throughput Items per hour and work time per annotator or batch
+"""
+
+# commands whose wrappers work across the whole site and need the full client
+site_commands = ['warehouse', 'analysis', 'mirror', 'apply', 'audit']
+
+# arguments that name files or directories, resolved against the caller's directory in the daemon
+path_args = ['file', 'output', 'manifest', 'db', 'directory', 'gold', 'report_dir', 'state',
+             'series', 'index']
+
 
 class Cli:
-    def __init__(self):
+    def __init__(self, cache_clients=False):
         self.debug = False
+        # the daemon keeps a client with its connection pool for each site between commands
+        self.clients = {} if cache_clients else None
 
-        self.parser = argparse.ArgumentParser(description='Turkle client help')
+        self.parser = argparse.ArgumentParser(prog='turkle-client', description='Turkle client help')
         self.parser.add_argument('-t', '--token', help='API token')
         self.parser.add_argument('-u', '--url', help='Base URL for the Turkle site')
         self.parser.add_argument('-d', '--debug', action='store_true',
@@ -72,6 +109,18 @@ class Cli:
         self.update_title(self.parser, 'Object command')
         subparsers = self.parser.add_subparsers(dest='command')
 
+        # output options shared by the commands that return records
+        output_parser = argparse.ArgumentParser(add_help=False)
+        output_parser.add_argument('--format', choices=FORMATS,
+                                   help='Output format for records (default jsonl, csv for merged results)')
+        output_parser.add_argument('--fields', help='Comma separated fields to include in each record')
+
+        # filters shared by the list commands
+        list_parser = argparse.ArgumentParser(add_help=False)
+        list_parser.add_argument('--filter', dest='filters', action='append', metavar='NAME=VALUE',
+                                 help='Filter for list like active=true or created_since=2024-01-01 (repeatable)')
+        list_parser.add_argument('--page-size', type=int, help='Number of objects per page requested for list')
+
         config_parser = subparsers.add_parser(
             'config',
             help='Set the token or url in the config.',
@@ -84,63 +133,207 @@ class Cli:
         users_parser = subparsers.add_parser(
             'users',
             help='List, create, or update users.',
-            formatter_class=argparse.RawTextHelpFormatter
+            formatter_class=argparse.RawTextHelpFormatter,
+            parents=[output_parser, list_parser]
         )
         self.update_title(users_parser)
         users_parser.add_argument('subcommand', choices=users_choices, help=users_help)
         users_parser.add_argument('--id', help='User id (integer) - for retrieve')
         users_parser.add_argument('--username', help='Username - for retrieve')
-        users_parser.add_argument('--file', help='jsonl/json/csv file - required for create and update')
+        users_parser.add_argument('--file', help='jsonl/json/csv file - required for create, update and upsert')
+        users_parser.add_argument('--validate-only', action='store_true',
+                                  help='Check the file without sending anything')
+        users_parser.add_argument('--workers', type=int, default=8,
+                                  help='Number of concurrent requests - for upsert')
 
         groups_parser = subparsers.add_parser(
             'groups',
             help='List, create, update groups or add users to a group.',
-            formatter_class=argparse.RawTextHelpFormatter
+            formatter_class=argparse.RawTextHelpFormatter,
+            parents=[output_parser, list_parser]
         )
         self.update_title(groups_parser)
         groups_parser.add_argument('subcommand', choices=groups_choices, help=groups_help)
         groups_parser.add_argument('--id', help='User id - required for retrieve')
         groups_parser.add_argument('--name', help='Group name - for retrieve')
         groups_parser.add_argument('--file', help='json/jsonl file - required for create or addusers')
+        groups_parser.add_argument('--validate-only', action='store_true',
+                                   help='Check the file without sending anything')
 
         projects_parser = subparsers.add_parser(
             'projects',
             help='List, create, or update projects.',
-            formatter_class=argparse.RawTextHelpFormatter
+            formatter_class=argparse.RawTextHelpFormatter,
+            parents=[output_parser, list_parser]
         )
         self.update_title(projects_parser)
         projects_parser.add_argument('subcommand', choices=projects_choices, help=projects_help)
         projects_parser.add_argument('--id', help='Project id - required for retrieve and batches')
         projects_parser.add_argument('--file', help='json/jsonl/csv file - required for create, update, add_tasks')
+        projects_parser.add_argument('--validate-only', action='store_true',
+                                     help='Check the file without sending anything')
+        projects_parser.add_argument('--output', help='Output file instead of stdout - for results')
+        projects_parser.add_argument('--workers', type=int, default=8,
+                                     help='Number of concurrent downloads - for results')
 
         batches_parser = subparsers.add_parser(
             'batches',
             help='List, create, or update batches or get results and progress.',
-            formatter_class=argparse.RawTextHelpFormatter
+            formatter_class=argparse.RawTextHelpFormatter,
+            parents=[output_parser, list_parser]
         )
         self.update_title(batches_parser)
         batches_parser.add_argument('subcommand', choices=batches_choices, help=batches_help)
         batches_parser.add_argument('--id', help='Batch id - required for retrieve')
         batches_parser.add_argument('--file', help='json/jsonl file - required for create or update')
+        batches_parser.add_argument('--validate-only', action='store_true',
+                                    help='Check the file without sending anything')
+        batches_parser.add_argument('--shard-size', type=int,
+                                    help='Split the task CSV into batches of this many rows - for create')
+        batches_parser.add_argument('--template', help='Batch id to copy permissions from - for sharded create')
+        batches_parser.add_argument('--manifest',
+                                    help='json file written by sharded create and read by results')
+        batches_parser.add_argument('--output', help='Output file instead of stdout - for results with --manifest')
+        batches_parser.add_argument('--workers', type=int, default=8,
+                                    help='Number of concurrent requests - for sharded create and results')
 
         perm_parser = subparsers.add_parser(
             'permissions',
             help='List, add, or replace permissions.',
-            formatter_class=argparse.RawTextHelpFormatter
+            formatter_class=argparse.RawTextHelpFormatter,
+            parents=[output_parser]
         )
         self.update_title(perm_parser)
         perm_parser.add_argument('subcommand', choices=perm_choices, help=perm_help)
         perm_parser.add_argument('--pid', help='Project id')
         perm_parser.add_argument('--bid', help='Batch id')
-        perm_parser.add_argument('--file', help='json,jsonl file - required for add or replace')
+        perm_parser.add_argument('--file', help='json,jsonl file - required for add, replace or bulk')
+        perm_parser.add_argument('--validate-only', action='store_true',
+                                 help='Check the file without sending anything')
+        perm_parser.add_argument('--selector',
+                                 help='Targets like project:3,batch:17,project:4/batches - for bulk')
+        perm_parser.add_argument('--mode', choices=['add', 'replace'], default='add',
+                                 help='Add to or replace the permissions - for bulk')
+        perm_parser.add_argument('--workers', type=int, default=8,
+                                 help='Number of concurrent requests - for bulk')
+
+        warehouse_parser = subparsers.add_parser(
+            'warehouse',
+            help='Sync results into a local SQLite warehouse and query it.',
+            formatter_class=argparse.RawTextHelpFormatter,
+            parents=[output_parser]
+        )
+        self.update_title(warehouse_parser)
+        warehouse_parser.add_argument('subcommand', choices=warehouse_choices, help=warehouse_help)
+        warehouse_parser.add_argument('--db', help='SQLite database file - required')
+        warehouse_parser.add_argument('--projects', help='Comma separated project ids - for sync')
+        warehouse_parser.add_argument('--workers', type=int, default=8,
+                                      help='Number of concurrent downloads - for sync')
+        warehouse_parser.add_argument('--sql', help='SQL query - required for query')
+
+        mirror_parser = subparsers.add_parser(
+            'mirror',
+            help='Copy users, groups, projects, batches and permissions to a local directory.',
+            formatter_class=argparse.RawTextHelpFormatter
+        )
+        self.update_title(mirror_parser, 'Directory')
+        mirror_parser.set_defaults(subcommand='mirror')
+        mirror_parser.add_argument('directory', help='Mirror directory (created if needed)')
+        mirror_parser.add_argument('--workers', type=int, default=8,
+                                   help='Number of concurrent requests')
+
+        apply_parser = subparsers.add_parser(
+            'apply',
+            help='Change users, groups and permissions to match a state file.',
+            formatter_class=argparse.RawTextHelpFormatter
+        )
+        self.update_title(apply_parser, 'State file')
+        apply_parser.set_defaults(subcommand='apply')
+        apply_parser.add_argument('file', help='yaml/json/jsonl file with the desired state')
+        apply_parser.add_argument('--plan', action='store_true',
+                                  help='Only print the changes that would be made')
+        apply_parser.add_argument('--workers', type=int, default=8,
+                                  help='Number of concurrent requests')
+
+        audit_parser = subparsers.add_parser(
+            'audit',
+            help='Find which users can work on projects and batches.',
+            formatter_class=argparse.RawTextHelpFormatter,
+            parents=[output_parser]
+        )
+        audit_parser.set_defaults(subcommand='audit')
+        audit_parser.add_argument('--user', help='Username or id to list the projects and batches it can access')
+        audit_parser.add_argument('--pid', help='Project id to list the users that can access it')
+        audit_parser.add_argument('--bid', help='Batch id to list the users that can access it')
+        audit_parser.add_argument('--output', help='json file to write the access index')
+        audit_parser.add_argument('--index', help='json file from --output to query instead of the site')
+        audit_parser.add_argument('--workers', type=int, default=8,
+                                  help='Number of concurrent requests')
+
+        analysis_parser = subparsers.add_parser(
+            'analysis',
+            help='Analyze the results of batches.',
+            formatter_class=argparse.RawTextHelpFormatter,
+            parents=[output_parser]
+        )
+        self.update_title(analysis_parser)
+        analysis_parser.add_argument('subcommand', choices=analysis_choices, help=analysis_help)
+        analysis_parser.add_argument('--bid', help='Comma separated batch ids')
+        analysis_parser.add_argument('--pid', help='Comma separated project ids - for throughput')
+        analysis_parser.add_argument('--field', help='Results column with the label - for agreement')
+        analysis_parser.add_argument('--task-field', default='HITId',
+                                     help='Results column identifying the task')
+        analysis_parser.add_argument('--worker-field', default='Turkle.Username',
+                                     help='Results column identifying the annotator')
+        analysis_parser.add_argument('--gold', help='csv/jsonl gold key file - required for score')
+        analysis_parser.add_argument('--key', help='Comma separated input fields that match gold items - for score')
+        analysis_parser.add_argument('--gold-field', help='Gold key column with the correct label - for score')
+        analysis_parser.add_argument('--min-accuracy', type=float,
+                                     help='Flag annotators below this accuracy - for score')
+        analysis_parser.add_argument('--report-dir', help='Directory for per-annotator reports - for score')
+        analysis_parser.add_argument('--state', help='State file so reruns only process new assignments - for throughput')
+        analysis_parser.add_argument('--by', choices=['worker', 'batch'], default='worker',
+                                     help='Group throughput by annotator or batch - for throughput')
+        analysis_parser.add_argument('--bin-seconds', type=int,
+                                     help='Width of the time bins in seconds (default 3600 or the '
+                                          'saved state) - for throughput')
+        analysis_parser.add_argument('--window', type=int, default=1,
+                                     help='Number of bins in the rolling window - for throughput')
+        analysis_parser.add_argument('--series', help='csv/jsonl file for the throughput time series')
+        analysis_parser.add_argument('--output', help='csv/jsonl file for per-task or per-worker output')
+
+        exec_parser = subparsers.add_parser(
+            'exec',
+            help='Run the commands in a jsonl file with one shared connection pool.',
+            formatter_class=argparse.RawTextHelpFormatter
+        )
+        self.update_title(exec_parser, 'Script')
+        exec_parser.add_argument('file', help=exec_help)
+        exec_parser.add_argument('--workers', type=int, default=8,
+                                 help='Number of commands run at once')
+        exec_parser.add_argument('--output', help='jsonl file for the result records instead of stdout')
+
+        daemon_parser = subparsers.add_parser(
+            'daemon',
+            help='Run a background daemon that keeps connections open between commands.',
+            formatter_class=argparse.RawTextHelpFormatter
+        )
+        self.update_title(daemon_parser)
+        daemon_parser.add_argument('subcommand', choices=daemon_choices, help=daemon_help)
+        daemon_parser.add_argument('--idle-timeout', type=float, default=daemon.DEFAULT_IDLE_TIMEOUT,
+                                   help='Seconds without a command before the daemon exits - for start')
 
     @staticmethod
     def update_title(parser, title='Subcommand'):
         parser._positionals.title = title
 
-    def dispatch(self):
-        args = self.parser.parse_args()
+    def dispatch(self, argv=None, cwd=None):
+        args = self.parser.parse_args(argv)
         self.debug = bool(args.debug)
+        if cwd:
+            for name in path_args:
+                if getattr(args, name, None):
+                    setattr(args, name, os.path.join(cwd, os.path.expanduser(getattr(args, name))))
 
         if args.version:
             print(f"Turkle client version {__version__}")
@@ -166,6 +359,13 @@ class Cli:
                 raise ValueError(f"{args.subcommand} not specified")
             return
 
+        if args.command == 'daemon':
+            if args.subcommand == 'start':
+                print(daemon.start(args.idle_timeout))
+            else:
+                print(getattr(daemon, args.subcommand)())
+            return
+
         config = self.load_config()
         token = args.token or config.get('token')
         url = args.url or config.get('url')
@@ -174,18 +374,45 @@ class Cli:
         if not url:
             raise ValueError("API URL not specified (use --url or config)")
 
-        # construct the class and method from the command and subcommand
-        client = self.construct_client(args.command.capitalize(), url, token, self.debug)
-        result = getattr(client, args.subcommand)(**vars(args))
+        if args.command == 'exec':
+            if self.clients is None:
+                # every command in the script shares one client and connection pool
+                self.clients = {}
+            summary = run_script(self, args.file, url, token, args.workers, args.output)
+            print(summary, file=sys.stdout if args.output else sys.stderr)
+            return
+
+        result = self.run_command(args, url, token)
+        if result is None:
+            # the command already streamed its output
+            return
         if isinstance(result, str):
             print(result)
         else:
-            print(json.dumps(result))
+            # records are written as they come from the client
+            write_output(result, sys.stdout, getattr(args, 'format', None) or 'jsonl',
+                         parse_fields(getattr(args, 'fields', None)))
+
+    def run_command(self, args, url, token):
+        """Run a parsed object command and return its result"""
+        # construct the class and method from the command and subcommand
+        client = self.construct_client(args.command.capitalize(), args.url or url,
+                                       args.token or token, self.debug)
+        return getattr(client, args.subcommand)(**vars(args))
 
     def construct_client(self, name, url, token, debug):
         # the wrapper handles interactions requiring multiple calls
-        client_class = getattr(sys.modules[__name__], name)
-        client = client_class(url, token, debug)
+        if self.clients is not None:
+            key = (url, token, debug)
+            if key not in self.clients:
+                self.clients[key] = Client(url, token, debug)
+            site = self.clients[key]
+            client = site if name.lower() in site_commands else getattr(site, name.lower())
+        elif name.lower() in site_commands:
+            client = Client(url, token, debug)
+        else:
+            client_class = getattr(sys.modules[__name__], name)
+            client = client_class(url, token, debug)
         wrapper_class = getattr(sys.modules[__name__], name + 'Wrapper')
         return wrapper_class(client)
 
@@ -213,10 +440,9 @@ class Cli:
             json.dump(config, fh)
 
 
-def main():
-    cli = Cli()
+def run(cli, argv=None, cwd=None):
     try:
-        cli.dispatch()
+        cli.dispatch(argv, cwd)
     except Exception as e:
         if cli.debug:
             traceback.print_exc()
@@ -224,5 +450,9 @@ def main():
             print(f"Error: {e}")
 
 
+def main():
+    run(Cli())
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,137 @@
+import re
+
+from .client import Permissions
+from .exceptions import TurkleClientException
+from .parallel import DEFAULT_WORKERS, bounded_map
+
+ADD = 'add'
+REPLACE = 'replace'
+MODES = [ADD, REPLACE]
+
+SELECTOR_RE = re.compile(r'^(project|batch):(\d+)(/batches)?$')
+
+
+def parse_target(record):
+    """Normalize a permissions target record
+
+    A target names its project or batch with a project or batch key like
+    {"batch": 12, "users": [3], "groups": [2]} or with type and id keys like
+    {"type": "batch", "id": 12, "users": [3], "groups": [2]}.
+
+    Args:
+        record (dict): target record
+
+    Returns:
+        dict: target with type, id, users and groups
+    """
+    if 'type' in record:
+        instance_type, instance_id = record['type'], record.get('id')
+    elif Permissions.PROJECT in record:
+        instance_type, instance_id = Permissions.PROJECT, record[Permissions.PROJECT]
+    elif Permissions.BATCH in record:
+        instance_type, instance_id = Permissions.BATCH, record[Permissions.BATCH]
+    else:
+        raise TurkleClientException(f"Target needs a project or batch: {record}")
+    if instance_type not in [Permissions.PROJECT, Permissions.BATCH]:
+        raise TurkleClientException(f"Unrecognized instance type: {instance_type}")
+    try:
+        instance_id = int(instance_id)
+    except (TypeError, ValueError):
+        raise TurkleClientException(f"Target needs an integer {instance_type} id: {record}")
+    return {
+        'type': instance_type,
+        'id': instance_id,
+        'users': list(record.get('users') or []),
+        'groups': list(record.get('groups') or []),
+    }
+
+
+def load_targets(records):
+    """Normalize target records and reject targets that appear more than once
+
+    Args:
+        records (Iterable): target records (a .json file gives one list of them)
+
+    Returns:
+        list: targets with type, id, users and groups
+    """
+    targets = []
+    seen = set()
+    records = list(records)
+    if len(records) == 1 and isinstance(records[0], list):
+        records = records[0]
+    for lineno, record in enumerate(records, start=1):
+        try:
+            target = parse_target(record)
+        except TurkleClientException as e:
+            raise TurkleClientException(f"Failure on line {lineno}: {e}")
+        key = (target['type'], target['id'])
+        if key in seen:
+            raise TurkleClientException(f"Duplicate target {key[0]} {key[1]} on line {lineno}")
+        seen.add(key)
+        targets.append(target)
+    return targets
+
+
+def select_targets(projects_client, selector, permissions):
+    """Expand a selector into targets that all get the same permissions
+
+    The selector is a comma separated list of project:N, batch:N or
+    project:N/batches for all the batches of project N.
+
+    Args:
+        projects_client (Projects): Projects client used to list a project's batches
+        selector (str): selector string
+        permissions (dict): Dictionary with keys 'users' and 'groups' for lists of ids
+
+    Returns:
+        list: targets with type, id, users and groups
+    """
+    keys = []
+    for term in selector.split(','):
+        match = SELECTOR_RE.match(term.strip())
+        if not match:
+            raise TurkleClientException(f"Unrecognized selector: {term.strip()}")
+        instance_type, instance_id, all_batches = match.group(1), int(match.group(2)), match.group(3)
+        if all_batches and instance_type != Permissions.PROJECT:
+            raise TurkleClientException(f"Only projects have batches: {term.strip()}")
+        if all_batches:
+            keys.extend((Permissions.BATCH, batch['id']) for batch in projects_client.batches(instance_id))
+        else:
+            keys.append((instance_type, instance_id))
+    # a batch can be selected directly and through its project
+    keys = list(dict.fromkeys(keys))
+    return [parse_target({'type': instance_type, 'id': instance_id, **permissions})
+            for instance_type, instance_id in keys]
+
+
+def apply_permissions(permissions_client, targets, mode=ADD, max_workers=DEFAULT_WORKERS):
+    """Add or replace the permissions of many projects and batches concurrently
+
+    A failure on one target does not stop the others. Each target gets a
+    result with a status of ok and its updated permissions or a status of
+    error and the error message.
+
+    Args:
+        permissions_client (Permissions): Permissions client
+        targets (list): targets from load_targets or select_targets
+        mode (str): add or replace
+        max_workers (int): Number of concurrent requests
+
+    Returns:
+        list: result dicts with type, id and status in the order of the targets
+    """
+    if mode not in MODES:
+        raise TurkleClientException(f"Unrecognized permissions mode: {mode}")
+    method = permissions_client.add if mode == ADD else permissions_client.replace
+
+    def send(target):
+        result = {'type': target['type'], 'id': target['id']}
+        try:
+            updated = method(target['type'], target['id'],
+                             {'users': target['users'], 'groups': target['groups']})
+        except TurkleClientException as e:
+            return {**result, 'status': 'error', 'error': str(e)}
+        return {**result, 'status': 'ok', 'users': updated.get('users'), 'groups': updated.get('groups')}
+
+    return list(bounded_map(send, targets, max_workers))
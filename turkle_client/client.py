@@ -1,6 +1,164 @@
+import codecs
+import copy
+import csv
+import functools
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+
 import requests
 
 from .exceptions import TurkleClientException
+from . import filters as filter_types
+from .pages import PagedList, set_query
+from .parallel import Singleflight
+from . import records as record_types
+from .table import ResultsTable
+from .transport import DEFAULT_POOL_SIZE, get_transport
+
+# seconds to connect and to wait for each read from the site
+DEFAULT_TIMEOUT = (10, 60)
+# writes are not retried so by default they wait as long as the site takes to answer
+DEFAULT_WRITE_TIMEOUT = (10, None)
+# GETs that time out or find the site busy are retried with exponential backoff
+DEFAULT_RETRIES = 2
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = {502, 503, 504}
+# hedged GETs wait for this percentile of recent latencies before sending a second copy
+HEDGE_PERCENTILE = 95
+
+
+# pools that drop their connections in a child process after fork
+_pools = weakref.WeakSet()
+
+
+def _reset_pools_after_fork():
+    for pool in list(_pools):
+        pool._reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+def _close_response(future):
+    # the slower copy of a hedged request is not used
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class LatencyWindow:
+    """Latencies of recent requests used to decide when to hedge a request"""
+    def __init__(self, size=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        """The latency at a percentile or None until there are enough samples"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+class ConnectionPool:
+    """
+    Requests sessions that are safe to use from threads and forked processes
+
+    By default one session is shared by all threads. Its urllib3 connection
+    pool is thread-safe and hands each request its own connection. With
+    per_thread=True each thread gets its own session and pool instead.
+
+    A forked child cannot use the parent's connections, so the sessions are
+    dropped in the child and created again when first used. Pickling a pool
+    only keeps its settings so clients can be sent to process pool workers.
+
+    Identical GET requests made at the same time by clients using the pool
+    share one request. singleflight.stats() counts the requests saved. Writes
+    start a new generation so a GET sent after a write never shares the
+    response of a GET sent before it.
+    The pool also tracks recent latencies and runs the second copies of
+    hedged requests.
+    """
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, per_thread=False, session=None, coalesce=True,
+                 transport=None):
+        """Construct a connection pool
+
+        Args:
+            pool_size (int): Maximum number of pooled connections per host
+            per_thread (bool): Whether each thread gets its own session
+            session (requests.Session): Optional session to use in this process
+            coalesce (bool): Whether concurrent identical GET requests share one request
+            transport (str or Callable): Name of a transport like http2 or a callable that
+                creates a session from the pool size (default requests)
+        """
+        self.pool_size = pool_size
+        self.per_thread = per_thread
+        self.coalesce = coalesce
+        self.transport = get_transport(transport)
+        self._reset()
+        self._session = session
+        _pools.add(self)
+
+    def _reset(self):
+        # a lock held by another thread when the process forked would never be released
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.singleflight = Singleflight()
+        self.latency = LatencyWindow()
+        self.hedged = 0
+        self.generation = 0
+        self._executor = None
+        self._session = None
+        self._pid = os.getpid()
+
+    @property
+    def session(self):
+        """The requests session for the current thread and process"""
+        if self._pid != os.getpid():
+            self._reset()
+        if self.per_thread:
+            session = getattr(self._local, 'session', None)
+            if session is None:
+                session = self._local.session = self.transport(self.pool_size)
+            return session
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self.transport(self.pool_size)
+        return self._session
+
+    def invalidate(self):
+        """Start a new generation of coalesced GETs around a write"""
+        with self._lock:
+            self.generation += 1
+
+    @property
+    def executor(self):
+        """Threads for hedged requests"""
+        if self._pid != os.getpid():
+            self._reset()
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=2 * self.pool_size)
+        return self._executor
+
+    def __getstate__(self):
+        return {'pool_size': self.pool_size, 'per_thread': self.per_thread,
+                'coalesce': self.coalesce, 'transport': self.transport}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
 
 
 class Client:
@@ -12,21 +170,58 @@ class Client:
       group = client.groups.create({'name': 'Spanish', 'users': [5, 43]})
       projects = client.projects.list()
 
+    All sections share one pool of connections to the site. A client can be
+    used from many threads, is safe to use after fork and can be pickled to
+    send to process pool workers (only the settings are pickled).
+
     Methods raise TurkleClientException if errors
     """
-    def __init__(self, base_url, token, debug=False):
+    SECTIONS = ['users', 'groups', 'projects', 'batches', 'permissions']
+
+    def __init__(self, base_url, token, debug=False, pool_size=DEFAULT_POOL_SIZE, per_thread=False,
+                 timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, hedge=False, transport=None,
+                 write_timeout=DEFAULT_WRITE_TIMEOUT):
         """Construct a client
 
         Args:
             base_url (str): The URL of the Turkle site
             token (str): An authentication token for Turkle
             debug (bool): Whether to log input to the methods
+            pool_size (int): Maximum number of pooled connections
+            per_thread (bool): Whether each thread gets its own connection pool
+            timeout (float or tuple): Seconds to connect and to wait for each read (None for no limit)
+            retries (int): Number of times a GET is retried after a timeout or busy response
+            hedge (bool): Whether slow GETs send a second copy and use the first answer
+            transport (str or Callable): requests (default), http2, h2c or a callable like Replay.transport
+            write_timeout (float or tuple): Seconds to connect and to wait for each read of a create or update
         """
-        self.users = Users(base_url, token, debug)
-        self.groups = Groups(base_url, token, debug)
-        self.projects = Projects(base_url, token, debug)
-        self.batches = Batches(base_url, token, debug)
-        self.permissions = Permissions(base_url, token, debug)
+        self.pool = ConnectionPool(pool_size, per_thread, transport=transport)
+        options = dict(timeout=timeout, retries=retries, hedge=hedge, write_timeout=write_timeout)
+        self.users = Users(base_url, token, debug, self.pool, **options)
+        self.groups = Groups(base_url, token, debug, self.pool, **options)
+        self.projects = Projects(base_url, token, debug, self.pool, **options)
+        self.batches = Batches(base_url, token, debug, self.pool, **options)
+        self.permissions = Permissions(base_url, token, debug, self.pool, **options)
+
+    @property
+    def session(self):
+        return self.pool.session
+
+    def with_deadline(self, seconds):
+        """Copy of the client whose requests must all finish within seconds
+
+        The deadline covers every request of an operation, including retries
+        and the pages of a list:
+          batches = client.with_deadline(30).batches.list()
+
+        Returns:
+            Client: client sharing this client's connections
+        """
+        client = copy.copy(self)
+        deadline = time.monotonic() + seconds
+        for name in self.SECTIONS:
+            setattr(client, name, getattr(self, name)._at_deadline(deadline))
+        return client
 
 
 class ClientBase:
@@ -36,24 +231,75 @@ class ClientBase:
     The child classes are Users, Groups, Projects, Batches, and Permissions.
     Their methods return dicts or csv data as a string.
     """
-    def __init__(self, base_url, token, debug=False):
+    def __init__(self, base_url, token, debug=False, session=None, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, hedge=False, transport=None,
+                 write_timeout=DEFAULT_WRITE_TIMEOUT):
         """Construct a client base
 
         Args:
             base_url (str): The URL of the Turkle site
             token (str): An authentication token for Turkle
             debug (bool): Whether to log input to the methods
+            session (ConnectionPool or requests.Session): Optional pool to share connections
+            timeout (float or tuple): Seconds to connect and to wait for each read (None for no limit)
+            retries (int): Number of times a GET is retried after a timeout or busy response
+            hedge (bool): Whether slow GETs send a second copy and use the first answer
+            transport (str or Callable): Transport name or callable when session is not set
+            write_timeout (float or tuple): Seconds to connect and to wait for each read of a create or update
         """
         self.base_url = base_url.rstrip('/')
+        self.token = token
         self.headers = {'Authorization': f'Token {token}'}
         self.debug = debug
+        if isinstance(session, ConnectionPool):
+            self.pool = session
+        else:
+            self.pool = ConnectionPool(session=session, transport=transport)
+        self.timeout = self._timeout_pair(timeout)
+        self.write_timeout = self._timeout_pair(write_timeout)
+        self.retries = retries
+        self.hedge = hedge
+        # time.monotonic() by which all requests must finish
+        self.deadline = None
+
+    @property
+    def session(self):
+        return self.pool.session
+
+    def with_deadline(self, seconds):
+        """Copy of this client whose requests must all finish within seconds
+
+        Returns:
+            ClientBase: client sharing this client's connections
+        """
+        return self._at_deadline(time.monotonic() + seconds)
+
+    def _at_deadline(self, deadline):
+        client = copy.copy(self)
+        client.deadline = deadline
+        return client
+
+    @staticmethod
+    def _timeout_pair(timeout):
+        return timeout if isinstance(timeout, tuple) or timeout is None else (timeout, timeout)
+
+    def _request_timeout(self, write=False):
+        timeout = self.write_timeout if write else self.timeout
+        if self.deadline is None:
+            return timeout
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise TurkleClientException(f"Deadline exceeded for requests to {self.base_url}")
+        if timeout is None:
+            return remaining, remaining
+        return tuple(remaining if part is None else min(part, remaining) for part in timeout)
 
     class Urls:
         # child classes must set the list and detail url for that part of the API
         list = ""
         detail = ""
 
-    def _walk(self, url,  **kwargs):
+    def _walk(self, url, convert=None, keep=None, **kwargs):
         objs = []
         data = {'next': url}
         while data['next']:
@@ -61,54 +307,171 @@ class ClientBase:
             if response.status_code >= 400:
                 self._handle_errors(response)
             data = response.json()
-            objs.extend(data['results'])
+            results = filter(keep, data['results']) if keep else data['results']
+            objs.extend(map(convert, results) if convert else results)
         return objs
 
+    def _list_query(self, url, available, page_size, filters):
+        # filters are sent to the server and checked again locally for sites that ignore them
+        resolved = filter_types.resolve_filters(available, filters)
+        params = filter_types.query_params(resolved, page_size)
+        return (set_query(url, **params) if params else url), filter_types.make_predicate(resolved)
+
+    def _list(self, url, available, lazy, convert, page_size, filters):
+        url, keep = self._list_query(url, available, page_size, filters)
+        if lazy:
+            if keep:
+                raise TurkleClientException("Filters cannot be used with lazy lists. Use iteration.")
+            return PagedList(self, url, convert=convert)
+        return self._walk(url, convert, keep)
+
+    def _iter_list(self, url, available, convert, page_size, filters):
+        url, keep = self._list_query(url, available, page_size, filters)
+        objs = iter(PagedList(self, url, convert=convert))
+        return filter(keep, objs) if keep else objs
+
+    def _stream_lines(self, url, chunk_size=65536):
+        # yields decoded lines with their line endings so csv can handle quoted newlines
+        response = self._get(url, stream=True)
+        try:
+            # requests assumes latin-1 for text types without a charset but Turkle writes utf-8
+            content_type = response.headers.get('Content-Type', '')
+            encoding = response.encoding if 'charset' in content_type else 'utf-8'
+            decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+            remainder = ''
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                lines = (remainder + decoder.decode(chunk)).split('\n')
+                remainder = lines.pop()
+                for line in lines:
+                    yield line + '\n'
+            remainder += decoder.decode(b'', final=True)
+            if remainder:
+                yield remainder
+        finally:
+            response.close()
+
     def _get(self, url, *args, **kwargs):
+        if args or kwargs or not self.pool.coalesce:
+            return self._fetch(url, *args, **kwargs)
+        # a plain GET has no side effects so callers asking for the same url at once share it
+        key = (url, self.token, self.pool.generation)
+        timeout = None if self.deadline is None else max(0, self.deadline - time.monotonic())
         try:
-            response = requests.get(url, *args, **kwargs, headers=self.headers)
+            return self.pool.singleflight.do(key, lambda: self._fetch(url), timeout)
+        except FutureTimeout:
+            raise TurkleClientException(f"Deadline exceeded for requests to {self.base_url}")
+
+    def _fetch(self, url, *args, **kwargs):
+        # GETs can be repeated so timeouts and busy responses are retried until the deadline
+        attempt = 0
+        while True:
+            error = None
+            try:
+                if self.hedge and not args and not kwargs:
+                    response = self._hedged_get(url)
+                else:
+                    response = self._timed_get(url, *args, **kwargs)
+                retry = response.status_code in RETRY_STATUSES
+            except requests.exceptions.Timeout:
+                error = TurkleClientException(f"Request to {url} timed out")
+                retry = True
+            except requests.exceptions.ConnectionError:
+                raise TurkleClientException(f"Unable to connect to {self.base_url}")
+            delay = self._backoff(attempt) if retry and attempt < self.retries else None
+            if delay is not None:
+                if error is None:
+                    # a streamed response keeps its connection until it is closed
+                    response.close()
+                time.sleep(delay)
+                attempt += 1
+                continue
+            if error:
+                raise error
             if response.status_code >= 400:
                 self._handle_errors(response)
             return response
-        except requests.exceptions.ConnectionError:
-            raise TurkleClientException(f"Unable to connect to {self.base_url}")
 
-    def _post(self, url, data, *args, **kwargs):
+    def _backoff(self, attempt):
+        # seconds to wait before the next attempt or None if it would pass the deadline
+        delay = RETRY_BACKOFF * 2 ** attempt
+        if self.deadline is not None and time.monotonic() + delay >= self.deadline:
+            return None
+        return delay
+
+    def _timed_get(self, url, *args, **kwargs):
+        start = time.monotonic()
+        response = self.session.get(url, *args, **kwargs, headers=self.headers,
+                                    timeout=self._request_timeout())
+        self.pool.latency.add(time.monotonic() - start)
+        return response
+
+    def _hedged_get(self, url):
+        # a second copy is sent when the first is slower than most recent requests
+        delay = self.pool.latency.percentile(HEDGE_PERCENTILE)
+        if delay is None:
+            return self._timed_get(url)
+        first = self.pool.executor.submit(self._timed_get, url)
         try:
-            response = requests.post(url, *args, **kwargs, json=data, headers=self.headers)
-            if response.status_code >= 400:
-                self._handle_errors(response)
+            return first.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        self.pool.hedged += 1
+        futures = [first, self.pool.executor.submit(self._timed_get, url)]
+        error = None
+        for future in as_completed(futures):
+            try:
+                response = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            for other in futures:
+                if other is not future:
+                    other.add_done_callback(_close_response)
             return response
-        except requests.exceptions.ConnectionError:
-            raise TurkleClientException(f"Unable to connect to {self.base_url}")
+        raise error
+
+    def _post(self, url, data, *args, **kwargs):
+        return self._write('post', url, data, *args, **kwargs)
 
     def _patch(self, url, data, *args, **kwargs):
-        try:
-            response = requests.patch(url, *args, **kwargs, json=data, headers=self.headers)
-            if response.status_code >= 400:
-                self._handle_errors(response)
-            return response
-        except requests.exceptions.ConnectionError:
-            raise TurkleClientException(f"Unable to connect to {self.base_url}")
+        return self._write('patch', url, data, *args, **kwargs)
 
     def _put(self, url, data, *args, **kwargs):
+        return self._write('put', url, data, *args, **kwargs)
+
+    def _write(self, method, url, data, *args, **kwargs):
+        self.pool.invalidate()
         try:
-            response = requests.put(url, *args, **kwargs, json=data, headers=self.headers)
+            send = getattr(self.session, method)
+            response = send(url, *args, **kwargs, json=data, headers=self.headers,
+                            timeout=self._request_timeout(write=True))
             if response.status_code >= 400:
                 self._handle_errors(response)
             return response
+        except requests.exceptions.Timeout:
+            # writes are not retried because the site may have received the request
+            raise TurkleClientException(f"{method.upper()} request to {url} timed out. "
+                                        f"It may have been applied, so check before sending it again")
         except requests.exceptions.ConnectionError:
             raise TurkleClientException(f"Unable to connect to {self.base_url}")
+        finally:
+            # GETs started while the write was in flight may have read the old data
+            self.pool.invalidate()
 
     def _handle_errors(self, response):
-        data = response.json()
-        if data:
+        try:
+            data = response.json()
+        except ValueError:
+            # proxies and overloaded servers answer with html
+            data = None
+        if isinstance(data, dict) and data:
             if 'detail' in data:
                 raise TurkleClientException(data['detail'])
             else:
                 # grab the first error
                 parts = next(iter(data.items()))
                 raise TurkleClientException(f"{parts[0]} - {parts[1]}")
+        raise TurkleClientException(f"{response.status_code} {response.text[:200]}")
 
 
 class CrudMixin:
@@ -116,27 +479,66 @@ class CrudMixin:
     Generic list, retrieve, and create methods for the entity-specific classes
     """
 
-    def list(self):
+    # compact record type returned when records=True
+    record_class = None
+    # filters accepted by list and iter_list
+    list_filters = {}
+
+    def _converter(self, records):
+        if not records:
+            return None
+        return functools.partial(self.record_class.from_json, compact=records == record_types.COMPACT)
+
+    def list(self, lazy=False, records=False, page_size=None, **filters):
         """List all instances (user, group, project, batch)
 
+        Filters like active=True or created_since='2024-01-01' are passed to
+        the server and also checked on the returned objects. See list_filters
+        for the filters of each section.
+
+        Args:
+            lazy (bool): Return a PagedList that only fetches the pages that are used (no filters)
+            records (bool or str): Return compact Record objects instead of dicts ('compact'
+                                   also compresses project templates until they are read)
+            page_size (int): Optional number of objects per page requested from the server
+            **filters: filter name to value
+
         Returns:
             list: list of instance dicts
         """
         url = self.Urls.list.format(base=self.base_url)
-        return self._walk(url)
+        return self._list(url, self.list_filters, lazy, self._converter(records), page_size, filters)
+
+    def iter_list(self, records=False, page_size=None, **filters):
+        """Iterate over all instances one page at a time
+
+        The next page is downloaded while the current page is processed.
+
+        Args:
+            records (bool or str): Yield compact Record objects instead of dicts (or 'compact' like list)
+            page_size (int): Optional number of objects per page requested from the server
+            **filters: filter name to value like list
+
+        Returns:
+            Iterator: iterator over instance dicts
+        """
+        url = self.Urls.list.format(base=self.base_url)
+        return self._iter_list(url, self.list_filters, self._converter(records), page_size, filters)
 
-    def retrieve(self, instance_id):
+    def retrieve(self, instance_id, records=False):
         """Retrieve an instance from an id (user, group, project, batch)
 
         Args:
             instance_id (int): Instance id
+            records (bool or str): Return a compact Record object instead of a dict (or 'compact' like list)
 
         Returns:
             dict: retrieved instance
         """
         url = self.Urls.detail.format(base=self.base_url, id=instance_id)
         response = self._get(url)
-        return response.json()
+        convert = self._converter(records)
+        return convert(response.json()) if convert else response.json()
 
     def create(self, instance):
         """Create an instance (group, project, batch)
@@ -155,6 +557,9 @@ class CrudMixin:
 
 
 class Users(CrudMixin, ClientBase):
+    record_class = record_types.User
+    list_filters = filter_types.USER_FILTERS
+
     class Urls:
         list = "{base}/api/users/"
         detail = "{base}/api/users/{id}/"
@@ -204,6 +609,9 @@ class Users(CrudMixin, ClientBase):
 
 
 class Groups(CrudMixin, ClientBase):
+    record_class = record_types.Group
+    list_filters = filter_types.GROUP_FILTERS
+
     class Urls:
         list = "{base}/api/groups/"
         detail = "{base}/api/groups/{id}/"
@@ -239,6 +647,9 @@ class Groups(CrudMixin, ClientBase):
 
 
 class Projects(CrudMixin, ClientBase):
+    record_class = record_types.Project
+    list_filters = filter_types.PROJECT_FILTERS
+
     class Urls:
         list = "{base}/api/projects/"
         detail = "{base}/api/projects/{id}/"
@@ -270,20 +681,44 @@ class Projects(CrudMixin, ClientBase):
         response = self._patch(url, project)
         return response.json()
 
-    def batches(self, project_id):
+    def batches(self, project_id, lazy=False, records=False, page_size=None, **filters):
         """List all batches for a project
 
         Args:
             project_id (int): Project id
+            lazy (bool): Return a PagedList that only fetches the pages that are used (no filters)
+            records (bool): Return compact Batch records instead of dicts
+            page_size (int): Optional number of batches per page requested from the server
+            **filters: batch filter name to value like Batches.list
 
         Returns:
             list: list of dicts for the project's batches
         """
         url = self.Urls.batches.format(base=self.base_url, id=project_id)
-        return self._walk(url)
+        convert = record_types.Batch.from_json if records else None
+        return self._list(url, filter_types.BATCH_FILTERS, lazy, convert, page_size, filters)
+
+    def iter_batches(self, project_id, records=False, page_size=None, **filters):
+        """Iterate over the batches of a project one page at a time
+
+        Args:
+            project_id (int): Project id
+            records (bool): Yield compact Batch records instead of dicts
+            page_size (int): Optional number of batches per page requested from the server
+            **filters: batch filter name to value like Batches.list
+
+        Returns:
+            Iterator: iterator over batch dicts
+        """
+        url = self.Urls.batches.format(base=self.base_url, id=project_id)
+        convert = record_types.Batch.from_json if records else None
+        return self._iter_list(url, filter_types.BATCH_FILTERS, convert, page_size, filters)
 
 
 class Batches(CrudMixin, ClientBase):
+    record_class = record_types.Batch
+    list_filters = filter_types.BATCH_FILTERS
+
     class Urls:
         list = "{base}/api/batches/"
         detail = "{base}/api/batches/{id}/"
@@ -365,18 +800,56 @@ class Batches(CrudMixin, ClientBase):
         response = self._get(url)
         return response.text
 
-    def progress(self, batch_id):
+    def iter_input(self, batch_id):
+        """Stream the input CSV for the batch row by row
+
+        Args:
+            batch_id (int): Batch id
+
+        Returns:
+            csv.DictReader: iterator over row dicts with the header in fieldnames
+        """
+        url = self.Urls.input.format(base=self.base_url, id=batch_id)
+        return csv.DictReader(self._stream_lines(url))
+
+    def iter_results(self, batch_id):
+        """Stream the results CSV for the batch row by row
+
+        Args:
+            batch_id (int): Batch id
+
+        Returns:
+            csv.DictReader: iterator over row dicts with the header in fieldnames
+        """
+        url = self.Urls.results.format(base=self.base_url, id=batch_id)
+        return csv.DictReader(self._stream_lines(url))
+
+    def results_table(self, batch_id, types=None):
+        """Stream the results CSV for the batch into a columnar table
+
+        Args:
+            batch_id (int): Batch id
+            types (dict): Optional column name to type (int, float, timestamp, category) overrides
+
+        Returns:
+            ResultsTable: typed columns of the results
+        """
+        url = self.Urls.results.format(base=self.base_url, id=batch_id)
+        return ResultsTable.from_rows(csv.reader(self._stream_lines(url)), types)
+
+    def progress(self, batch_id, records=False):
         """Get the progress information for the batch
 
         Args:
             batch_id (int): batch id
+            records (bool): Return a compact Progress record instead of a dict
 
         Returns:
              dict: progress object as dict
         """
         url = self.Urls.progress.format(base=self.base_url, id=batch_id)
         response = self._get(url)
-        return response.json()
+        return record_types.Progress.from_json(response.json()) if records else response.json()
 
 
 class Permissions(ClientBase):
@@ -396,19 +869,20 @@ class Permissions(ClientBase):
             raise TurkleClientException(f"Unrecognized instance type: {instance_type}")
         return url
 
-    def retrieve(self, instance_type, instance_id):
+    def retrieve(self, instance_type, instance_id, records=False):
         """Retrieve the permissions for a project or batch
 
         Args:
             instance_type (str): Name of the type (project, batch)
             instance_id (int): ID of the project or batch
+            records (bool): Return a compact PermissionSet record instead of a dict
 
         Returns:
             dict: representation of the permissions
         """
         url = self._get_url(instance_type, instance_id)
         response = self._get(url)
-        return response.json()
+        return record_types.PermissionSet.from_json(response.json()) if records else response.json()
 
     def add(self, instance_type, instance_id, permissions):
         """Add additional users and groups to the permissions
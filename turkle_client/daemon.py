@@ -0,0 +1,465 @@
+"""
+Optional background daemon that runs turkle-client commands
+
+Running the command line starts Python, imports requests and opens a new
+connection to the site every time. The daemon does that once and keeps a
+pooled client per site between commands. The turkle-client entry point in
+this module only uses the standard library so a command that is handed to a
+running daemon returns in milliseconds:
+  turkle-client daemon start
+  turkle-client users list
+  turkle-client daemon stop
+
+The daemon listens on a Unix socket that only the user can open and exits
+after a period without commands. Commands that change the site, commands
+from a different version of turkle-client and commands with different
+proxy, certificate or config settings in the environment run in the
+calling process instead. A command that changes the site then stops on
+Ctrl-C like it does without the daemon.
+"""
+import argparse
+import io
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stderr, redirect_stdout
+
+from .__version__ import __version__
+from .exceptions import TurkleClientException
+
+DEFAULT_IDLE_TIMEOUT = 600
+START_TIMEOUT = 10
+# seconds a caller has to send its request line so one stuck peer cannot block the daemon
+REQUEST_TIMEOUT = 5
+MAX_REQUEST_BYTES = 1024 * 1024
+# set to run every command in the calling process
+NO_DAEMON_ENV = 'TURKLE_CLIENT_NO_DAEMON'
+
+# frames sent by the daemon are a tag, a 4 byte length and the payload
+STDOUT = b'o'
+STDERR = b'e'
+EXIT = b'x'
+REPLY = b'r'
+HEADER = struct.Struct('>cI')
+STREAM_BUFFER = 65536
+
+# global options of the command line that take a value
+VALUE_OPTIONS = {'-t', '--token', '-u', '--url'}
+
+# subcommands that only read from the site and can run in the daemon
+DAEMON_COMMANDS = {
+    'users': {'list', 'retrieve'},
+    'groups': {'list', 'retrieve'},
+    'projects': {'list', 'retrieve', 'batches', 'results'},
+    'batches': {'list', 'retrieve', 'input', 'results', 'progress'},
+    'permissions': {'retrieve'},
+    'warehouse': {'sync', 'query'},
+    'analysis': {'agreement', 'score', 'throughput'},
+    'mirror': {None},
+    'audit': {None},
+}
+
+# environment that changes how commands connect or where the config is read
+FORWARDED_ENV = (
+    'HTTP_PROXY', 'HTTPS_PROXY', 'ALL_PROXY', 'NO_PROXY',
+    'http_proxy', 'https_proxy', 'all_proxy', 'no_proxy',
+    'REQUESTS_CA_BUNDLE', 'CURL_CA_BUNDLE', 'SSL_CERT_FILE', 'SSL_CERT_DIR',
+    'HOME', 'XDG_CONFIG_HOME',
+)
+
+
+def environment():
+    """The settings from the environment that a daemon's commands must share with the caller"""
+    return {name: os.environ[name] for name in FORWARDED_ENV if name in os.environ}
+
+
+def runtime_dir():
+    """Directory for the socket that only the current user can access"""
+    base = os.environ.get('XDG_RUNTIME_DIR')
+    if base:
+        path = os.path.join(base, 'turkle-client')
+    else:
+        path = os.path.join(tempfile.gettempdir(), f'turkle-client-{os.getuid()}')
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise TurkleClientException(f"{path} must be owned by the current user with mode 0700")
+    return path
+
+
+def socket_path():
+    return os.path.join(runtime_dir(), 'daemon.sock')
+
+
+def send_frame(sock, tag, payload=b''):
+    sock.sendall(HEADER.pack(tag, len(payload)) + payload)
+
+
+def read_frames(sock):
+    """Yields (tag, payload) frames until the daemon closes the connection"""
+    fh = sock.makefile('rb')
+    while True:
+        header = fh.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return
+        tag, length = HEADER.unpack(header)
+        payload = fh.read(length)
+        if len(payload) < length:
+            return
+        yield tag, payload
+
+
+def connect(path=None):
+    """Connect to a running daemon or return None"""
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    try:
+        path = path or socket_path()
+    except (OSError, TurkleClientException):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def request(sock, message):
+    sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+
+def forward(argv, path=None, out=None, err=None):
+    """Run a command line in a running daemon
+
+    Args:
+        argv (list): command line arguments without the program name
+        path (str): Optional socket path
+        out (file): Binary stream for the command's output (default stdout)
+        err (file): Binary stream for the command's errors (default stderr)
+
+    Returns:
+        int: exit status of the command or None if it must run in this process
+    """
+    if os.environ.get(NO_DAEMON_ENV):
+        return None
+    sock = connect(path)
+    if sock is None:
+        return None
+    out = out or sys.stdout.buffer
+    err = err or sys.stderr.buffer
+    with sock:
+        request(sock, {'argv': list(argv), 'cwd': os.getcwd(), 'version': __version__,
+                       'env': environment()})
+        for tag, payload in read_frames(sock):
+            if tag == REPLY:
+                # a command that changes the site or a daemon with other code or settings
+                return None
+            if tag == STDOUT:
+                out.write(payload)
+            elif tag == STDERR:
+                err.write(payload)
+            elif tag == EXIT:
+                out.flush()
+                err.flush()
+                return int(payload)
+    err.write(b"Error: lost the connection to the turkle-client daemon\n")
+    err.flush()
+    return 1
+
+
+def control(command, path=None):
+    """Send a control command (status, stop) to a running daemon
+
+    Returns:
+        dict: reply of the daemon or None if no daemon is running
+    """
+    sock = connect(path)
+    if sock is None:
+        return None
+    with sock:
+        request(sock, {'control': command})
+        for tag, payload in read_frames(sock):
+            if tag == REPLY:
+                return json.loads(payload)
+    return None
+
+
+def start(idle_timeout=DEFAULT_IDLE_TIMEOUT, path=None):
+    """Start a daemon in the background and wait for it to accept commands
+
+    Returns:
+        str: message about the daemon
+    """
+    path = path or socket_path()
+    status = control('status', path)
+    if status:
+        return f"Daemon already running (pid {status['pid']})"
+    log_path = os.path.join(os.path.dirname(path), 'daemon.log')
+    with os.fdopen(os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600), 'ab') as log:
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'turkle_client.daemon', '--socket', path,
+             '--idle-timeout', str(idle_timeout)],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=log,
+            start_new_session=True, close_fds=True
+        )
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        status = control('status', path)
+        if status:
+            return f"Daemon started (pid {status['pid']}) on {path}"
+        if process.poll() is not None:
+            break
+        time.sleep(0.05)
+    raise TurkleClientException(f"Daemon did not start. See {log_path}")
+
+
+def stop(path=None):
+    if control('stop', path) is None:
+        return "Daemon is not running"
+    return "Daemon stopped"
+
+
+def status(path=None):
+    reply = control('status', path)
+    if reply is None:
+        return "Daemon is not running"
+    return (f"Daemon running (pid {reply['pid']}) for {reply['uptime']:.0f}s, "
+            f"{reply['commands']} commands, {reply['clients']} cached clients")
+
+
+class SocketBuffer:
+    """Binary stream that sends what is written to the client as frames"""
+    def __init__(self, sock, tag):
+        self.sock = sock
+        self.tag = tag
+        self.pending = bytearray()
+        self.written = 0
+        self.closed = False
+
+    def write(self, data):
+        self.pending += data
+        self.written += len(data)
+        if len(self.pending) >= STREAM_BUFFER:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self.pending:
+            send_frame(self.sock, self.tag, bytes(self.pending))
+            self.pending.clear()
+
+    def tell(self):
+        return self.written
+
+    def writable(self):
+        return True
+
+
+class SocketStream:
+    """Text stream used as stdout or stderr of a command run by the daemon"""
+    encoding = 'utf-8'
+
+    def __init__(self, sock, tag):
+        # parquet output is written to the binary buffer like a real stdout
+        self.buffer = SocketBuffer(sock, tag)
+
+    def write(self, text):
+        self.buffer.write(text.encode('utf-8'))
+        return len(text)
+
+    def flush(self):
+        self.buffer.flush()
+
+    def isatty(self):
+        return False
+
+
+class Daemon:
+    """
+    Server that runs command lines sent to its Unix socket
+
+    Commands run one at a time in the daemon's process with relative file
+    paths resolved against the caller's directory. Clients and their
+    connection pools are kept for each site and token.
+    """
+    def __init__(self, path=None, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        """Construct a daemon
+
+        Args:
+            path (str): Optional socket path
+            idle_timeout (float): Seconds without a command before exiting (0 for never)
+        """
+        self.path = path or socket_path()
+        self.idle_timeout = idle_timeout
+        self.running = False
+        self.commands = 0
+        self.started = None
+        self.cli = None
+        self.env = environment()
+        self._lock_fh = None
+
+    def _acquire_lock(self):
+        import fcntl
+        self._lock_fh = os.fdopen(os.open(self.path + '.lock', os.O_WRONLY | os.O_CREAT, 0o600), 'w')
+        try:
+            fcntl.flock(self._lock_fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_fh.close()
+            raise TurkleClientException(f"A daemon is already running on {self.path}")
+        # the lock is held so a socket file left by a daemon that was killed is stale
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _listen(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(umask)
+        os.chmod(self.path, 0o600)
+        sock.listen(64)
+        sock.settimeout(self.idle_timeout or None)
+        return sock
+
+    def serve(self):
+        """Accept commands until stopped or idle"""
+        # the command line is imported once here instead of for every command
+        from .bin import Cli
+        self.cli = Cli(cache_clients=True)
+        self._acquire_lock()
+        sock = self._listen()
+        self.running = True
+        self.started = time.time()
+        try:
+            while self.running:
+                try:
+                    conn, _ = sock.accept()
+                except socket.timeout:
+                    break
+                with conn:
+                    try:
+                        self.handle(conn)
+                    except OSError:
+                        # the caller went away while output was being sent
+                        pass
+        finally:
+            self.running = False
+            sock.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self._lock_fh.close()
+
+    def _same_user(self, conn):
+        if not hasattr(socket, 'SO_PEERCRED'):
+            return True
+        creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        _, uid, _ = struct.unpack('3i', creds)
+        return uid == os.getuid()
+
+    def handle(self, conn):
+        if not self._same_user(conn):
+            return
+        conn.settimeout(REQUEST_TIMEOUT)
+        line = conn.makefile('rb').readline(MAX_REQUEST_BYTES)
+        conn.settimeout(None)
+        try:
+            message = json.loads(line)
+        except ValueError:
+            return
+        if not isinstance(message, dict):
+            return
+        if message.get('control') == 'status':
+            self._reply(conn, self.status())
+        elif message.get('control') == 'stop':
+            self._reply(conn, {'stopping': True})
+            self.running = False
+        elif isinstance(message.get('argv'), list):
+            if message.get('version') != __version__:
+                # an upgraded install must not keep running the old code
+                self._reply(conn, {'fallback': f"daemon runs version {__version__}"})
+                self.running = False
+            elif message.get('env', {}) != self.env:
+                self._reply(conn, {'fallback': 'environment differs from the daemon'})
+            elif not self.runs_in_daemon(message['argv']):
+                # the daemon cannot stop a command when its caller is interrupted
+                self._reply(conn, {'fallback': 'command changes the site'})
+            else:
+                self.run_command(conn, message['argv'], message.get('cwd'))
+
+    def runs_in_daemon(self, argv):
+        """Whether a command line only reads from the site"""
+        try:
+            with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+                args = self.cli.parser.parse_args(argv)
+        except SystemExit:
+            # help and argument errors are printed by the daemon like any output
+            return True
+        if args.command is None:
+            return True
+        return getattr(args, 'subcommand', None) in DAEMON_COMMANDS.get(args.command, ())
+
+    def _reply(self, conn, data):
+        send_frame(conn, REPLY, json.dumps(data).encode('utf-8'))
+
+    def status(self):
+        return {'pid': os.getpid(), 'uptime': time.time() - self.started,
+                'commands': self.commands, 'clients': len(self.cli.clients)}
+
+    def run_command(self, conn, argv, cwd=None):
+        from .bin import run
+        self.commands += 1
+        out = SocketStream(conn, STDOUT)
+        err = SocketStream(conn, STDERR)
+        code = 0
+        with redirect_stdout(out), redirect_stderr(err):
+            try:
+                run(self.cli, argv, cwd)
+            except SystemExit as e:
+                # argparse exits for --help and bad arguments
+                code = e.code if isinstance(e.code, int) else int(e.code is not None)
+        out.flush()
+        err.flush()
+        send_frame(conn, EXIT, str(code).encode())
+
+
+def command_of(argv):
+    """The object command of a command line (users, daemon, ...) or None"""
+    args = iter(argv)
+    for arg in args:
+        if arg in VALUE_OPTIONS:
+            next(args, None)
+        elif not arg.startswith('-'):
+            return arg
+    return None
+
+
+def main():
+    """Entry point of turkle-client that hands the command to a running daemon"""
+    argv = sys.argv[1:]
+    if command_of(argv) != 'daemon':
+        code = forward(argv)
+        if code is not None:
+            sys.exit(code)
+    from .bin import main as cli_main
+    cli_main()
+
+
+def serve_main():
+    parser = argparse.ArgumentParser(description='Turkle client daemon')
+    parser.add_argument('--socket', help='Socket path')
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help='Seconds without a command before exiting (0 for never)')
+    args = parser.parse_args()
+    Daemon(args.socket, args.idle_timeout).serve()
+
+
+if __name__ == '__main__':
+    serve_main()
@@ -0,0 +1,66 @@
+import csv
+import json
+import os
+import tempfile
+
+from .exceptions import TurkleClientException
+from .parallel import DEFAULT_WORKERS, bounded_map
+
+FORMATS = ['csv', 'jsonl']
+
+
+def write_merged_results(batches, batch_ids, fh, fmt='csv', max_workers=DEFAULT_WORKERS):
+    """
+    Write the results of several batches as one CSV or jsonl stream
+
+    Each batch is streamed to a temporary file by a worker so that no more than
+    one row of a batch is held in memory. The CSV header is the union of the
+    batch headers in the order fields were first seen. Every row is tagged with
+    a batch_id field.
+
+    Args:
+        batches (Batches): Batches client
+        batch_ids (list): Batch ids in output order
+        fh (file): Text file handle to write to
+        fmt (str): Output format (csv, jsonl)
+        max_workers (int): Number of concurrent downloads
+
+    Returns:
+        int: number of rows written
+    """
+    if fmt not in FORMATS:
+        raise TurkleClientException(f"Unsupported results format: {fmt}")
+
+    with tempfile.TemporaryDirectory(prefix='turkle-results-') as tmp_dir:
+        def spool(batch_id):
+            path = os.path.join(tmp_dir, f"{batch_id}.jsonl")
+            reader = batches.iter_results(batch_id)
+            with open(path, 'w', encoding='utf-8') as spool_fh:
+                for row in reader:
+                    spool_fh.write(json.dumps(row) + '\n')
+            return batch_id, reader.fieldnames or [], path
+
+        spooled = bounded_map(spool, batch_ids, max_workers)
+        if fmt == 'jsonl':
+            # no header to compute so rows are written as soon as each batch is ready
+            return sum(_copy_rows(batch_id, path, fh.write, json.dumps)
+                       for batch_id, _, path in spooled)
+
+        spooled = list(spooled)
+        header = {'batch_id': None}
+        for _, fieldnames, _ in spooled:
+            header.update((name, None) for name in fieldnames)
+        writer = csv.DictWriter(fh, fieldnames=list(header), restval='', extrasaction='ignore')
+        writer.writeheader()
+        return sum(_copy_rows(batch_id, path, writer.writerow) for batch_id, _, path in spooled)
+
+
+def _copy_rows(batch_id, path, write, encode=None):
+    count = 0
+    with open(path, 'r', encoding='utf-8') as spool_fh:
+        for line in spool_fh:
+            row = {'batch_id': batch_id, **json.loads(line)}
+            write(encode(row) + '\n' if encode else row)
+            count += 1
+    os.remove(path)
+    return count
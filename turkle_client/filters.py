@@ -0,0 +1,141 @@
+import datetime
+
+from .exceptions import TurkleClientException
+from .table import parse_timestamp
+
+EXACT = 'exact'
+BOOL = 'bool'
+SINCE = 'since'
+
+TRUE_STRINGS = {'true', '1', 'yes'}
+FALSE_STRINGS = {'false', '0', 'no'}
+
+
+class ListFilter:
+    """
+    Filter for a list endpoint
+
+    The filter is sent to the server as a query parameter so fewer objects are
+    downloaded. Sites that ignore the parameter return everything, so the same
+    filter is checked again on each object that comes back.
+    """
+    def __init__(self, field, kind=EXACT, param=None):
+        """Construct a filter
+
+        Args:
+            field (str): Field of the objects that is compared
+            kind (str): exact, bool or since (timestamp at or after the value)
+            param (str): Query parameter if not the same as the field
+        """
+        self.field = field
+        self.kind = kind
+        self.param = param or field
+
+    def parse(self, value):
+        """Convert a value from python or the command line for comparing"""
+        if self.kind == BOOL:
+            if isinstance(value, str):
+                lowered = value.strip().lower()
+                if lowered not in TRUE_STRINGS | FALSE_STRINGS:
+                    raise TurkleClientException(f"{self.field} filter must be true or false")
+                return lowered in TRUE_STRINGS
+            return bool(value)
+        if self.kind == SINCE:
+            if isinstance(value, datetime.datetime):
+                if value.tzinfo is None:
+                    value = value.replace(tzinfo=datetime.timezone.utc)
+                return value.timestamp()
+            if isinstance(value, datetime.date):
+                return datetime.datetime(value.year, value.month, value.day,
+                                         tzinfo=datetime.timezone.utc).timestamp()
+            timestamp = parse_timestamp(str(value))
+            if timestamp is None:
+                raise TurkleClientException(f"{self.field} filter must be a date or timestamp")
+            return timestamp
+        return value
+
+    def query_value(self, value):
+        """The query parameter value for a parsed value"""
+        if self.kind == BOOL:
+            return 'true' if value else 'false'
+        if self.kind == SINCE:
+            dt = datetime.datetime.fromtimestamp(value, datetime.timezone.utc)
+            return dt.isoformat().replace('+00:00', 'Z')
+        return value
+
+    def matches(self, obj, value):
+        """Whether an object from the list passes the filter"""
+        actual = obj.get(self.field)
+        if actual is None:
+            return False
+        if self.kind == BOOL:
+            return bool(actual) == value
+        if self.kind == SINCE:
+            timestamp = parse_timestamp(actual) if isinstance(actual, str) else None
+            return timestamp is not None and timestamp >= value
+        return str(actual) == str(value)
+
+
+USER_FILTERS = {
+    'username': ListFilter('username'),
+    'active': ListFilter('is_active', BOOL),
+    'staff': ListFilter('is_staff', BOOL),
+    'created_since': ListFilter('date_joined', SINCE, 'date_joined__gte'),
+}
+GROUP_FILTERS = {
+    'name': ListFilter('name'),
+}
+PROJECT_FILTERS = {
+    'active': ListFilter('active', BOOL),
+    'login_required': ListFilter('login_required', BOOL),
+    'created_by': ListFilter('created_by'),
+    'created_since': ListFilter('created_at', SINCE, 'created_at__gte'),
+}
+BATCH_FILTERS = {
+    'project': ListFilter('project'),
+    'active': ListFilter('active', BOOL),
+    'completed': ListFilter('completed', BOOL),
+    'published': ListFilter('published', BOOL),
+    'created_by': ListFilter('created_by'),
+    'created_since': ListFilter('created_at', SINCE, 'created_at__gte'),
+}
+
+
+def resolve_filters(available, filters):
+    """Look up and parse the filters passed to a list method
+
+    Args:
+        available (dict): filter name to ListFilter
+        filters (dict): filter name to value (None values are skipped)
+
+    Returns:
+        list: (ListFilter, parsed value) pairs
+    """
+    resolved = []
+    for name, value in filters.items():
+        if value is None:
+            continue
+        if name not in available:
+            names = ', '.join(sorted(available)) or 'none'
+            raise TurkleClientException(f"Unknown filter {name} (available: {names})")
+        list_filter = available[name]
+        resolved.append((list_filter, list_filter.parse(value)))
+    return resolved
+
+
+def query_params(resolved, page_size=None):
+    """Query parameters for resolved filters and an optional page size"""
+    params = {list_filter.param: list_filter.query_value(value) for list_filter, value in resolved}
+    if page_size:
+        params['page_size'] = int(page_size)
+    return params
+
+
+def make_predicate(resolved):
+    """Function that checks an object against all the resolved filters or None if none"""
+    if not resolved:
+        return None
+
+    def predicate(obj):
+        return all(list_filter.matches(obj, value) for list_filter, value in resolved)
+    return predicate
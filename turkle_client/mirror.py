@@ -0,0 +1,188 @@
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+
+from .client import Permissions
+from .parallel import DEFAULT_WORKERS, bounded_map
+
+
+def canonical_json(obj):
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'))
+
+
+def fingerprint(obj):
+    return hashlib.sha256(canonical_json(obj).encode('utf-8')).hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed files named by the sha256 of their contents
+
+    Identical content is stored once, so unchanged objects cost nothing on later snapshots.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def __contains__(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, data):
+        """Store bytes or text and return its digest
+
+        Args:
+            data (bytes or str): content to store
+
+        Returns:
+            str: sha256 hex digest
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write then rename so concurrent workers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def put_json(self, obj):
+        return self.put(canonical_json(obj))
+
+    def get(self, digest):
+        with open(self.path(digest), 'rb') as fh:
+            return fh.read()
+
+    def get_json(self, digest):
+        return json.loads(self.get(digest))
+
+
+class Mirror:
+    """
+    Local snapshot of a Turkle site for disaster recovery and audits
+
+    Users, groups, projects (with templates), batches (with input and results
+    CSVs) and project and batch permissions are written to a content-addressed
+    object store under the directory. The manifest.json file maps each object
+    to its digests and a copy of each manifest is kept in snapshots/.
+
+    On later runs, project details are only downloaded when the project's
+    metadata changed and batch CSVs only when the batch's metadata or progress
+    changed. Permissions are small and have no change signal so they are always fetched.
+      mirror = Mirror(client, '/backups/turkle')
+      mirror.run()
+    """
+    def __init__(self, client, directory, max_workers=DEFAULT_WORKERS):
+        """Construct a mirror
+
+        Args:
+            client (Client): Turkle client instance
+            directory (str): Mirror directory
+            max_workers (int): Number of concurrent requests
+        """
+        self.client = client
+        self.directory = directory
+        self.max_workers = max_workers
+        self.store = BlobStore(os.path.join(directory, 'objects'))
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+
+    def load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as fh:
+                return json.load(fh)
+        return {'users': {}, 'groups': {}, 'projects': {}, 'batches': {}}
+
+    def run(self):
+        """Fetch everything that changed since the last run and write a new manifest
+
+        Returns:
+            dict: counts of users, groups, projects and batches and how many were downloaded
+        """
+        previous = self.load_manifest()
+        manifest = {
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'url': self.client.users.base_url,
+        }
+
+        sections = ['users', 'groups', 'projects', 'batches']
+        lists = dict(zip(sections, bounded_map(
+            lambda section: getattr(self.client, section).list(), sections, self.max_workers)))
+        manifest['users'] = {str(user['id']): self.store.put_json(user) for user in lists['users']}
+        manifest['groups'] = {str(group['id']): self.store.put_json(group) for group in lists['groups']}
+
+        downloads = 0
+        for section, mirror_fn in [('projects', self._mirror_project), ('batches', self._mirror_batch)]:
+            old_entries = previous.get(section, {})
+            manifest[section] = {}
+            for obj_id, entry, downloaded in bounded_map(
+                    lambda obj: mirror_fn(obj, old_entries.get(str(obj['id']))),
+                    lists[section], self.max_workers):
+                manifest[section][obj_id] = entry
+                downloads += downloaded
+
+        self._write_manifest(manifest)
+        return {
+            'users': len(manifest['users']),
+            'groups': len(manifest['groups']),
+            'projects': len(manifest['projects']),
+            'batches': len(manifest['batches']),
+            'downloaded': downloads,
+        }
+
+    def _unchanged(self, old, entry, signals, blobs):
+        # an object is re-downloaded if a signal changed or one of its blobs is missing
+        return (old is not None
+                and all(old.get(key) == entry[key] for key in signals)
+                and all(old.get(key) in self.store for key in blobs))
+
+    def _mirror_project(self, project, old):
+        entry = {'metadata': fingerprint(project)}
+        unchanged = self._unchanged(old, entry, ['metadata'], ['detail'])
+        if unchanged:
+            entry['detail'] = old['detail']
+        else:
+            entry['detail'] = self.store.put_json(self.client.projects.retrieve(project['id']))
+        entry['permissions'] = self.store.put_json(
+            self.client.permissions.retrieve(Permissions.PROJECT, project['id']))
+        return str(project['id']), entry, not unchanged
+
+    def _mirror_batch(self, batch, old):
+        progress = self.client.batches.progress(batch['id'])
+        entry = {
+            'metadata': fingerprint(batch),
+            'progress': fingerprint(progress),
+            'total_tasks': progress.get('total_tasks'),
+        }
+        unchanged = self._unchanged(old, entry, ['metadata', 'progress'], ['detail', 'input', 'results'])
+        if unchanged:
+            entry.update({key: old[key] for key in ['detail', 'input', 'results']})
+        else:
+            entry['detail'] = self.store.put_json(self.client.batches.retrieve(batch['id']))
+            # the input only changes when tasks are added
+            if self._unchanged(old, entry, ['total_tasks'], ['input']):
+                entry['input'] = old['input']
+            else:
+                entry['input'] = self.store.put(self.client.batches.input(batch['id']))
+            entry['results'] = self.store.put(self.client.batches.results(batch['id']))
+        entry['permissions'] = self.store.put_json(
+            self.client.permissions.retrieve(Permissions.BATCH, batch['id']))
+        return str(batch['id']), entry, not unchanged
+
+    def _write_manifest(self, manifest):
+        snapshots = os.path.join(self.directory, 'snapshots')
+        os.makedirs(snapshots, exist_ok=True)
+        stamp = manifest['created_at'].replace(':', '').replace('+', '_')
+        with open(os.path.join(snapshots, f"{stamp}.json"), 'w') as fh:
+            json.dump(manifest, fh, indent=1)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as fh:
+            json.dump(manifest, fh, indent=1)
+        os.replace(tmp_path, self.manifest_path)
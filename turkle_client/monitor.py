@@ -23,7 +23,11 @@ class BatchMonitor:
         start_time = time.time()
         while not self._stop_event.is_set():
             try:
-                progress = self.client.batches.progress(self.batch_id)
+                batches = self.client.batches
+                if timeout is not None:
+                    # a slow request cannot keep the monitor waiting past its timeout
+                    batches = batches.with_deadline(timeout - (time.time() - start_time))
+                progress = batches.progress(self.batch_id)
                 if self.goal_fn(progress):
                     self.callback_fn(progress)
                     return
@@ -0,0 +1,20 @@
+import importlib
+
+from .exceptions import TurkleClientException
+
+
+def import_optional(name, extra):
+    """Import an optional dependency or raise an exception explaining how to install it
+
+    Args:
+        name (str): Module name like numpy or pyarrow.parquet
+        extra (str): Name of the turkle-client extra that installs it
+
+    Returns:
+        module: the imported module
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        raise TurkleClientException(
+            f"{name} is required for this feature (pip install turkle-client[{extra}])")
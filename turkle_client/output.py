@@ -0,0 +1,116 @@
+import csv
+import json
+from itertools import islice
+
+from .exceptions import TurkleClientException
+from .optional import import_optional
+
+JSONL = 'jsonl'
+JSON = 'json'
+CSV = 'csv'
+PARQUET = 'parquet'
+FORMATS = [JSONL, JSON, CSV, PARQUET]
+
+# records per parquet row group
+PARQUET_BATCH = 10000
+
+
+def parse_fields(fields):
+    """Parse a comma separated list of field names from the command line"""
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(',') if field.strip()]
+
+
+def project(record, fields):
+    # records from the client can be dicts or Record objects
+    if fields is None:
+        return record if isinstance(record, dict) else dict(record)
+    return {field: record.get(field) for field in fields}
+
+
+def cell(value):
+    # lists like a group's users do not fit in a CSV cell so they are written as json
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+def write_output(result, fh, fmt=JSONL, fields=None):
+    """Write the result of a command one record at a time
+
+    A dict is written as a single record and lists or iterators as a stream
+    of records, so a list from an iterator is never held in memory.
+
+    Args:
+        result (dict or Iterable): record or records
+        fh (file): Text file handle (parquet writes to its binary buffer)
+        fmt (str): Output format (jsonl, json, csv, parquet)
+        fields (list): Optional fields to keep in each record
+
+    Returns:
+        int: number of records written
+    """
+    if fmt not in FORMATS:
+        raise TurkleClientException(f"Unsupported output format: {fmt}")
+    single = isinstance(result, dict)
+    records = (project(record, fields) for record in ([result] if single else result))
+    if fmt == JSONL:
+        count = 0
+        for count, record in enumerate(records, start=1):
+            fh.write(json.dumps(record) + '\n')
+        return count
+    if fmt == JSON:
+        if single:
+            fh.write(json.dumps(next(records)) + '\n')
+            return 1
+        return _write_json_array(records, fh)
+    if fmt == CSV:
+        return _write_csv(records, fh, fields)
+    return _write_parquet(records, getattr(fh, 'buffer', fh))
+
+
+def _write_json_array(records, fh):
+    count = 0
+    fh.write('[')
+    for count, record in enumerate(records, start=1):
+        fh.write((',\n' if count > 1 else '\n') + json.dumps(record))
+    fh.write('\n]\n' if count else ']\n')
+    return count
+
+
+def _write_csv(records, fh, fields):
+    # without --fields, the columns come from the first record like the API objects
+    writer = None
+    count = 0
+    for count, record in enumerate(records, start=1):
+        if writer is None:
+            writer = csv.DictWriter(fh, fieldnames=fields or list(record), restval='',
+                                    extrasaction='ignore')
+            writer.writeheader()
+        writer.writerow({key: cell(value) for key, value in record.items()})
+    return count
+
+
+def _write_parquet(records, fh):
+    pa = import_optional('pyarrow', 'arrow')
+    pq = import_optional('pyarrow.parquet', 'arrow')
+    writer = None
+    count = 0
+    try:
+        while True:
+            rows = list(islice(records, PARQUET_BATCH))
+            if not rows:
+                break
+            if writer is None:
+                table = pa.Table.from_pylist(rows)
+                writer = pq.ParquetWriter(fh, table.schema)
+            else:
+                # later row groups must match the schema inferred from the first
+                table = pa.Table.from_pylist(rows, schema=writer.schema)
+            writer.write_table(table)
+            count += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
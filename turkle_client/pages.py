@@ -0,0 +1,149 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .parallel import DEFAULT_WORKERS, bounded_map
+
+DEFAULT_CACHE_PAGES = 16
+
+
+def set_query(url, **params):
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.update({key: str(value) for key, value in params.items()})
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class PagedList(Sequence):
+    """
+    Lazy sequence over a paginated list endpoint
+
+    The first page is fetched when the list is created to get the count and
+    page size. Indexing or slicing only fetches the pages that cover the
+    requested items and fetched pages are kept in a small LRU cache:
+      batches = client.batches.list(lazy=True)
+      len(batches)
+      newest = batches[-10:]
+
+    Iterating fetches the pages in order while the next page is downloaded in
+    the background.
+    """
+    def __init__(self, client, url, cache_pages=DEFAULT_CACHE_PAGES, max_workers=DEFAULT_WORKERS,
+                 convert=None):
+        """Construct a paged list
+
+        Args:
+            client (ClientBase): client used to fetch the pages
+            url (str): URL of the first page
+            cache_pages (int): Maximum number of pages kept in memory
+            max_workers (int): Number of concurrent page downloads for slices
+            convert (Callable): Optional function applied to each object like Record.from_json
+        """
+        self.client = client
+        self.url = url
+        self.convert = convert
+        self.cache_pages = max(1, cache_pages)
+        self.max_workers = max_workers
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        # next links seen so far for sites that do not use page or offset parameters
+        self._links = {0: url}
+        data = self._fetch(0)
+        self.count = data['count']
+        self.page_size = len(data['results']) or 1
+        self._scheme = self._detect_scheme(data['next'])
+        self._store(0, [convert(obj) for obj in data['results']] if convert else data['results'])
+
+    def _detect_scheme(self, next_url):
+        if next_url is None:
+            return None
+        query = dict(parse_qsl(urlsplit(next_url).query))
+        if 'page' in query:
+            return 'page'
+        if 'offset' in query:
+            return 'offset'
+        return 'links'
+
+    def _page_url(self, number):
+        if number == 0:
+            return self.url
+        if self._scheme == 'page':
+            return set_query(self.url, page=number + 1)
+        if self._scheme == 'offset':
+            return set_query(self.url, offset=number * self.page_size, limit=self.page_size)
+        # without a known scheme the next links are followed from the last known page
+        with self._lock:
+            known = max(page for page in self._links if page <= number)
+        while known < number:
+            self._fetch(known)
+            known += 1
+        return self._links[number]
+
+    def _fetch(self, number):
+        url = self._links.get(number) or self._page_url(number)
+        data = self.client._get(url).json()
+        with self._lock:
+            if data['next']:
+                self._links[number + 1] = data['next']
+        return data
+
+    def _store(self, number, results):
+        with self._lock:
+            self._cache[number] = results
+            self._cache.move_to_end(number)
+            while len(self._cache) > self.cache_pages:
+                self._cache.popitem(last=False)
+
+    def _page(self, number):
+        with self._lock:
+            if number in self._cache:
+                self._cache.move_to_end(number)
+                return self._cache[number]
+        results = self._fetch(number)['results']
+        if self.convert:
+            results = [self.convert(obj) for obj in results]
+        self._store(number, results)
+        return results
+
+    @property
+    def num_pages(self):
+        return -(-self.count // self.page_size)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            indexes = range(*index.indices(self.count))
+            if not indexes:
+                return []
+            first, last = sorted([indexes[0], indexes[-1]])
+            numbers = range(first // self.page_size, last // self.page_size + 1)
+            # the pages of a slice are downloaded concurrently
+            pages = dict(zip(numbers, bounded_map(self._page, numbers, self.max_workers)))
+            return [self._item(pages[i // self.page_size], i) for i in indexes]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('list index out of range')
+        return self._item(self._page(index // self.page_size), index)
+
+    def _item(self, page, index):
+        offset = index % self.page_size
+        if offset >= len(page):
+            # the list shrank since the count was read
+            raise IndexError('list index out of range')
+        return page[offset]
+
+    def __iter__(self):
+        if self._scheme == 'links':
+            # each page is needed to find the next one so there is nothing to prefetch
+            pages = (self._page(number) for number in range(self.num_pages))
+        else:
+            pages = bounded_map(self._page, range(self.num_pages), 1)
+        for page in pages:
+            yield from page
+
+    def __repr__(self):
+        return f"<PagedList {self.url} count={self.count}>"
@@ -0,0 +1,91 @@
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+DEFAULT_WORKERS = 8
+
+
+def bounded_map(fn, items, max_workers=DEFAULT_WORKERS):
+    """
+    Apply a function to items on a thread pool and yield the results in input order.
+
+    At most 2 * max_workers calls are in flight at once so that large inputs
+    and large results (like CSV downloads) are not all held in memory.
+
+    Args:
+        fn (Callable): Function applied to each item
+        items (Iterable): Items to process
+        max_workers (int): Number of worker threads
+
+    Returns:
+        Iterator: iterator over the results of fn
+    """
+    max_workers = max(1, int(max_workers))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        try:
+            for item in items:
+                pending.append(executor.submit(fn, item))
+                if len(pending) >= 2 * max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class Singleflight:
+    """
+    Shares one call among concurrent callers that ask for the same key
+
+    The first caller runs the function and callers that arrive before it
+    finishes wait for its result (or exception) instead of repeating the call.
+    Nothing is cached after the call finishes.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, fn, timeout=None):
+        """Run fn or wait for the call with the same key that is in flight
+
+        Args:
+            key (Hashable): identifies identical calls
+            fn (Callable): function without arguments
+            timeout (float): Seconds to wait for a call made by another caller (None for no limit)
+
+        Returns:
+            the result of fn
+
+        Raises:
+            concurrent.futures.TimeoutError: if the shared call does not finish within timeout
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+        if leader:
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+        return future.result(timeout=timeout)
+
+    def stats(self):
+        """Number of calls made and calls saved by sharing
+
+        Returns:
+            dict: calls and shared counts
+        """
+        with self._lock:
+            return {'calls': self.calls, 'shared': self.shared}
@@ -0,0 +1,82 @@
+import csv
+import json
+import mmap
+import os
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+    json_loads = json.loads
+
+
+def load_records(file_path, exts=None):
+    """
+    Yields dictionaries from a .jsonl, .json or .csv file.
+
+    jsonl files are read through mmap and decoded with orjson when it is
+    installed. Errors report the line in the file.
+
+    Args:
+        file_path (str): Path to the input file
+        exts (list): List of extensions to support
+
+    Returns:
+        Iterator: iterator over dictionaries
+    """
+    exts = exts if exts else ['.jsonl', '.json', '.csv']
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext not in exts:
+        raise ValueError(f"Unsupported file format: {ext}")
+
+    try:
+        if ext == '.jsonl':
+            yield from _read_jsonl(file_path)
+        elif ext == '.csv':
+            with open(file_path, 'r', encoding='utf-8', newline='') as fh:
+                reader = csv.reader(fh)
+                header = next(reader, None)
+                if header is None:
+                    return
+                # zip is much faster than DictReader and matches it for well formed rows
+                width = len(header)
+                for row in reader:
+                    if not row:
+                        continue
+                    if len(row) == width:
+                        yield dict(zip(header, row))
+                    else:
+                        yield _ragged_row(header, row)
+        elif ext == '.json':
+            with open(file_path, 'rb') as fh:
+                yield json_loads(fh.read())
+        else:
+            raise ValueError(f"Unsupported file format: {ext}")
+    except OSError as e:
+        raise ValueError(f"Could not open file {file_path}: {e}")
+
+
+def _ragged_row(header, row):
+    # same as DictReader: missing values are None and extra values go under the None key
+    record = dict(zip(header, row))
+    if len(row) < len(header):
+        record.update((name, None) for name in header[len(row):])
+    else:
+        record[None] = row[len(header):]
+    return record
+
+
+def _read_jsonl(file_path):
+    with open(file_path, 'rb') as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for lineno, line in enumerate(iter(mm.readline, b''), start=1):
+                if not line.strip():
+                    continue  # skip blank lines
+                try:
+                    yield json_loads(line)
+                except ValueError as e:
+                    raise ValueError(f"Invalid JSON on line {lineno} in {file_path}: {e}")
+
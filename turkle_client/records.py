@@ -0,0 +1,149 @@
+import zlib
+
+# records option that also compresses large fields like project templates
+COMPACT = 'compact'
+
+
+class Record:
+    """
+    Compact read-only record for an object from the API
+
+    Subclasses list their fields in __slots__ so a record has no per-instance
+    dict and the field names are stored once per class. Fields the class does
+    not know about are kept in an extra dict so no data is lost. Records
+    support the dict style access used with the plain API responses:
+      batch = client.batches.retrieve(7, records=True)
+      batch['name'] == batch.name
+    """
+    __slots__ = ('_extra',)
+    fields = ()
+
+    @classmethod
+    def from_json(cls, data, compact=False):
+        """Create a record from a decoded json object
+
+        Args:
+            data (dict): object from the API
+            compact (bool): Whether large fields are stored compressed (see Project)
+
+        Returns:
+            Record: the record
+        """
+        record = cls.__new__(cls)
+        for field in cls._stored:
+            object.__setattr__(record, field, data.get(field))
+        extra = {key: value for key, value in data.items() if key not in cls._field_set}
+        object.__setattr__(record, '_extra', extra or None)
+        return record
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls.fields)
+        # fields computed by properties are set by the subclass
+        cls._stored = tuple(field for field in cls.fields
+                            if not isinstance(getattr(cls, field, None), property))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} records are read-only")
+
+    def __getitem__(self, key):
+        if key in self._field_set:
+            return getattr(self, key)
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self._field_set or bool(self._extra and key in self._extra)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self.fields) + list(self._extra or [])
+
+    def to_dict(self):
+        """Convert the record back to a dict like the API response
+
+        Returns:
+            dict: the fields of the record
+        """
+        return {key: self[key] for key in self.keys()}
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def __reduce__(self):
+        return type(self).from_json, (self.to_dict(),)
+
+
+class User(Record):
+    fields = ('id', 'username', 'first_name', 'last_name', 'email', 'is_active', 'is_staff',
+              'is_superuser', 'date_joined', 'groups')
+    __slots__ = fields
+
+
+class Group(Record):
+    fields = ('id', 'name', 'users')
+    __slots__ = fields
+
+
+class Project(Record):
+    """
+    Project record that can store its html template compressed
+
+    Templates are usually the largest part of a project and are rarely read
+    when listing. Records created with compact=True (records='compact' on
+    list and retrieve) keep them as zlib compressed bytes that are only
+    decoded when the html_template field is accessed. That saves memory for
+    large lists but costs CPU on every list, so it is chosen per call.
+    """
+    fields = ('id', 'name', 'created_at', 'created_by', 'updated_at', 'updated_by', 'active',
+              'allotted_assignment_time', 'assignments_per_task', 'login_required',
+              'custom_permissions', 'filename', 'html_template')
+    __slots__ = fields[:-1] + ('_html_template',)
+
+    @classmethod
+    def from_json(cls, data, compact=False):
+        template = data.get('html_template')
+        data = {key: value for key, value in data.items() if key != 'html_template'}
+        record = super().from_json(data)
+        if template is not None and compact:
+            template = zlib.compress(template.encode('utf-8'))
+        object.__setattr__(record, '_html_template', template)
+        return record
+
+    @property
+    def html_template(self):
+        if isinstance(self._html_template, bytes):
+            return zlib.decompress(self._html_template).decode('utf-8')
+        return self._html_template
+
+
+class Batch(Record):
+    fields = ('id', 'name', 'created_at', 'created_by', 'project', 'filename',
+              'allotted_assignment_time', 'assignments_per_task', 'login_required',
+              'custom_permissions', 'active', 'completed', 'published')
+    __slots__ = fields
+
+
+class Progress(Record):
+    fields = ('total_tasks', 'total_task_assignments', 'total_finished_tasks',
+              'total_finished_task_assignments')
+    __slots__ = fields
+
+
+class PermissionSet(Record):
+    fields = ('users', 'groups')
+    __slots__ = fields
+
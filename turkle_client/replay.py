@@ -0,0 +1,182 @@
+"""
+Record the HTTP exchanges of a client and replay them without a server
+
+Recording writes one compact json line per exchange to a gzip file: method,
+url, a hash of the request body, status, content type, latency and body.
+Request headers, including the token, are not written. Replaying answers
+each request from the file after sleeping for its recorded latency times a
+scale, so the client code can be profiled on real traffic offline:
+  with Recorder('traffic.jsonl.gz') as recorder:
+      client = Client(url, token, transport=recorder.transport)
+      run_workload(client)
+
+  replay = Replay('traffic.jsonl.gz', latency_scale=0)
+  run_workload(Client(url, token, transport=replay.transport))
+"""
+import base64
+import datetime
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .transport import DEFAULT_POOL_SIZE
+from .exceptions import TurkleClientException
+
+
+def body_hash(body):
+    """Short hash of a request body so requests with different data are replayed separately"""
+    if not body:
+        return None
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return hashlib.sha1(body).hexdigest()[:16]
+
+
+def encode_exchange(method, url, body, status, content_type, seconds, content):
+    exchange = {'m': method, 'u': url, 'b': body_hash(body), 's': status, 'ct': content_type,
+                't': round(seconds, 4)}
+    try:
+        exchange['c'] = content.decode('utf-8')
+    except UnicodeDecodeError:
+        exchange['c64'] = base64.b64encode(content).decode('ascii')
+    return exchange
+
+
+def decode_content(exchange):
+    if 'c64' in exchange:
+        return base64.b64decode(exchange['c64'])
+    return exchange.get('c', '').encode('utf-8')
+
+
+class Recorder:
+    """Writes the exchanges of recording sessions to a gzip jsonl file"""
+    def __init__(self, path):
+        """Construct a recorder
+
+        Args:
+            path (str): Path of the file to write
+        """
+        self.path = path
+        self.count = 0
+        self._fh = gzip.open(path, 'wt', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def transport(self, pool_size=DEFAULT_POOL_SIZE):
+        """Create a session that records to this file (pass as a client's transport)"""
+        return RecordingSession(self, pool_size)
+
+    def write(self, exchange):
+        line = json.dumps(exchange, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._fh.write(line)
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RecordingSession(requests.Session):
+    """Requests session that sends requests to the site and records the exchanges"""
+    def __init__(self, recorder, pool_size=DEFAULT_POOL_SIZE):
+        super().__init__()
+        self.recorder = recorder
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    def send(self, request, **kwargs):
+        start = time.monotonic()
+        response = super().send(request, **kwargs)
+        # streamed bodies are read here so they can be written and then iterated from memory
+        content = response.content
+        self.recorder.write(encode_exchange(request.method, request.url, request.body,
+                                            response.status_code,
+                                            response.headers.get('Content-Type'),
+                                            time.monotonic() - start, content))
+        return response
+
+
+class Replay:
+    """
+    Recorded exchanges that answer the requests of replay sessions
+
+    Requests are matched by method, url and body hash, falling back to
+    method and url. Repeated requests like progress polls get the recorded
+    responses in order and then the last one again.
+    """
+    def __init__(self, path, latency_scale=1.0):
+        """Load a recording
+
+        Args:
+            path (str): Path of a file written by Recorder
+            latency_scale (float): Multiplier for the recorded latencies (0 for none)
+        """
+        self.path = path
+        self.latency_scale = latency_scale
+        self._exchanges = defaultdict(list)
+        self._positions = defaultdict(int)
+        self._lock = threading.Lock()
+        self.count = 0
+        with gzip.open(path, 'rt', encoding='utf-8') as fh:
+            for line in fh:
+                exchange = json.loads(line)
+                self._exchanges[(exchange['m'], exchange['u'], exchange['b'])].append(exchange)
+                self._exchanges[(exchange['m'], exchange['u'])].append(exchange)
+                self.count += 1
+
+    def transport(self, pool_size=DEFAULT_POOL_SIZE):
+        """Create a session that answers from this recording (pass as a client's transport)"""
+        return ReplaySession(self)
+
+    def next_exchange(self, method, url, body):
+        """The recorded exchange for a request"""
+        key = (method, url, body_hash(body))
+        if key not in self._exchanges:
+            key = (method, url)
+        exchanges = self._exchanges.get(key)
+        if not exchanges:
+            raise TurkleClientException(f"No recorded response for {method} {url}")
+        with self._lock:
+            position = self._positions[key]
+            self._positions[key] = position + 1
+        return exchanges[min(position, len(exchanges) - 1)]
+
+
+class ReplaySession(requests.Session):
+    """Requests session that answers requests from a Replay without a network"""
+    def __init__(self, replay):
+        super().__init__()
+        self.replay = replay
+
+    def send(self, request, **kwargs):
+        exchange = self.replay.next_exchange(request.method, request.url, request.body)
+        seconds = exchange['t'] * self.replay.latency_scale
+        if seconds > 0:
+            time.sleep(seconds)
+        response = requests.Response()
+        response.status_code = exchange['s']
+        response.headers = CaseInsensitiveDict()
+        if exchange.get('ct'):
+            response.headers['Content-Type'] = exchange['ct']
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = decode_content(exchange)
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.elapsed = datetime.timedelta(seconds=seconds)
+        return response
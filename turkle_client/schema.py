@@ -1,14 +1,322 @@
-from typing import Optional
+import csv
+import json
+import os.path
 
-import pydantic
+from .exceptions import TurkleClientException
 
+STR = 'a string'
+INT = 'an integer'
+BOOL = 'a boolean'
+INT_LIST = 'a list of integers'
 
-class User(pydantic.BaseModel):
-    username: str
-    password: str
-    first_name: Optional[str]
-    last_name: Optional[str]
-    email: Optional[str]
-    is_active: Optional[bool]
-    is_staff: Optional[bool]
-    is_superuser: Optional[bool]
+BOOL_STRINGS = {'true', 'false', '1', '0', 'yes', 'no'}
+
+# kinds of files referenced by a record
+TEMPLATE_FILE = 'template'
+CSV_FILE = 'csv'
+
+
+def check_type(value, kind):
+    """Whether a value from a json or csv record can be used as the kind of field
+
+    csv files only have strings, so strings of integers and booleans are accepted.
+    """
+    if kind == STR:
+        return isinstance(value, str)
+    if kind == INT:
+        if isinstance(value, str):
+            return value.strip().lstrip('-').isdigit()
+        return isinstance(value, int) and not isinstance(value, bool)
+    if kind == BOOL:
+        if isinstance(value, str):
+            return value.strip().lower() in BOOL_STRINGS
+        return isinstance(value, bool)
+    if kind == INT_LIST:
+        return isinstance(value, list) and all(check_type(item, INT) for item in value)
+    raise ValueError(f"Unknown field type: {kind}")
+
+
+class Schema:
+    """
+    Fields, keys and referenced files of one kind of bulk input record
+
+    Used by validate_file to check a whole file before anything is sent.
+    """
+    def __init__(self, name, fields, required=(), key=None, files=None, extra=False,
+                 one_of=None, check=None, read_only=(), array=False):
+        """Construct a schema
+
+        Args:
+            name (str): Name used in messages like 'users create'
+            fields (dict): field name to type
+            required (Iterable): fields that must be present and not empty
+            key (tuple or Callable): fields that must be unique across the file or a
+                                     function that returns the unique key of a record
+            files (dict): field name to the kind of file it references
+            extra (bool): Whether fields not in fields are allowed
+            one_of (tuple): fields of which at least one must be present
+            check (Callable): Optional function that returns more errors for a record
+            read_only (Iterable): fields the server returns that are accepted unchecked
+                                  and dropped before sending
+            array (bool): Whether a .json file can hold a list of records
+        """
+        self.name = name
+        self.fields = fields
+        self.required = tuple(required)
+        self.key = key if callable(key) or not key else tuple(key)
+        self.files = files or {}
+        self.extra = extra
+        self.one_of = tuple(one_of) if one_of else None
+        self.check = check
+        self.read_only = frozenset(read_only)
+        self.array = array
+
+    def errors(self, record):
+        """Check a record without its referenced files
+
+        Args:
+            record (dict): input record
+
+        Returns:
+            list: error messages
+        """
+        if not isinstance(record, dict):
+            return [f"expected an object but found {type(record).__name__}"]
+        errors = []
+        for field in self.required:
+            if record.get(field) in (None, ''):
+                errors.append(f"missing {field}")
+        if self.one_of and not any(record.get(field) not in (None, '') for field in self.one_of):
+            errors.append(f"needs one of {', '.join(self.one_of)}")
+        for field, value in record.items():
+            if field in self.read_only:
+                continue
+            kind = self.fields.get(field)
+            if kind is None:
+                if not self.extra:
+                    errors.append(f"unknown field {field}")
+                continue
+            if value in (None, '') and field not in self.required:
+                continue
+            if not check_type(value, kind):
+                errors.append(f"{field} must be {kind}")
+        if self.check:
+            errors.extend(self.check(record))
+        return errors
+
+    @property
+    def key_name(self):
+        return 'key' if callable(self.key) else '/'.join(self.key)
+
+    def key_of(self, record):
+        if not self.key or not isinstance(record, dict):
+            return None
+        if callable(self.key):
+            return self.key(record)
+        key = tuple(str(record.get(field, '')).strip() for field in self.key)
+        return key if all(key) else None
+
+
+def target_errors(record):
+    if 'type' in record:
+        if record['type'] not in ('project', 'batch'):
+            return ["type must be project or batch"]
+        if record.get('id') in (None, ''):
+            return ["missing id"]
+    return []
+
+
+def target_key(record):
+    # permissions targets are written as {"batch": 3} or {"type": "batch", "id": 3}
+    if 'type' in record:
+        key = (str(record['type']), str(record.get('id', '')).strip())
+    else:
+        kind = 'project' if 'project' in record else 'batch'
+        key = (kind, str(record.get(kind, '')).strip())
+    return key if all(key) else None
+
+
+USER_FIELDS = {
+    'id': INT, 'username': STR, 'password': STR, 'first_name': STR, 'last_name': STR,
+    'email': STR, 'is_active': BOOL, 'is_staff': BOOL, 'is_superuser': BOOL,
+}
+# fields of listed users that cannot be changed through the users endpoint
+USER_READ_ONLY_FIELDS = ('date_joined', 'groups')
+PROJECT_FIELDS = {
+    'id': INT, 'name': STR, 'html_template': STR, 'filename': STR, 'active': BOOL,
+    'allotted_assignment_time': INT, 'assignments_per_task': INT, 'login_required': BOOL,
+    'custom_permissions': BOOL,
+}
+BATCH_FIELDS = {
+    'id': INT, 'name': STR, 'project': INT, 'filename': STR, 'csv_text': STR, 'active': BOOL,
+    'allotted_assignment_time': INT, 'assignments_per_task': INT, 'login_required': BOOL,
+    'custom_permissions': BOOL, 'published': BOOL,
+}
+PERMISSION_FIELDS = {'type': STR, 'id': INT, 'project': INT, 'batch': INT, 'users': INT_LIST,
+                     'groups': INT_LIST}
+
+SCHEMAS = {
+    'users create': Schema('users create', USER_FIELDS, required=['username', 'password'],
+                           key=['username']),
+    'users update': Schema('users update', USER_FIELDS, required=['id'], key=['id'],
+                           read_only=USER_READ_ONLY_FIELDS),
+    'users upsert': Schema('users upsert', USER_FIELDS, required=['username'], key=['username'],
+                           read_only=USER_READ_ONLY_FIELDS),
+    'groups create': Schema('groups create', {'name': STR, 'users': INT_LIST}, required=['name'],
+                            key=['name']),
+    'projects create': Schema('projects create', PROJECT_FIELDS, required=['name'], key=['name'],
+                              files={'filename': TEMPLATE_FILE}, extra=True,
+                              one_of=['html_template', 'filename']),
+    'projects update': Schema('projects update', PROJECT_FIELDS, required=['id'], key=['id'],
+                              files={'filename': TEMPLATE_FILE}, extra=True),
+    'batches create': Schema('batches create', BATCH_FIELDS, required=['name', 'project', 'filename'],
+                             key=['project', 'name'], files={'filename': CSV_FILE}, extra=True),
+    'batches update': Schema('batches update', BATCH_FIELDS, required=['id'], key=['id'],
+                             files={'filename': CSV_FILE}, extra=True),
+    'permissions bulk': Schema('permissions bulk', PERMISSION_FIELDS, key=target_key,
+                               one_of=['project', 'batch', 'type'], check=target_errors, array=True),
+    'permissions': Schema('permissions', {'users': INT_LIST, 'groups': INT_LIST}),
+}
+
+
+def check_template_file(path):
+    """Errors for a project template file"""
+    try:
+        with open(path, 'r', encoding='utf-8') as fh:
+            if not fh.read().strip():
+                return [f"template {path} is empty"]
+    except (OSError, UnicodeDecodeError) as e:
+        return [f"cannot read template {path}: {e}"]
+    return []
+
+
+def check_csv_file(path):
+    """Errors for a batch task CSV file found by reading it once"""
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as fh:
+            reader = csv.reader(fh)
+            header = next(reader, None)
+            if not header:
+                return [f"task CSV {path} is empty"]
+            errors = []
+            if any(not name.strip() for name in header):
+                errors.append(f"task CSV {path} has a blank column name")
+            duplicates = sorted({name for name in header if header.count(name) > 1})
+            if duplicates:
+                errors.append(f"task CSV {path} has duplicate columns: {', '.join(duplicates)}")
+            rows = 0
+            for row in reader:
+                rows += 1
+                if len(row) != len(header):
+                    errors.append(f"task CSV {path} line {reader.line_num} has {len(row)} "
+                                  f"fields instead of {len(header)}")
+                    break
+            if rows == 0:
+                errors.append(f"task CSV {path} has no tasks")
+            return errors
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        return [f"cannot read task CSV {path}: {e}"]
+
+
+FILE_CHECKS = {TEMPLATE_FILE: check_template_file, CSV_FILE: check_csv_file}
+
+
+def iter_located_records(file_path, exts=None, array=False):
+    """Yields each record of an input file with its location and any parse error
+
+    Unlike load_records, a line that is not valid json does not stop the file.
+
+    Args:
+        file_path (str): Path to a .jsonl, .json or .csv file
+        exts (list): List of extensions to support
+        array (bool): Whether a list in a .json file is a list of records
+
+    Returns:
+        Iterator: (location, record, error) where record is None if error is set
+    """
+    exts = exts if exts else ['.jsonl', '.json', '.csv']
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext not in exts:
+        raise ValueError(f"Unsupported file format: {ext}")
+    try:
+        with open(file_path, 'r', encoding='utf-8', newline='' if ext == '.csv' else None) as fh:
+            if ext == '.jsonl':
+                for lineno, line in enumerate(fh, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        yield f"line {lineno}", json.loads(line), None
+                    except json.JSONDecodeError as e:
+                        yield f"line {lineno}", None, f"invalid JSON: {e}"
+            elif ext == '.csv':
+                reader = csv.DictReader(fh)
+                for row in reader:
+                    if None in row:
+                        yield f"line {reader.line_num}", None, "more fields than the header"
+                    else:
+                        yield f"line {reader.line_num}", row, None
+            else:
+                try:
+                    data = json.load(fh)
+                except json.JSONDecodeError as e:
+                    yield "object 1", None, f"invalid JSON: {e}"
+                    return
+                records = data if array and isinstance(data, list) else [data]
+                for number, record in enumerate(records, start=1):
+                    yield f"object {number}", record, None
+    except OSError as e:
+        raise ValueError(f"Could not open file {file_path}: {e}")
+
+
+def validate_file(file_path, schema, exts=None):
+    """Check every record of a bulk input file in one pass
+
+    Field types, required fields, duplicate keys and the files referenced by
+    the records are checked. Each referenced file is only read once even if
+    many records use it.
+
+    Args:
+        file_path (str): Path to the input file
+        schema (Schema or str): Schema or the name of one in SCHEMAS
+        exts (list): List of extensions to support
+
+    Returns:
+        tuple: number of records and list of error messages
+    """
+    if isinstance(schema, str):
+        schema = SCHEMAS[schema]
+    errors = []
+    keys = {}
+    file_errors = {}
+    count = 0
+    for location, record, error in iter_located_records(file_path, exts, schema.array):
+        count += 1
+        record_errors = [error] if error else schema.errors(record)
+        key = None if error else schema.key_of(record)
+        if key is not None:
+            if key in keys:
+                record_errors.append(f"duplicate {schema.key_name} {'/'.join(key)} "
+                                     f"(first on {keys[key]})")
+            else:
+                keys[key] = location
+        for field, kind in schema.files.items():
+            if error or not isinstance(record.get(field), str) or not record[field]:
+                continue
+            path = os.path.expanduser(record[field])
+            if path not in file_errors:
+                file_errors[path] = FILE_CHECKS[kind](path)
+            record_errors.extend(file_errors[path])
+        errors.extend(f"{location}: {message}" for message in record_errors)
+    return count, errors
+
+
+def validate_or_raise(file_path, schema, exts=None):
+    """Validate a file and raise an exception listing all the errors
+
+    Returns:
+        int: number of valid records
+    """
+    count, errors = validate_file(file_path, schema, exts)
+    if errors:
+        raise TurkleClientException(f"{len(errors)} errors in {file_path}:\n" + '\n'.join(errors))
+    return count
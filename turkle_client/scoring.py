@@ -0,0 +1,245 @@
+import json
+import os
+import re
+
+from .exceptions import TurkleClientException
+from .optional import import_optional
+from .parallel import DEFAULT_WORKERS, bounded_map
+from .table import CATEGORY, encode_column, value_key
+
+WORKER_FIELD = 'Turkle.Username'
+TIME_FIELD = 'WorkTimeInSeconds'
+BLANK = '(blank)'
+
+
+def input_field(name):
+    return name if name.startswith('Input.') else f"Input.{name}"
+
+
+def _number(value):
+    # nan is not valid json so statistics that cannot be computed are None
+    value = float(value)
+    return None if value != value else value
+
+
+class GoldScorer:
+    """
+    Scores annotators against gold standard answers
+
+    Results are joined to the gold key on the task input columns. Rows from
+    any number of batches are collected as integer code arrays and scored in
+    a single vectorized pass:
+      scorer = GoldScorer(load_records('gold.csv'), ['image_url'], 'Answer.label')
+      scorer.add_batches(client, [17, 18])
+      scorer.scores()
+    """
+    def __init__(self, gold_records, key_fields, label_field, gold_field=None,
+                 worker_field=WORKER_FIELD, time_field=TIME_FIELD):
+        """Construct a scorer
+
+        Args:
+            gold_records (Iterable): dicts with the key fields and the gold label
+            key_fields (list): Input fields that identify a task like image_url
+            label_field (str): Results column with the answer like Answer.label
+            gold_field (str): Gold key column with the correct answer (defaults to label_field without Answer.)
+            worker_field (str): Results column identifying the annotator
+            time_field (str): Results column with the seconds spent on the assignment
+        """
+        if not key_fields:
+            raise TurkleClientException("At least one key field is required to match gold items")
+        self.key_fields = [input_field(field) for field in key_fields]
+        self.label_field = label_field
+        self.gold_field = gold_field or label_field.split('Answer.', 1)[-1]
+        self.worker_field = worker_field
+        self.time_field = time_field
+        self.label_index = {}
+        self.worker_index = {}
+        self.gold = {}
+        for lineno, record in enumerate(gold_records, start=1):
+            key = []
+            # the gold key can name the input columns with or without the Input. prefix
+            for field in self.key_fields + [self.gold_field]:
+                value = record.get(field, record.get(field[len('Input.'):]))
+                if value is None:
+                    raise TurkleClientException(f"Gold record {lineno} is missing {field}")
+                key.append(value_key(value))
+            self.gold[tuple(key[:-1])] = self._code(key[-1])
+        self._parts = []
+
+    def _code(self, label):
+        code = self.label_index.get(label)
+        if code is None:
+            code = self.label_index[label] = len(self.label_index)
+        return code
+
+    @property
+    def workers(self):
+        return list(self.worker_index)
+
+    def add_table(self, table):
+        """Add the assignments of a results table
+
+        Args:
+            table (ResultsTable): results table
+
+        Returns:
+            int: number of assignments on gold items
+        """
+        np = import_optional('numpy', 'numpy')
+        for field in self.key_fields + [self.label_field, self.worker_field]:
+            if field not in table:
+                raise TurkleClientException(f"Results are missing the {field} column")
+        if len(table) == 0:
+            return 0
+
+        golds = self._gold_codes(np, table)
+        answers = encode_column(table[self.label_field], self.label_index, skip_empty=True)
+        workers = encode_column(table[self.worker_field], self.worker_index)
+        if self.time_field in table and table[self.time_field].type != CATEGORY:
+            times = np.asarray(table[self.time_field].values, dtype=np.float64)
+        else:
+            times = np.full(len(table), np.nan)
+        self._parts.append((workers, golds, answers, times))
+        return int((golds >= 0).sum())
+
+    def _gold_codes(self, np, table):
+        # combine the codes of the key columns so each distinct task is looked up once
+        combined = np.zeros(len(table), dtype=np.int64)
+        distincts = []
+        for field in self.key_fields:
+            column = table[field]
+            if column.type == CATEGORY:
+                local, distinct = np.frombuffer(column.values, dtype=np.int32), column.categories
+            else:
+                values, local = np.unique(np.asarray(column.values), return_inverse=True)
+                distinct = [value_key(value) for value in values.tolist()]
+            combined = combined * max(len(distinct), 1) + local
+            distincts.append(distinct)
+        unique, inverse = np.unique(combined, return_inverse=True)
+        lookup = np.empty(len(unique), dtype=np.int64)
+        for i, value in enumerate(unique.tolist()):
+            key = []
+            for distinct in reversed(distincts):
+                value, code = divmod(value, max(len(distinct), 1))
+                key.append(distinct[code])
+            lookup[i] = self.gold.get(tuple(reversed(key)), -1)
+        return lookup[inverse.reshape(-1)]
+
+    def add_batches(self, client, batch_ids, max_workers=DEFAULT_WORKERS):
+        """Download the results of batches concurrently and add their assignments
+
+        Args:
+            client (Client): Turkle client instance
+            batch_ids (list): Batch ids
+            max_workers (int): Number of concurrent downloads
+
+        Returns:
+            int: number of assignments on gold items
+        """
+        types = {field: CATEGORY for field in self.key_fields + [self.label_field, self.worker_field]}
+        tables = bounded_map(lambda batch_id: client.batches.results_table(batch_id, types=types),
+                             batch_ids, max_workers)
+        return sum(self.add_table(table) for table in tables)
+
+    def _arrays(self):
+        np = import_optional('numpy', 'numpy')
+        if not self._parts:
+            empty = np.zeros(0, dtype=np.int64)
+            return np, empty, empty, empty, np.zeros(0)
+        return (np, *(np.concatenate(arrays) for arrays in zip(*self._parts)))
+
+    def scores(self, min_accuracy=None):
+        """Accuracy on gold items and time per item for each annotator
+
+        Args:
+            min_accuracy (float): Optional threshold that adds a below_threshold field
+
+        Returns:
+            list: dicts with worker, assignments, gold_items, correct, accuracy,
+                  mean_seconds and median_seconds (None without gold items or times)
+        """
+        np, workers, golds, answers, times = self._arrays()
+        num_workers = len(self.worker_index)
+        is_gold = golds >= 0
+        assignments = np.bincount(workers, minlength=num_workers)
+        gold_items = np.bincount(workers[is_gold], minlength=num_workers)
+        correct = np.bincount(workers[is_gold], weights=answers[is_gold] == golds[is_gold],
+                              minlength=num_workers)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            accuracy = correct / gold_items
+            timed = ~np.isnan(times)
+            mean_seconds = (np.bincount(workers[timed], weights=times[timed], minlength=num_workers)
+                            / np.bincount(workers[timed], minlength=num_workers))
+        median_seconds = self._group_medians(np, workers[timed], times[timed], num_workers)
+
+        scores = []
+        for code, worker in enumerate(self.worker_index):
+            score = {
+                'worker': worker,
+                'assignments': int(assignments[code]),
+                'gold_items': int(gold_items[code]),
+                'correct': int(correct[code]),
+                'accuracy': _number(accuracy[code]),
+                'mean_seconds': _number(mean_seconds[code]),
+                'median_seconds': _number(median_seconds[code]),
+            }
+            if min_accuracy is not None:
+                score['below_threshold'] = bool(gold_items[code] and accuracy[code] < min_accuracy)
+            scores.append(score)
+        return scores
+
+    @staticmethod
+    def _group_medians(np, groups, values, num_groups):
+        order = np.lexsort((values, groups))
+        groups, values = groups[order], values[order]
+        starts = np.searchsorted(groups, np.arange(num_groups), side='left')
+        counts = np.searchsorted(groups, np.arange(num_groups), side='right') - starts
+        if len(values) == 0:
+            return np.full(num_groups, np.nan)
+        low = np.clip(starts + (counts - 1) // 2, 0, len(values) - 1)
+        high = np.clip(starts + counts // 2, 0, len(values) - 1)
+        return np.where(counts > 0, (values[low] + values[high]) / 2, np.nan)
+
+    def confusion_matrices(self):
+        """Confusion matrix of gold label by answer for each annotator
+
+        Returns:
+            dict: worker to {gold label: {answer: count}} with only non-zero counts
+        """
+        np, workers, golds, answers, _ = self._arrays()
+        labels = list(self.label_index)
+        num_labels = len(labels)
+        is_gold = golds >= 0
+        # unanswered gold items go in an extra blank column
+        answers = np.where(answers[is_gold] < 0, num_labels, answers[is_gold])
+        flat = np.bincount((workers[is_gold] * num_labels + golds[is_gold]) * (num_labels + 1) + answers,
+                           minlength=len(self.worker_index) * num_labels * (num_labels + 1))
+        matrices = flat.reshape(len(self.worker_index), num_labels, num_labels + 1)
+        answer_labels = labels + [BLANK]
+        result = {}
+        for code, worker in enumerate(self.worker_index):
+            result[worker] = {
+                labels[gold]: {answer_labels[answer]: int(count)
+                               for answer, count in enumerate(row.tolist()) if count}
+                for gold, row in enumerate(matrices[code]) if row.any()
+            }
+        return result
+
+    def write_reports(self, directory, min_accuracy=None):
+        """Write a json report with the score and confusion matrix of each annotator
+
+        Args:
+            directory (str): Output directory that is created if needed
+            min_accuracy (float): Optional threshold that adds a below_threshold field
+
+        Returns:
+            int: number of reports written
+        """
+        os.makedirs(directory, exist_ok=True)
+        confusion = self.confusion_matrices()
+        scores = self.scores(min_accuracy)
+        for score in scores:
+            name = re.sub(r'[^\w.-]', '_', str(score['worker']))
+            with open(os.path.join(directory, f"{name}.json"), 'w', encoding='utf-8') as fh:
+                json.dump({**score, 'confusion': confusion[score['worker']]}, fh, indent=2)
+        return len(scores)
@@ -0,0 +1,230 @@
+import io
+import json
+import shlex
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import redirect_stderr, redirect_stdout
+
+from .exceptions import TurkleClientException
+from .output import parse_fields, project
+from .parallel import DEFAULT_WORKERS
+from .readers import load_records
+
+OK = 'ok'
+ERROR = 'error'
+SKIPPED = 'skipped'
+
+# commands that manage the command line itself cannot be run from a script
+EXCLUDED_COMMANDS = {'config', 'daemon', 'exec'}
+
+
+class ScriptCommand:
+    """One command line from a script file"""
+    def __init__(self, index, id, argv, depends_on, args):
+        self.index = index
+        self.id = id
+        self.argv = argv
+        self.depends_on = depends_on
+        self.args = args
+
+    @property
+    def name(self):
+        return f"{self.args.command} {self.args.subcommand}"
+
+
+class ThreadOutput:
+    """
+    stdout that keeps what each script command prints separate
+
+    Commands like 'batches results' stream to stdout. While commands run
+    concurrently, what a worker thread writes goes to that thread's buffer
+    and is added to the command's result record.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def capture(self, buffer):
+        self.local.buffer = buffer
+
+    @property
+    def target(self):
+        return getattr(self.local, 'buffer', None) or self.stream
+
+    def write(self, text):
+        return self.target.write(text)
+
+    def flush(self):
+        self.target.flush()
+
+    @property
+    def buffer(self):
+        if getattr(self.local, 'buffer', None) is not None:
+            raise TurkleClientException("Binary output from exec needs --output")
+        return self.stream.buffer
+
+
+def parse_command(parser, argv):
+    # argparse prints its errors and exits so the message is captured instead
+    stderr = io.StringIO()
+    try:
+        with redirect_stderr(stderr):
+            args = parser.parse_args(argv)
+    except SystemExit:
+        lines = stderr.getvalue().strip().splitlines()
+        raise ValueError(lines[-1] if lines else "invalid arguments")
+    if args.command is None or args.command in EXCLUDED_COMMANDS:
+        raise ValueError(f"cannot run '{args.command or ''}' from a script")
+    return args
+
+
+def load_script(file_path, parser):
+    """Read and check the commands of a jsonl script
+
+    Each line has the arguments of a command line as a list or string, an
+    optional id and the ids of earlier commands that must succeed first:
+      {"id": "users", "args": ["users", "create", "--file", "users.csv"]}
+      {"args": "groups add_users --id 4 --file ids.json", "depends_on": ["users"]}
+
+    Args:
+        file_path (str): Path to the jsonl file
+        parser (argparse.ArgumentParser): parser of the command line
+
+    Returns:
+        list: ScriptCommand objects in file order
+    """
+    commands = []
+    ids = set()
+    errors = []
+    for lineno, record in enumerate(load_records(file_path, ['.jsonl']), start=1):
+        try:
+            if not isinstance(record, dict) or not record.get('args'):
+                raise ValueError("missing args")
+            argv = record['args']
+            argv = shlex.split(argv) if isinstance(argv, str) else [str(arg) for arg in argv]
+            command_id = str(record.get('id', lineno))
+            if command_id in ids:
+                raise ValueError(f"duplicate id {command_id}")
+            depends_on = record.get('depends_on') or []
+            depends_on = [str(dep) for dep in ([depends_on] if isinstance(depends_on, (str, int))
+                                               else depends_on)]
+            unknown = [dep for dep in depends_on if dep not in ids]
+            if unknown:
+                raise ValueError(f"depends_on must name earlier commands: {', '.join(unknown)}")
+            args = parse_command(parser, argv)
+        except ValueError as e:
+            errors.append(f"line {lineno}: {e}")
+            continue
+        ids.add(command_id)
+        commands.append(ScriptCommand(len(commands), command_id, argv, depends_on, args))
+    if errors:
+        raise TurkleClientException(f"{len(errors)} errors in {file_path}:\n" + '\n'.join(errors))
+    return commands
+
+
+def result_value(result, fields):
+    # records are returned in the result record instead of streamed like the CLI
+    if result is None or isinstance(result, str):
+        return result
+    if isinstance(result, dict):
+        return project(result, fields)
+    if hasattr(result, 'to_dict'):
+        return project(result.to_dict(), fields)
+    return [project(record, fields) for record in result]
+
+
+def execute(cli, command, url, token, output):
+    record = {'id': command.id, 'command': command.name}
+    start = time.monotonic()
+    printed = io.StringIO()
+    output.capture(printed)
+    try:
+        result = cli.run_command(command.args, url, token)
+        record['status'] = OK
+        record['result'] = result_value(result, parse_fields(getattr(command.args, 'fields', None)))
+    except Exception as e:
+        record['status'] = ERROR
+        record['error'] = str(e)
+    finally:
+        output.capture(None)
+    if printed.getvalue():
+        record['output'] = printed.getvalue()
+    record['seconds'] = round(time.monotonic() - start, 3)
+    return record
+
+
+def run_commands(cli, commands, fh, url, token, workers=DEFAULT_WORKERS):
+    """Run script commands concurrently in dependency order
+
+    A command starts when the commands it depends on have succeeded and is
+    skipped if any of them failed. One json record per command is written in
+    file order as soon as it and the commands before it are done.
+
+    Args:
+        cli (Cli): command line with a shared client
+        commands (list): ScriptCommand objects from load_script
+        fh (file): Text file handle for the result records
+        url (str): URL of the Turkle site
+        token (str): API token
+        workers (int): Maximum number of commands running at once
+
+    Returns:
+        dict: number of commands with each status
+    """
+    counts = {OK: 0, ERROR: 0, SKIPPED: 0}
+    status = {}
+    records = [None] * len(commands)
+    written = 0
+    waiting = list(commands)
+    pending = {}
+    output = ThreadOutput(sys.stdout)
+    with redirect_stdout(output), ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        while waiting or pending:
+            blocked = []
+            for command in waiting:
+                states = [status.get(dep) for dep in command.depends_on]
+                failed = [dep for dep, state in zip(command.depends_on, states)
+                          if state in (ERROR, SKIPPED)]
+                if failed:
+                    status[command.id] = SKIPPED
+                    records[command.index] = {'id': command.id, 'command': command.name,
+                                              'status': SKIPPED,
+                                              'error': f"{', '.join(failed)} did not succeed"}
+                elif all(state == OK for state in states):
+                    future = executor.submit(execute, cli, command, url, token, output)
+                    pending[future] = command
+                else:
+                    blocked.append(command)
+            waiting = blocked
+            if pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    command = pending.pop(future)
+                    records[command.index] = future.result()
+                    status[command.id] = records[command.index]['status']
+            while written < len(records) and records[written] is not None:
+                record = records[written]
+                counts[record['status']] += 1
+                fh.write(json.dumps(record) + '\n')
+                records[written] = None
+                written += 1
+            fh.flush()
+    return counts
+
+
+def run_script(cli, file_path, url, token, workers=DEFAULT_WORKERS, output=None):
+    """Run the commands of a jsonl script with one shared client
+
+    Returns:
+        str: summary of the commands
+    """
+    commands = load_script(file_path, cli.parser)
+    if output:
+        with open(output, 'w', encoding='utf-8') as fh:
+            counts = run_commands(cli, commands, fh, url, token, workers)
+    else:
+        counts = run_commands(cli, commands, sys.stdout, url, token, workers)
+    return (f"{len(commands)} commands: {counts[OK]} ok, {counts[ERROR]} failed, "
+            f"{counts[SKIPPED]} skipped")
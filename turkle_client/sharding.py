@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+import os
+
+from .client import Permissions
+from .exceptions import TurkleClientException
+from .parallel import DEFAULT_WORKERS, bounded_map
+
+
+def shard_name(name, index):
+    return f"{name}-{index:03d}"
+
+
+def iter_shards(fh, shard_size):
+    """Split a task CSV into CSV texts of at most shard_size rows with the header
+
+    Rows are read from the file as they are needed so only one shard is held
+    in memory at a time. Quoted fields with newlines are kept in one row.
+
+    Args:
+        fh (file): Text file handle opened with newline=''
+        shard_size (int): Maximum number of rows in a shard
+
+    Returns:
+        Iterator: (index, first_row, rows, csv_text) for each shard starting at index 1
+    """
+    if shard_size < 1:
+        raise TurkleClientException("The shard size must be at least 1")
+    reader = csv.reader(fh)
+    header = next(reader, None)
+    if not header:
+        raise TurkleClientException("The task CSV is empty")
+    index = 0
+    first_row = 1
+    buffer = None
+    writer = None
+    rows = 0
+    for row in reader:
+        if writer is None:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(header)
+        writer.writerow(row)
+        rows += 1
+        if rows == shard_size:
+            index += 1
+            yield index, first_row, rows, buffer.getvalue()
+            first_row += rows
+            writer, rows = None, 0
+    if writer is not None:
+        yield index + 1, first_row, rows, buffer.getvalue()
+
+
+def create_sharded_batch(batches, permissions, batch, fh, shard_size,
+                         template_batch=None, max_workers=DEFAULT_WORKERS):
+    """Create a batch for each shard of a task CSV concurrently
+
+    The shards are named like Name-001, Name-002 and share the other fields of
+    the batch. If a template batch id is given, its permissions replace those
+    of each shard. A failure on one shard does not stop the others.
+
+    Args:
+        batches (Batches): Batches client
+        permissions (Permissions): Permissions client
+        batch (dict): Batch fields with project and name but without csv_text
+        fh (file): Text file handle of the task CSV opened with newline=''
+        shard_size (int): Maximum number of tasks in a shard
+        template_batch (int): Optional id of a batch to copy permissions from
+        max_workers (int): Number of concurrent requests
+
+    Returns:
+        dict: manifest with the shard_size and a batches list of shard, project,
+              batch_id, name, first_row, rows and status for each shard
+    """
+    for field in ['project', 'name']:
+        if field not in batch:
+            raise TurkleClientException(f"Sharded batch requires a {field}")
+    template_permissions = None
+    if template_batch:
+        template_permissions = permissions.retrieve(Permissions.BATCH, template_batch)
+
+    filename = batch.get('filename', 'tasks.csv')
+    stem, ext = os.path.splitext(os.path.basename(filename))
+
+    def create(shard):
+        index, first_row, rows, csv_text = shard
+        entry = {'shard': index, 'project': batch['project'], 'batch_id': None,
+                 'name': shard_name(batch['name'], index), 'first_row': first_row, 'rows': rows,
+                 'status': 'ok'}
+        try:
+            created = batches.create({**batch, 'name': entry['name'], 'csv_text': csv_text,
+                                      'filename': f"{shard_name(stem, index)}{ext or '.csv'}"})
+            entry['batch_id'] = created['id']
+            if template_permissions is not None:
+                permissions.replace(Permissions.BATCH, created['id'],
+                                    {'users': template_permissions['users'],
+                                     'groups': template_permissions['groups']})
+        except TurkleClientException as e:
+            entry.update({'status': 'error', 'error': str(e)})
+        return entry
+
+    return {
+        'shard_size': shard_size,
+        'batches': list(bounded_map(create, iter_shards(fh, shard_size), max_workers)),
+    }
+
+
+def write_manifest(path, manifest):
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=1)
+
+
+def manifest_batch_ids(path):
+    """Ids of the created batches in a shard manifest in shard order
+
+    Args:
+        path (str): Path to the manifest json file
+
+    Returns:
+        list: batch ids
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as fh:
+            manifest = json.load(fh)
+    except OSError as e:
+        raise ValueError(f"Could not open file {path}: {e}")
+    return [entry['batch_id'] for entry in manifest['batches'] if entry.get('batch_id') is not None]
@@ -0,0 +1,353 @@
+import datetime
+import math
+import re
+from array import array
+
+from .exceptions import TurkleClientException
+from .optional import import_optional
+
+INT = 'int'
+FLOAT = 'float'
+TIMESTAMP = 'timestamp'
+CATEGORY = 'category'
+TYPES = [INT, FLOAT, TIMESTAMP, CATEGORY]
+
+# leading zeros are kept as strings so ids and zip codes are not mangled
+INT_RE = re.compile(r'-?(0|[1-9]\d*)$')
+FLOAT_RE = re.compile(r'-?((0|[1-9]\d*)(\.\d*)?|\.\d+)([eE][-+]?\d+)?$')
+TIMESTAMP_FORMATS = ['%a %b %d %H:%M:%S %Z %Y', '%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%dT%H:%M:%SZ']
+
+
+def parse_timestamp(value):
+    """Parse a timestamp from a results CSV into seconds since the epoch
+
+    Timestamps without a timezone are treated as UTC.
+
+    Args:
+        value (str): ISO 8601 or MTurk style timestamp
+
+    Returns:
+        float: seconds since the epoch or None if not a timestamp
+    """
+    try:
+        dt = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        for fmt in TIMESTAMP_FORMATS:
+            try:
+                dt = datetime.datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.timestamp()
+
+
+def infer_type(values):
+    """Infer the column type from its distinct non-empty values
+
+    Args:
+        values (list): distinct strings of the column
+
+    Returns:
+        str: int, float, timestamp or category
+    """
+    values = [value for value in values if value != '']
+    if not values:
+        return CATEGORY
+    if all(INT_RE.match(value) for value in values):
+        return INT
+    if all(FLOAT_RE.match(value) for value in values):
+        return FLOAT
+    # numbers and dates without times are left alone as they are usually labels
+    if all(len(value) > 10 and parse_timestamp(value) is not None for value in values):
+        return TIMESTAMP
+    return CATEGORY
+
+
+def value_key(value):
+    """String key for a value so typed columns and raw csv strings share index entries
+
+    Whole floats lose the .0 that csv never had, so 3.0 and '3' are the same key.
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def encode_column(column, index, skip_empty=False):
+    """Map the values of a column to codes in a shared index with vectorized lookups
+
+    Each distinct value of the column is looked up once and new values are added
+    to the index, so codes from several tables can be combined. The index is keyed
+    by value_key so int and float columns match string values from raw rows.
+
+    Args:
+        column (Column): Column of a results table
+        index (dict): Value to code mapping that is updated in place
+        skip_empty (bool): Whether empty strings and NaN get the code -1
+
+    Returns:
+        numpy.ndarray: int64 code for each row
+    """
+    np = import_optional('numpy', 'numpy')
+    if column.type == CATEGORY:
+        local = np.frombuffer(column.values, dtype=np.int32)
+        distinct = column.categories
+    else:
+        distinct_values, local = np.unique(np.asarray(column.values), return_inverse=True)
+        distinct = distinct_values.tolist()
+    remap = []
+    for value in distinct:
+        if skip_empty and (value == '' or value != value):
+            remap.append(-1)
+        else:
+            key = value_key(value)
+            code = index.get(key)
+            if code is None:
+                code = index[key] = len(index)
+            remap.append(code)
+    if not remap:
+        return np.full(len(local), -1, dtype=np.int64)
+    return np.array(remap, dtype=np.int64)[local]
+
+
+class Column:
+    """
+    A typed column of a results table
+
+    Numbers and timestamps are stored in an array.array of doubles (or int64 for
+    int columns without blanks). Timestamps are seconds since the epoch.
+    Missing numbers are NaN. Strings are stored as int32 codes into a list of
+    distinct categories.
+    """
+    __slots__ = ['name', 'type', 'values', 'categories']
+
+    def __init__(self, name, type, values, categories=None):
+        self.name = name
+        self.type = type
+        self.values = values
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        if self.type == CATEGORY:
+            return self.categories[self.values[index]]
+        return self.values[index]
+
+    def __iter__(self):
+        if self.type == CATEGORY:
+            categories = self.categories
+            return (categories[code] for code in self.values)
+        return iter(self.values)
+
+    def to_list(self):
+        return list(self)
+
+    def __repr__(self):
+        return f"Column({self.name!r}, {self.type!r}, {len(self)} values)"
+
+    @classmethod
+    def from_codes(cls, name, codes, categories, type=None):
+        """Build a typed column from interned string codes
+
+        Args:
+            name (str): Column name
+            codes (array): int32 codes into categories
+            categories (list): distinct strings in order of first appearance
+            type (str): Optional column type instead of inferring it
+
+        Returns:
+            Column: the typed column
+        """
+        type = type or infer_type(categories)
+        if type not in TYPES:
+            raise TurkleClientException(f"Unrecognized column type: {type}")
+        if type == CATEGORY:
+            return cls(name, type, codes, categories)
+        # convert each distinct value once and then look them up by code
+        if type == INT and all(INT_RE.match(value) for value in categories):
+            lookup = [int(value) for value in categories]
+            return cls(name, type, array('q', (lookup[code] for code in codes)))
+        convert = parse_timestamp if type == TIMESTAMP else float
+        lookup = []
+        for value in categories:
+            try:
+                number = convert(value) if value != '' else None
+            except ValueError:
+                number = None
+            lookup.append(math.nan if number is None else number)
+        return cls(name, type if type != INT else FLOAT, array('d', (lookup[code] for code in codes)))
+
+
+class ResultsTable:
+    """
+    Columnar representation of a batch's results CSV
+
+    The CSV is parsed in a single pass into interned string codes per column and
+    then each column is typed from its distinct values:
+      table = client.batches.results_table(batch_id)
+      table['WorkTimeInSeconds'].values  # array of numbers
+      table['Turkle.Username'].categories  # distinct usernames
+
+    Conversion to NumPy, pandas, Arrow and Parquet is available when those
+    packages are installed.
+    """
+    def __init__(self, columns):
+        """Construct a results table
+
+        Args:
+            columns (list): list of Column objects of the same length
+        """
+        self.columns = {column.name: column for column in columns}
+        lengths = {len(column) for column in columns}
+        if len(lengths) > 1:
+            raise TurkleClientException("Columns of a results table must have the same length")
+        self.num_rows = lengths.pop() if lengths else 0
+
+    def __len__(self):
+        return self.num_rows
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    @property
+    def column_names(self):
+        return list(self.columns)
+
+    def __repr__(self):
+        return f"ResultsTable({self.num_rows} rows, {len(self.columns)} columns)"
+
+    @classmethod
+    def from_rows(cls, rows, types=None):
+        """Build a table from CSV rows
+
+        Args:
+            rows (Iterable): lists of strings with the header as the first row
+            types (dict): Optional column name to type overrides
+
+        Returns:
+            ResultsTable: the parsed table
+        """
+        types = types or {}
+        rows = iter(rows)
+        header = next(rows, None)
+        if not header:
+            return cls([])
+        width = len(header)
+        codes = [array('i') for _ in header]
+        indexes = [{} for _ in header]
+        for row in rows:
+            if len(row) != width:
+                if not row:
+                    continue
+                row = (row + [''] * width)[:width]
+            for value, column_codes, index in zip(row, codes, indexes):
+                code = index.get(value)
+                if code is None:
+                    code = index[value] = len(index)
+                column_codes.append(code)
+        return cls([Column.from_codes(name, column_codes, list(index), types.get(name))
+                    for name, column_codes, index in zip(header, codes, indexes)])
+
+    def rows(self):
+        """Iterate over the rows as dicts
+
+        Returns:
+            Iterator: iterator over row dicts
+        """
+        names = self.column_names
+        return (dict(zip(names, values)) for values in zip(*self.columns.values()))
+
+    def to_numpy(self):
+        """Convert to a dict of NumPy arrays
+
+        Numeric columns share memory with the table. Timestamps become
+        datetime64[us] and categories become object arrays.
+
+        Returns:
+            dict: column name to numpy array
+        """
+        np = import_optional('numpy', 'numpy')
+        arrays = {}
+        for name, column in self.columns.items():
+            if column.type == CATEGORY:
+                codes = np.frombuffer(column.values, dtype=np.int32)
+                arrays[name] = np.asarray(column.categories, dtype=object)[codes]
+            elif column.type == TIMESTAMP:
+                seconds = np.frombuffer(column.values, dtype=np.float64)
+                missing = np.isnan(seconds)
+                micros = np.round(np.where(missing, 0, seconds) * 1e6).astype(np.int64)
+                arrays[name] = micros.astype('datetime64[us]')
+                arrays[name][missing] = np.datetime64('NaT')
+            else:
+                dtype = np.int64 if column.values.typecode == 'q' else np.float64
+                arrays[name] = np.frombuffer(column.values, dtype=dtype)
+        return arrays
+
+    def to_pandas(self):
+        """Convert to a pandas DataFrame with categorical string columns
+
+        Returns:
+            pandas.DataFrame: the table as a data frame
+        """
+        pd = import_optional('pandas', 'pandas')
+        np = import_optional('numpy', 'numpy')
+        data = {}
+        for name, column in self.columns.items():
+            if column.type == CATEGORY:
+                codes = np.frombuffer(column.values, dtype=np.int32)
+                data[name] = pd.Categorical.from_codes(codes, categories=pd.Index(column.categories))
+            elif column.type == TIMESTAMP:
+                data[name] = pd.to_datetime(np.frombuffer(column.values, dtype=np.float64),
+                                            unit='s', utc=True)
+            else:
+                dtype = np.int64 if column.values.typecode == 'q' else np.float64
+                data[name] = np.frombuffer(column.values, dtype=dtype)
+        return pd.DataFrame(data, columns=self.column_names)
+
+    def to_arrow(self):
+        """Convert to a pyarrow Table
+
+        Numeric columns and category codes are wrapped without copying.
+        Strings become dictionary arrays and timestamps are UTC microseconds.
+
+        Returns:
+            pyarrow.Table: the table in Arrow format
+        """
+        pa = import_optional('pyarrow', 'arrow')
+        arrays = []
+        for column in self.columns.values():
+            n = len(column)
+            if column.type == CATEGORY:
+                codes = pa.Array.from_buffers(pa.int32(), n, [None, pa.py_buffer(column.values)])
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    codes, pa.array(column.categories, type=pa.string())))
+            elif column.type == TIMESTAMP:
+                micros = [None if math.isnan(value) else int(round(value * 1e6))
+                          for value in column.values]
+                arrays.append(pa.array(micros, type=pa.timestamp('us', tz='UTC')))
+            elif column.values.typecode == 'q':
+                arrays.append(pa.Array.from_buffers(pa.int64(), n, [None, pa.py_buffer(column.values)]))
+            else:
+                arrays.append(pa.Array.from_buffers(pa.float64(), n, [None, pa.py_buffer(column.values)]))
+        return pa.Table.from_arrays(arrays, names=self.column_names)
+
+    def to_parquet(self, path, **kwargs):
+        """Write the table to a Parquet file through Arrow
+
+        Args:
+            path (str): Output path
+            **kwargs: passed to pyarrow.parquet.write_table
+        """
+        pq = import_optional('pyarrow.parquet', 'arrow')
+        pq.write_table(self.to_arrow(), path, **kwargs)
@@ -0,0 +1,305 @@
+import datetime
+import json
+import os
+
+from .exceptions import TurkleClientException
+from .optional import import_optional
+from .parallel import DEFAULT_WORKERS, bounded_map
+from .table import CATEGORY, FLOAT, TIMESTAMP, encode_column
+
+WORKER_FIELD = 'Turkle.Username'
+ASSIGNMENT_FIELD = 'AssignmentId'
+ACCEPT_FIELD = 'AcceptTime'
+SUBMIT_FIELD = 'SubmitTime'
+WORK_FIELD = 'WorkTimeInSeconds'
+
+WORKER = 'worker'
+BATCH = 'batch'
+
+# work times are counted in log scale buckets so the state stays small and medians are within 2%
+WORK_BUCKETS_PER_DOUBLING = 32
+
+
+def format_time(seconds):
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).isoformat()
+
+
+def bucket_seconds(bucket):
+    # geometric middle of the bucket
+    return 2 ** ((bucket + 0.5) / WORK_BUCKETS_PER_DOUBLING) - 1
+
+
+def histogram_median(histogram):
+    """Median work seconds from a histogram of bucket to count or None if it is empty"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    middle = [(total - 1) // 2, total // 2]
+    values = []
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        while middle and middle[0] < seen:
+            middle.pop(0)
+            values.append(bucket_seconds(bucket))
+    return sum(values) / 2
+
+
+class ThroughputTracker:
+    """
+    Annotator and batch throughput from result timestamps
+
+    Assignments are bucketed by submit time into bins (an hour by default) and
+    counted per annotator and per batch with vectorized group-bys. The tracker
+    state can be saved and loaded so that a later run only processes
+    assignments submitted after the last one seen for each batch:
+      tracker = ThroughputTracker.load('throughput.json')
+      tracker.add_batches(client, batch_ids)
+      tracker.save('throughput.json')
+      tracker.summary()
+    """
+    def __init__(self, bin_seconds=3600, worker_field=WORKER_FIELD):
+        """Construct a tracker
+
+        Args:
+            bin_seconds (int): Width of the time bins in seconds
+            worker_field (str): Results column identifying the annotator
+        """
+        self.bin_seconds = int(bin_seconds)
+        self.worker_field = worker_field
+        # batch id -> submit time watermark, assignments at the watermark, finished assignments
+        self.batches = {}
+        # group key -> {'bins': {bin: [items, work seconds]}, 'work_histogram': {bucket: count}}
+        self.groups = {WORKER: {}, BATCH: {}}
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Load a tracker from a state file or create a new one if it does not exist
+
+        Args:
+            path (str): Path to the json state file
+            **kwargs: arguments for a new tracker that must match a saved tracker (None to use its value)
+
+        Returns:
+            ThroughputTracker: the tracker
+
+        Raises:
+            TurkleClientException: if an argument differs from the saved tracker
+        """
+        kwargs = {name: value for name, value in kwargs.items() if value is not None}
+        if not os.path.exists(path):
+            return cls(**kwargs)
+        with open(path, 'r') as fh:
+            state = json.load(fh)
+        tracker = cls(bin_seconds=state['bin_seconds'], worker_field=state['worker_field'])
+        for name, value in kwargs.items():
+            # counts in bins of another width or for another column cannot be combined
+            if value != getattr(tracker, name):
+                raise TurkleClientException(
+                    f"{path} was saved with {name} {getattr(tracker, name)}, not {value}")
+        tracker.batches = {int(batch_id): value for batch_id, value in state['batches'].items()}
+        for kind in [WORKER, BATCH]:
+            tracker.groups[kind] = {
+                key: {'bins': {int(b): counts for b, counts in group['bins'].items()},
+                      'work_histogram': {int(b): count for b, count in group['work_histogram'].items()}}
+                for key, group in state['groups'][kind].items()
+            }
+        return tracker
+
+    def save(self, path):
+        """Save the tracker state to a json file
+
+        Args:
+            path (str): Path to the json state file
+        """
+        state = {
+            'bin_seconds': self.bin_seconds,
+            'worker_field': self.worker_field,
+            'batches': self.batches,
+            'groups': self.groups,
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as fh:
+            json.dump(state, fh)
+        os.replace(tmp_path, path)
+
+    def add_table(self, batch_id, table):
+        """Add the new assignments of a batch's results table
+
+        Args:
+            batch_id (int): Batch id
+            table (ResultsTable): results of the batch
+
+        Returns:
+            int: number of new assignments
+        """
+        np = import_optional('numpy', 'numpy')
+        for field in [self.worker_field, SUBMIT_FIELD]:
+            if field not in table:
+                raise TurkleClientException(f"Results are missing the {field} column")
+        if len(table) == 0:
+            return 0
+
+        submit = np.asarray(table[SUBMIT_FIELD].values, dtype=np.float64)
+        work = np.full(len(table), np.nan)
+        # a column without any values is inferred as a category
+        if WORK_FIELD in table and table[WORK_FIELD].type != CATEGORY:
+            work = np.asarray(table[WORK_FIELD].values, dtype=np.float64)
+        if ACCEPT_FIELD in table and table[ACCEPT_FIELD].type != CATEGORY:
+            accept = np.asarray(table[ACCEPT_FIELD].values, dtype=np.float64)
+            work = np.where(np.isnan(work), submit - accept, work)
+
+        state = self.batches.get(batch_id, {'watermark': None, 'at_watermark': []})
+        new = ~np.isnan(submit)
+        if state['watermark'] is not None and ASSIGNMENT_FIELD not in table:
+            new &= submit > state['watermark']
+        elif state['watermark'] is not None:
+            new &= submit >= state['watermark']
+            if state['at_watermark']:
+                seen = set(state['at_watermark'])
+                assignments = table[ASSIGNMENT_FIELD].to_list()
+                new &= np.fromiter((str(a) not in seen for a in assignments), dtype=bool,
+                                   count=len(assignments))
+        count = int(new.sum())
+        if count == 0:
+            return 0
+
+        worker_index = {}
+        workers = encode_column(table[self.worker_field], worker_index)[new]
+        submit, work = submit[new], work[new]
+        bins = np.floor(submit / self.bin_seconds).astype(np.int64)
+        self._merge(np, WORKER, list(worker_index), workers, bins, work)
+        self._merge(np, BATCH, [str(batch_id)], np.zeros(count, dtype=np.int64), bins, work)
+
+        watermark = float(submit.max())
+        at_watermark = []
+        if ASSIGNMENT_FIELD in table:
+            assignments = np.asarray(table[ASSIGNMENT_FIELD].to_list(), dtype=object)[new]
+            at_watermark = [str(a) for a in assignments[submit == watermark]]
+        if watermark == state['watermark']:
+            at_watermark += state['at_watermark']
+        self.batches[batch_id] = {**state, 'watermark': watermark, 'at_watermark': at_watermark}
+        return count
+
+    def _merge(self, np, kind, names, codes, bins, work):
+        # group by (key, bin) with numpy and then fold the much smaller result into the state
+        offset = bins.min()
+        span = int(bins.max() - offset) + 1
+        keys = codes * span + (bins - offset)
+        unique, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        work_sums = np.bincount(inverse.reshape(-1), weights=np.nan_to_num(work), minlength=len(unique))
+        groups = self.groups[kind]
+        for key, items, work_sum in zip(unique.tolist(), counts.tolist(), work_sums.tolist()):
+            code, b = divmod(key, span)
+            group = groups.setdefault(names[code], {'bins': {}, 'work_histogram': {}})
+            totals = group['bins'].setdefault(int(b + offset), [0, 0.0])
+            totals[0] += items
+            totals[1] += work_sum
+        valid = ~np.isnan(work)
+        if not valid.any():
+            return
+        buckets = np.floor(np.log2(1 + np.maximum(work[valid], 0)) * WORK_BUCKETS_PER_DOUBLING)
+        buckets = buckets.astype(np.int64)
+        span = int(buckets.max()) + 1
+        unique, counts = np.unique(codes[valid] * span + buckets, return_counts=True)
+        for key, count in zip(unique.tolist(), counts.tolist()):
+            code, bucket = divmod(key, span)
+            histogram = groups[names[code]]['work_histogram']
+            histogram[bucket] = histogram.get(bucket, 0) + count
+
+    def add_batches(self, client, batch_ids, max_workers=DEFAULT_WORKERS):
+        """Download the results of batches with new assignments and add them
+
+        Batches whose finished assignment count has not changed since the last
+        run are not downloaded.
+
+        Args:
+            client (Client): Turkle client instance
+            batch_ids (list): Batch ids
+            max_workers (int): Number of concurrent downloads
+
+        Returns:
+            int: number of new assignments
+        """
+        types = {self.worker_field: CATEGORY, ASSIGNMENT_FIELD: CATEGORY, SUBMIT_FIELD: TIMESTAMP,
+                 ACCEPT_FIELD: TIMESTAMP, WORK_FIELD: FLOAT}
+
+        def fetch(batch_id):
+            finished = client.batches.progress(batch_id)['total_finished_task_assignments']
+            if self.batches.get(batch_id, {}).get('finished') == finished:
+                return batch_id, finished, None
+            return batch_id, finished, client.batches.results_table(batch_id, types=types)
+
+        total = 0
+        for batch_id, finished, table in bounded_map(fetch, batch_ids, max_workers):
+            if table is not None:
+                total += self.add_table(batch_id, table)
+                self.batches.setdefault(batch_id, {'watermark': None, 'at_watermark': []})
+                self.batches[batch_id]['finished'] = finished
+        return total
+
+    def summary(self, by=WORKER):
+        """Throughput totals for each annotator or batch
+
+        Args:
+            by (str): worker or batch
+
+        Returns:
+            list: dicts with items, active_hours, items_per_hour, median_work_seconds
+                  (None without work times), first_bin and last_bin
+        """
+        rows = []
+        for key, group in self._groups(by).items():
+            bins = sorted(group['bins'])
+            items = sum(group['bins'][b][0] for b in bins)
+            active_hours = len(bins) * self.bin_seconds / 3600
+            rows.append({
+                by: key,
+                'items': items,
+                'active_hours': active_hours,
+                'items_per_hour': items / active_hours if active_hours else None,
+                'median_work_seconds': histogram_median(group['work_histogram']),
+                'first_bin': format_time(bins[0] * self.bin_seconds),
+                'last_bin': format_time(bins[-1] * self.bin_seconds),
+            })
+        return rows
+
+    def series(self, by=WORKER, window=1):
+        """Rolling throughput time series for each annotator or batch
+
+        Args:
+            by (str): worker or batch
+            window (int): Number of bins in the rolling window
+
+        Returns:
+            list: dicts with the key, bin start time, items, work_seconds and rolling
+                  items_per_hour for each bin with activity
+        """
+        np = import_optional('numpy', 'numpy')
+        keys, bins, items, work = [], [], [], []
+        for key, group in self._groups(by).items():
+            for b, (count, work_sum) in sorted(group['bins'].items()):
+                keys.append(key)
+                bins.append(b)
+                items.append(count)
+                work.append(work_sum)
+        if not keys:
+            return []
+        bins = np.asarray(bins, dtype=np.int64)
+        codes = np.cumsum([0] + [a != b for a, b in zip(keys, keys[1:])])
+        # keys from different groups are far enough apart that windows never cross groups
+        sort_keys = codes * (bins.max() - bins.min() + window + 1) + (bins - bins.min())
+        cumulative = np.concatenate([[0], np.cumsum(items)])
+        starts = np.searchsorted(sort_keys, sort_keys - window + 1, side='left')
+        rolling = cumulative[np.arange(1, len(items) + 1)] - cumulative[starts]
+        hours = window * self.bin_seconds / 3600
+        return [
+            {by: key, 'bin': format_time(b * self.bin_seconds), 'items': count,
+             'work_seconds': work_sum, 'items_per_hour': total / hours}
+            for key, b, count, work_sum, total in zip(keys, bins.tolist(), items, work, rolling.tolist())
+        ]
+
+    def _groups(self, by):
+        if by not in self.groups:
+            raise TurkleClientException(f"Unrecognized throughput grouping: {by}")
+        return self.groups[by]
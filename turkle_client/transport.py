@@ -0,0 +1,196 @@
+"""
+Transports create the sessions that send a client's HTTP requests
+
+A transport is a callable that takes a pool size and returns a session with
+requests' interface: get, post, patch and put accepting params, json,
+headers, timeout=(connect, read) and stream, returning responses with
+status_code, headers, encoding, content, text, json(), iter_content() and
+close(), and raising requests.exceptions.Timeout or ConnectionError when the
+site cannot be reached. Clients take a transport or one of these names:
+  requests: HTTP/1.1 with a pool of connections per host (the default)
+  http2: HTTP/2 with httpx, so concurrent requests share one connection
+  h2c: like http2 but plain http sites are spoken to in HTTP/2 directly
+"""
+import requests
+from requests.adapters import HTTPAdapter
+
+from .exceptions import TurkleClientException
+from .optional import import_optional
+
+# maximum number of connections kept open to a host
+DEFAULT_POOL_SIZE = 16
+
+
+def make_session(pool_size=DEFAULT_POOL_SIZE):
+    """Create a requests session that keeps up to pool_size connections open per host
+
+    Args:
+        pool_size (int): Maximum number of pooled connections per host
+
+    Returns:
+        requests.Session: the session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def make_http2_session(pool_size=DEFAULT_POOL_SIZE):
+    """Create a session that sends requests over HTTP/2 (requires turkle-client[http2])
+
+    Requests to https sites are multiplexed over one connection per host when
+    the site supports HTTP/2 and fall back to HTTP/1.1 when it does not. Plain
+    http sites are sent HTTP/1.1 since they cannot negotiate HTTP/2.
+
+    Args:
+        pool_size (int): Maximum number of connections per host
+
+    Returns:
+        Http2Session: the session
+    """
+    return Http2Session(pool_size)
+
+
+def make_h2c_session(pool_size=DEFAULT_POOL_SIZE):
+    """Create an HTTP/2 session that also uses HTTP/2 for plain http sites (requires turkle-client[http2])
+
+    Plain http sites must accept HTTP/2 without an upgrade (prior knowledge),
+    like a local server behind a proxy that terminates TLS.
+
+    Args:
+        pool_size (int): Maximum number of connections per host
+
+    Returns:
+        Http2Session: the session
+    """
+    return Http2Session(pool_size, prior_knowledge=True)
+
+
+TRANSPORTS = {
+    'requests': make_session,
+    'http2': make_http2_session,
+    'h2c': make_h2c_session,
+}
+
+
+def get_transport(transport):
+    """Resolve a transport name or callable
+
+    Args:
+        transport (str or Callable): Name from TRANSPORTS or a callable (None for the default)
+
+    Returns:
+        Callable: creates a session from a pool size
+    """
+    if transport is None:
+        return make_session
+    if callable(transport):
+        return transport
+    if transport not in TRANSPORTS:
+        raise TurkleClientException(
+            f"Unknown transport {transport}. Choose from {', '.join(TRANSPORTS)}")
+    return TRANSPORTS[transport]
+
+
+class Http2Session:
+    """Session with the interface of requests.Session backed by an httpx client"""
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, prior_knowledge=False):
+        """Construct a session
+
+        Args:
+            pool_size (int): Maximum number of connections per host
+            prior_knowledge (bool): Whether plain http sites are sent HTTP/2 without an upgrade
+        """
+        httpx = import_optional('httpx', 'http2')
+        # httpx needs the h2 package for HTTP/2
+        import_optional('h2', 'http2')
+        self._httpx = httpx
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        # httpx only sends HTTP/2 to plain http sites when HTTP/1.1 is disabled
+        self.client = httpx.Client(http1=not prior_knowledge, http2=True, limits=limits)
+        self.https_client = httpx.Client(http2=True, limits=limits)
+
+    def request(self, method, url, params=None, json=None, headers=None, timeout=None,
+                stream=False, **kwargs):
+        client = self.https_client if url.startswith('https:') else self.client
+        try:
+            request = client.build_request(method, url, params=params, json=json, headers=headers,
+                                           timeout=self._timeout(timeout), **kwargs)
+            try:
+                return Http2Response(client.send(request, stream=stream), self)
+            except self._httpx.RemoteProtocolError:
+                # servers close a connection after a number of requests (1000 for nginx)
+                # and the GETs still in flight on it are sent again on a new one
+                if method != 'GET':
+                    raise
+                return Http2Response(client.send(request, stream=stream), self)
+        except self._httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e))
+        except self._httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def close(self):
+        self.client.close()
+        self.https_client.close()
+
+    def _timeout(self, timeout):
+        if timeout is None:
+            return self._httpx.Timeout(None)
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+        else:
+            connect = read = timeout
+        return self._httpx.Timeout(read, connect=connect)
+
+
+class Http2Response:
+    """Wraps an httpx response in the parts of the requests.Response interface the client uses"""
+    def __init__(self, response, session):
+        self._response = response
+        self._session = session
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+        self.http_version = response.http_version
+
+    @property
+    def encoding(self):
+        return self._response.charset_encoding
+
+    @property
+    def content(self):
+        return self._response.read()
+
+    @property
+    def text(self):
+        self._response.read()
+        return self._response.text
+
+    def json(self):
+        self._response.read()
+        return self._response.json()
+
+    def iter_content(self, chunk_size=1):
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except self._session._httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e))
+        except self._session._httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+
+    def close(self):
+        self._response.close()
@@ -0,0 +1,227 @@
+import csv
+import datetime
+import io
+import json
+import sqlite3
+
+from .parallel import DEFAULT_WORKERS, bounded_map
+
+# columns of the results csv that are worth indexing for analytical queries
+INDEXED_COLUMNS = ['Turkle.Username', 'WorkerId', 'SubmitTime']
+
+PROGRESS_FIELDS = ['total_tasks', 'total_task_assignments',
+                   'total_finished_tasks', 'total_finished_task_assignments']
+
+
+def quote(identifier):
+    """Quote a table or column name for use in SQL"""
+    return '"{}"'.format(identifier.replace('"', '""'))
+
+
+def results_table_name(project_id):
+    return f"project_{project_id}_results"
+
+
+def input_table_name(project_id):
+    return f"project_{project_id}_input"
+
+
+class Warehouse:
+    """
+    Local SQLite store of inputs and results across all projects and batches
+
+    Each project gets a results table and an input table whose columns come
+    from the CSV headers of its batches plus a batch_id and row_number column:
+      warehouse = Warehouse(client, "turkle.db")
+      warehouse.sync()
+      warehouse.query('SELECT COUNT(*) AS n FROM project_3_results WHERE "Turkle.Username" = ?', ['smith'])
+
+    The projects and batches tables hold normalized metadata and the last seen
+    progress of each batch. A sync only downloads batches whose progress changed.
+    """
+    def __init__(self, client, path, max_workers=DEFAULT_WORKERS):
+        """Construct a warehouse
+
+        Args:
+            client (Client): Turkle client instance
+            path (str): Path to the SQLite database file
+            max_workers (int): Number of concurrent downloads
+        """
+        self.client = client
+        self.path = path
+        self.max_workers = max_workers
+        self.conn = sqlite3.connect(path)
+        self._create_metadata_tables()
+
+    def close(self):
+        self.conn.close()
+
+    def _create_metadata_tables(self):
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS projects ("
+                "id INTEGER PRIMARY KEY, name TEXT, data TEXT, synced_at TEXT)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS batches ("
+                "id INTEGER PRIMARY KEY, project_id INTEGER, name TEXT, "
+                "active INTEGER, completed INTEGER, "
+                "total_tasks INTEGER, total_task_assignments INTEGER, "
+                "total_finished_tasks INTEGER, total_finished_task_assignments INTEGER, "
+                "data TEXT, synced_at TEXT)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS batches_project_id ON batches (project_id)")
+
+    def sync(self, project_ids=None):
+        """Download new or changed batches into the warehouse
+
+        Args:
+            project_ids (list): Optional list of project ids to limit the sync
+
+        Returns:
+            dict: counts of projects, batches, refreshed, unchanged and removed batches
+        """
+        projects = self.client.projects.list()
+        if project_ids:
+            wanted = {int(pid) for pid in project_ids}
+            projects = [project for project in projects if project['id'] in wanted]
+        for project in projects:
+            self._store_project(project)
+
+        project_batches = bounded_map(
+            lambda project: self.client.projects.batches(project['id']), projects, self.max_workers)
+        batches = [batch for group in project_batches for batch in group]
+
+        # progress is cheap to fetch so it is used to decide what to download
+        progresses = bounded_map(
+            lambda batch: self.client.batches.progress(batch['id']), batches, self.max_workers)
+        changed = []
+        for batch, progress in zip(batches, progresses):
+            if self._stored_progress(batch['id']) != self._progress_tuple(progress):
+                changed.append((batch, progress))
+
+        for batch, progress, input_text, results_text in bounded_map(self._download, changed,
+                                                                     self.max_workers):
+            self._store_batch(batch, progress, input_text, results_text)
+
+        # batches deleted on the server are dropped, limited to the synced projects
+        listed = {batch['id'] for batch in batches}
+        synced = {project['id'] for project in projects}
+        removed = [(batch_id, project_id) for batch_id, project_id
+                   in self.conn.execute("SELECT id, project_id FROM batches").fetchall()
+                   if batch_id not in listed and (not project_ids or project_id in synced)]
+        for batch_id, project_id in removed:
+            self._remove_batch(batch_id, project_id)
+
+        return {
+            'projects': len(projects),
+            'batches': len(batches),
+            'refreshed': len(changed),
+            'unchanged': len(batches) - len(changed),
+            'removed': len(removed),
+        }
+
+    def query(self, sql, params=()):
+        """Run a SQL query against the warehouse
+
+        Args:
+            sql (str): SQL query
+            params (list): Parameters for the query
+
+        Returns:
+            list: list of row dicts
+        """
+        cursor = self.conn.execute(sql, params)
+        names = [col[0] for col in cursor.description] if cursor.description else []
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def _download(self, item):
+        batch, progress = item
+        input_text = self.client.batches.input(batch['id'])
+        results_text = self.client.batches.results(batch['id'])
+        return batch, progress, input_text, results_text
+
+    @staticmethod
+    def _progress_tuple(progress):
+        return tuple(progress.get(field) for field in PROGRESS_FIELDS)
+
+    def _stored_progress(self, batch_id):
+        row = self.conn.execute(
+            f"SELECT {', '.join(PROGRESS_FIELDS)} FROM batches WHERE id = ?", (batch_id,)
+        ).fetchone()
+        return row
+
+    @staticmethod
+    def _now():
+        return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+    def _store_project(self, project):
+        # the template can be large and is not useful for queries
+        data = {key: value for key, value in project.items() if key != 'html_template'}
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO projects (id, name, data, synced_at) VALUES (?, ?, ?, ?)",
+                (project['id'], project.get('name'), json.dumps(data), self._now())
+            )
+
+    def _store_batch(self, batch, progress, input_text, results_text):
+        project_id = batch['project']
+        with self.conn:
+            self._store_csv(input_table_name(project_id), batch['id'], input_text)
+            self._store_csv(results_table_name(project_id), batch['id'], results_text)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO batches (id, project_id, name, active, completed, "
+                f"{', '.join(PROGRESS_FIELDS)}, data, synced_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (batch['id'], project_id, batch.get('name'), batch.get('active'),
+                 batch.get('completed'), *self._progress_tuple(progress),
+                 json.dumps(batch), self._now())
+            )
+
+    def _remove_batch(self, batch_id, project_id):
+        with self.conn:
+            for table in [input_table_name(project_id), results_table_name(project_id)]:
+                if self._table_exists(table):
+                    self.conn.execute(f"DELETE FROM {quote(table)} WHERE batch_id = ?", (batch_id,))
+            self.conn.execute("DELETE FROM batches WHERE id = ?", (batch_id,))
+
+    def _table_exists(self, table):
+        return self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone() is not None
+
+    def _store_csv(self, table, batch_id, text):
+        reader = csv.reader(io.StringIO(text))
+        header = next(reader, None)
+        self._ensure_table(table, header or [])
+        self.conn.execute(f"DELETE FROM {quote(table)} WHERE batch_id = ?", (batch_id,))
+        if not header:
+            return
+        columns = ', '.join(['batch_id', 'row_number'] + [quote(name) for name in header])
+        placeholders = ', '.join('?' * (len(header) + 2))
+        width = len(header)
+        self.conn.executemany(
+            f"INSERT INTO {quote(table)} ({columns}) VALUES ({placeholders})",
+            ((batch_id, row_number, *(row + [''] * (width - len(row)))[:width])
+             for row_number, row in enumerate(reader, start=1))
+        )
+
+    def _ensure_table(self, table, header):
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {quote(table)} (batch_id INTEGER, row_number INTEGER)"
+        )
+        self.conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote(table + '_batch_id')} ON {quote(table)} (batch_id)"
+        )
+        # sqlite column names are case insensitive
+        existing = {row[1].lower() for row in self.conn.execute(f"PRAGMA table_info({quote(table)})")}
+        # batches of a project can have different headers so the schema grows as needed
+        for name in header:
+            if name.lower() not in existing:
+                self.conn.execute(f"ALTER TABLE {quote(table)} ADD COLUMN {quote(name)} TEXT")
+                existing.add(name.lower())
+                if name in INDEXED_COLUMNS:
+                    self.conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS {quote(table + '_' + name)} "
+                        f"ON {quote(table)} ({quote(name)})"
+                    )
@@ -1,51 +1,97 @@
 import csv
 import json
 import os.path
+import sys
 
-from .client import Permissions
+from .aggregation import LabelAggregator
+from .apply import Applier, load_state, upsert_users, writable_user
+from .audit import AccessAudit
+from .bulk import apply_permissions, load_targets, select_targets
+from .client import Batches, Permissions, Projects
 from .exceptions import TurkleClientException
+from .export import FORMATS as RESULTS_FORMATS, write_merged_results
+from .mirror import Mirror
+from .readers import load_records
+from .schema import validate_or_raise
+from .scoring import GoldScorer
+from .sharding import create_sharded_batch, manifest_batch_ids, write_manifest
+from .throughput import ThroughputTracker
+from .warehouse import Warehouse
 
 
 def plural(num, single, mult):
     return f"{num} {single if num == 1 else mult}"
 
 
-def load_records(file_path, exts=None):
+def write_records(file_path, records, exts=None):
     """
-    Yields dictionaries from a .jsonl, .json or .csv file.
+    Writes dictionaries to a .jsonl or .csv file.
 
     Args:
-        file_path (str): Path to the input file
+        file_path (str): Path to the output file
+        records (list): List of dictionaries with the same keys
         exts (list): List of extensions to support
 
     Returns:
-        Iterator: iterator over dictionaries
+        int: number of records written
     """
-    exts = exts if exts else ['.jsonl', '.json', '.csv']
+    exts = exts if exts else ['.jsonl', '.csv']
     ext = os.path.splitext(file_path)[1].lower()
     if ext not in exts:
         raise ValueError(f"Unsupported file format: {ext}")
 
+    count = 0
+    with open(file_path, 'w', encoding='utf-8', newline='') as fh:
+        if ext == '.jsonl':
+            for count, record in enumerate(records, start=1):
+                fh.write(json.dumps(record) + '\n')
+        else:
+            writer = None
+            for count, record in enumerate(records, start=1):
+                if writer is None:
+                    writer = csv.DictWriter(fh, fieldnames=list(record))
+                    writer.writeheader()
+                writer.writerow(record)
+    return count
+
+
+def parse_ids(ids, option):
+    """Parse a comma separated list of integer ids from the command line"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as fh:
-            if ext == '.jsonl':
-                for lineno, line in enumerate(fh, start=1):
-                    if not line.strip():
-                        continue  # skip blank lines
-                    try:
-                        yield json.loads(line)
-                    except json.JSONDecodeError as e:
-                        raise ValueError(f"Invalid JSON on line {lineno} in {file_path}: {e}")
-            elif ext == '.csv':
-                reader = csv.DictReader(fh)
-                for row in reader:
-                    yield row
-            elif ext == '.json':
-                yield json.load(fh)
-            else:
-                raise ValueError(f"Unsupported file format: {ext}")
-    except OSError as e:
-        raise ValueError(f"Could not open file {file_path}: {e}")
+        return [int(value) for value in ids.split(',') if value.strip()]
+    except ValueError:
+        raise TurkleClientException(f"{option} must be a comma separated list of integers")
+
+
+def parse_filters(filters):
+    """Parse NAME=VALUE filters from the command line into a dict"""
+    parsed = {}
+    for item in filters or []:
+        name, sep, value = item.partition('=')
+        if not sep or not name.strip():
+            raise TurkleClientException(f"--filter must be NAME=VALUE: {item}")
+        parsed[name.strip()] = value.strip()
+    return parsed
+
+
+def results_format(format, command):
+    """Check the --format of a merged results command before its output file is opened"""
+    format = format or 'csv'
+    if format not in RESULTS_FORMATS:
+        raise TurkleClientException(
+            f"--format for '{command}' must be one of {', '.join(RESULTS_FORMATS)}")
+    return format
+
+
+def preflight(file, schema, validate_only, exts=None):
+    """Validate a bulk input file before anything is sent
+
+    Returns:
+        str: a message if only validating or None to continue
+    """
+    count = validate_or_raise(file, schema, exts)
+    if validate_only:
+        return f"{plural(count, 'record', 'records')} in {file} valid for '{schema}'"
 
 
 class Wrapper:
@@ -55,8 +101,8 @@ class Wrapper:
     def __init__(self, client):
         self.client = client
 
-    def list(self, **kwargs):
-        return self.client.list()
+    def list(self, filters=None, page_size=None, **kwargs):
+        return self.client.iter_list(page_size=page_size, **parse_filters(filters))
 
 
 class UsersWrapper(Wrapper):
@@ -68,9 +114,12 @@ class UsersWrapper(Wrapper):
         else:
             raise TurkleClientException("--id or --username must be set for 'users retrieve'")
 
-    def create(self, file, **kwargs):
+    def create(self, file, validate_only, **kwargs):
         if not file:
             raise TurkleClientException("--file must be set for 'users create'")
+        message = preflight(file, 'users create', validate_only)
+        if message:
+            return message
 
         lineno = 0
         try:
@@ -81,19 +130,33 @@ class UsersWrapper(Wrapper):
 
         return f"{plural(lineno, 'user', 'users')} created"
 
-    def update(self, file, **kwargs):
+    def update(self, file, validate_only, **kwargs):
         if not file:
             raise TurkleClientException("--file must be set for 'users update'")
+        message = preflight(file, 'users update', validate_only)
+        if message:
+            return message
 
         lineno = 0
         try:
             for lineno, obj in enumerate(load_records(file), start=1):
-                self.client.update(obj)
+                self.client.update(writable_user(obj))
         except TurkleClientException as e:
             raise TurkleClientException(f"Failure on line {lineno} in {file}: {e}")
 
         return f"{plural(lineno, 'user', 'users')} updated"
 
+    def upsert(self, file, workers, validate_only, **kwargs):
+        if not file:
+            raise TurkleClientException("--file must be set for 'users upsert'")
+        message = preflight(file, 'users upsert', validate_only)
+        if message:
+            return message
+
+        stats = upsert_users(self.client, load_records(file), max_workers=workers)
+        return (f"{plural(stats['created'], 'user', 'users')} created, "
+                f"{stats['updated']} updated, {stats['unchanged']} unchanged")
+
 
 class GroupsWrapper(Wrapper):
     def retrieve(self, id, name, **kwargs):
@@ -104,9 +167,12 @@ class GroupsWrapper(Wrapper):
         else:
             raise TurkleClientException("--id or --name must be set for 'groups retrieve'")
 
-    def create(self, file, **kwargs):
+    def create(self, file, validate_only, **kwargs):
         if not file:
             raise ValueError("--file must be set for 'groups create'")
+        message = preflight(file, 'groups create', validate_only, [".jsonl", ".json"])
+        if message:
+            return message
 
         lineno = 0
         try:
@@ -138,9 +204,12 @@ class ProjectsWrapper(Wrapper):
             raise TurkleClientException("--id must be set for 'projects retrieve'")
         return self.client.retrieve(id)
 
-    def create(self, file, **kwargs):
+    def create(self, file, validate_only, **kwargs):
         if not file:
             raise TurkleClientException("--file must be set for 'projects create'")
+        message = preflight(file, 'projects create', validate_only, [".jsonl", ".json"])
+        if message:
+            return message
 
         lineno = 0
         try:
@@ -155,9 +224,12 @@ class ProjectsWrapper(Wrapper):
 
         return f"{plural(lineno, 'project', 'projects')} created"
 
-    def update(self, file, **kwargs):
+    def update(self, file, validate_only, **kwargs):
         if not file:
             raise TurkleClientException("--file must be set for 'projects update'")
+        message = preflight(file, 'projects update', validate_only, [".jsonl", ".json"])
+        if message:
+            return message
 
         lineno = 0
         try:
@@ -172,10 +244,23 @@ class ProjectsWrapper(Wrapper):
 
         return f"{plural(lineno, 'project', 'projects')} updated"
 
-    def batches(self, id, **kwargs):
+    def batches(self, id, filters=None, page_size=None, **kwargs):
         if not id:
             raise TurkleClientException("--id must be set for 'projects batches'")
-        return self.client.batches(id)
+        return self.client.iter_batches(id, page_size=page_size, **parse_filters(filters))
+
+    def results(self, id, format, output, workers, **kwargs):
+        if not id:
+            raise TurkleClientException("--id must be set for 'projects results'")
+        format = results_format(format, 'projects results')
+        batch_ids = [batch['id'] for batch in self.client.batches(id)]
+        batches = Batches(self.client.base_url, self.client.token, self.client.debug, self.client.pool)
+        if output:
+            with open(output, 'w', encoding='utf-8', newline='') as fh:
+                count = write_merged_results(batches, batch_ids, fh, format, workers)
+            return (f"{plural(count, 'row', 'rows')} from "
+                    f"{plural(len(batch_ids), 'batch', 'batches')} written to {output}")
+        write_merged_results(batches, batch_ids, sys.stdout, format, workers)
 
 
 class BatchesWrapper(Wrapper):
@@ -184,9 +269,14 @@ class BatchesWrapper(Wrapper):
             raise TurkleClientException("--id must be set for 'batches retrieve'")
         return self.client.retrieve(id)
 
-    def create(self, file, **kwargs):
+    def create(self, file, shard_size, template, manifest, workers, validate_only, **kwargs):
         if not file:
             raise TurkleClientException("--file must be set for 'batches create'")
+        message = preflight(file, 'batches create', validate_only, [".jsonl", ".json"])
+        if message:
+            return message
+        if shard_size:
+            return self._create_shards(file, shard_size, template, manifest, workers)
 
         lineno = 0
         try:
@@ -200,9 +290,35 @@ class BatchesWrapper(Wrapper):
 
         return f"{plural(lineno, 'batch', 'batches')} created"
 
-    def update(self, file, **kwargs):
+    def _create_shards(self, file, shard_size, template, manifest, workers):
+        permissions = Permissions(self.client.base_url, self.client.token, self.client.debug,
+                                  self.client.pool)
+        shards = {'shard_size': shard_size, 'batches': []}
+        lineno = 0
+        try:
+            for lineno, obj in enumerate(load_records(file, [".jsonl", ".json"]), start=1):
+                with open(os.path.expanduser(obj['filename']), 'r', encoding='utf-8', newline='') as csv_fh:
+                    result = create_sharded_batch(self.client, permissions, obj, csv_fh, shard_size,
+                                                  template_batch=template, max_workers=workers)
+                shards['batches'].extend(result['batches'])
+        except TurkleClientException as e:
+            raise TurkleClientException(f"Failure on object {lineno} in {file}: {e}")
+
+        if not manifest:
+            return shards
+        write_manifest(manifest, shards)
+        failed = [entry for entry in shards['batches'] if entry['status'] == 'error']
+        for entry in failed:
+            print(f"Failure on shard {entry['name']}: {entry['error']}", file=sys.stderr)
+        return (f"{plural(len(shards['batches']) - len(failed), 'batch', 'batches')} created, "
+                f"{len(failed)} failed, manifest written to {manifest}")
+
+    def update(self, file, validate_only, **kwargs):
         if not file:
             raise TurkleClientException("--file must be set for 'batches update'")
+        message = preflight(file, 'batches update', validate_only, [".jsonl", ".json"])
+        if message:
+            return message
 
         lineno = 0
         try:
@@ -242,12 +358,27 @@ class BatchesWrapper(Wrapper):
             raise TurkleClientException("--id must be set for 'batches progress'")
         return self.client.progress(id)
 
-    def results(self, id, **kwargs):
+    def results(self, id, manifest, format, output, workers, **kwargs):
+        if manifest:
+            # merge the results of the shards created by 'batches create --shard-size'
+            format = results_format(format, 'batches results')
+            batch_ids = manifest_batch_ids(manifest)
+            if output:
+                with open(output, 'w', encoding='utf-8', newline='') as fh:
+                    count = write_merged_results(self.client, batch_ids, fh, format, workers)
+                return (f"{plural(count, 'row', 'rows')} from "
+                        f"{plural(len(batch_ids), 'batch', 'batches')} written to {output}")
+            write_merged_results(self.client, batch_ids, sys.stdout, format, workers)
+            return None
         if not id:
-            raise TurkleClientException("--id must be set for 'batches results'")
+            raise TurkleClientException("--id or --manifest must be set for 'batches results'")
         return self.client.results(id)
 
 
+# fields of the record written for each target of permissions bulk
+BULK_RESULT_FIELDS = ['type', 'id', 'status', 'users', 'groups', 'error']
+
+
 class PermissionsWrapper(Wrapper):
     def _prepare_args(self, pid, bid):
         if pid:
@@ -277,3 +408,164 @@ class PermissionsWrapper(Wrapper):
         with open(file, 'r') as fh:
             data = json.load(fh)
             return self.client.replace(*self._prepare_args(pid, bid), data)
+
+    def bulk(self, file, selector, mode, workers, validate_only, **kwargs):
+        if not file:
+            raise ValueError("--file must be set for 'permissions bulk'")
+        if selector:
+            message = preflight(file, 'permissions', validate_only, [".json"])
+        else:
+            message = preflight(file, 'permissions bulk', validate_only, [".jsonl", ".json"])
+        if message:
+            return message
+        if selector:
+            # the file has the users and groups given to every selected project or batch
+            permissions = next(load_records(file, [".json"]))
+            projects = Projects(self.client.base_url, self.client.token, self.client.debug,
+                                self.client.pool)
+            targets = select_targets(projects, selector, permissions)
+        else:
+            targets = load_targets(load_records(file, [".jsonl", ".json"]))
+        results = apply_permissions(self.client, targets, mode, max_workers=workers)
+        failed = sum(result['status'] == 'error' for result in results)
+        print(f"{plural(len(results) - failed, 'target', 'targets')} updated, {failed} failed",
+              file=sys.stderr)
+        # every record has the same fields so --format csv has a column for the error
+        return [{field: result.get(field) for field in BULK_RESULT_FIELDS} for result in results]
+
+
+class WarehouseWrapper(Wrapper):
+    def sync(self, db, projects, workers, **kwargs):
+        if not db:
+            raise TurkleClientException("--db must be set for 'warehouse sync'")
+        project_ids = parse_ids(projects, '--projects') if projects else None
+        warehouse = Warehouse(self.client, db, max_workers=workers)
+        try:
+            stats = warehouse.sync(project_ids)
+        finally:
+            warehouse.close()
+        return (f"{plural(stats['projects'], 'project', 'projects')} and "
+                f"{plural(stats['batches'], 'batch', 'batches')} synced "
+                f"({stats['refreshed']} refreshed, {stats['unchanged']} unchanged, "
+                f"{stats['removed']} removed)")
+
+    def query(self, db, sql, **kwargs):
+        if not db:
+            raise TurkleClientException("--db must be set for 'warehouse query'")
+        if not sql:
+            raise TurkleClientException("--sql must be set for 'warehouse query'")
+        warehouse = Warehouse(self.client, db)
+        try:
+            return warehouse.query(sql)
+        finally:
+            warehouse.close()
+
+
+class AnalysisWrapper(Wrapper):
+    def agreement(self, bid, field, task_field, worker_field, output, **kwargs):
+        if not bid:
+            raise TurkleClientException("--bid must be set for 'analysis agreement'")
+        if not field:
+            raise TurkleClientException("--field must be set for 'analysis agreement'")
+
+        aggregator = LabelAggregator(field, task_field=task_field, worker_field=worker_field)
+        aggregator.add_batches(self.client, parse_ids(bid, '--bid'))
+        summary = aggregator.summary()
+        if output:
+            write_records(output, aggregator.labels())
+        return summary
+
+    def score(self, bid, field, gold, key, gold_field, worker_field, min_accuracy, report_dir, output,
+              **kwargs):
+        if not bid:
+            raise TurkleClientException("--bid must be set for 'analysis score'")
+        if not field:
+            raise TurkleClientException("--field must be set for 'analysis score'")
+        if not gold:
+            raise TurkleClientException("--gold must be set for 'analysis score'")
+        if not key:
+            raise TurkleClientException("--key must be set for 'analysis score'")
+
+        scorer = GoldScorer(load_records(gold, ['.jsonl', '.csv']), key.split(','), field,
+                            gold_field=gold_field, worker_field=worker_field)
+        scorer.add_batches(self.client, parse_ids(bid, '--bid'))
+        if report_dir:
+            scorer.write_reports(report_dir, min_accuracy)
+        scores = scorer.scores(min_accuracy)
+        if output:
+            write_records(output, scores)
+            return f"{plural(len(scores), 'annotator', 'annotators')} scored"
+        return scores
+
+    def throughput(self, bid, pid, state, by, bin_seconds, window, series, output, worker_field,
+                   **kwargs):
+        if not bid and not pid:
+            raise TurkleClientException("--bid or --pid must be set for 'analysis throughput'")
+
+        batch_ids = parse_ids(bid, '--bid') if bid else []
+        for project_id in parse_ids(pid, '--pid') if pid else []:
+            batch_ids.extend(batch['id'] for batch in self.client.projects.batches(project_id))
+        options = {'worker_field': worker_field}
+        if bin_seconds:
+            options['bin_seconds'] = bin_seconds
+        if state:
+            # options that differ from the saved state raise instead of mixing counts
+            tracker = ThroughputTracker.load(state, **options)
+        else:
+            tracker = ThroughputTracker(**options)
+        tracker.add_batches(self.client, batch_ids)
+        if state:
+            tracker.save(state)
+        if series:
+            write_records(series, tracker.series(by, window))
+        summary = tracker.summary(by)
+        if output:
+            write_records(output, summary)
+            return f"{plural(len(summary), 'row', 'rows')} written to {output}"
+        return summary
+
+
+class MirrorWrapper(Wrapper):
+    def mirror(self, directory, workers, **kwargs):
+        stats = Mirror(self.client, directory, max_workers=workers).run()
+        return (f"Mirrored {plural(stats['users'], 'user', 'users')}, "
+                f"{plural(stats['groups'], 'group', 'groups')}, "
+                f"{plural(stats['projects'], 'project', 'projects')} and "
+                f"{plural(stats['batches'], 'batch', 'batches')} to {directory} "
+                f"({stats['downloaded']} changed)")
+
+
+class ApplyWrapper(Wrapper):
+    def apply(self, file, plan, workers, **kwargs):
+        applier = Applier(self.client, max_workers=workers)
+        actions = applier.plan(load_state(file))
+        lines = [f"Warning: {warning}" for warning in applier.warnings]
+        lines.extend(action['description'] for action in actions)
+        if plan:
+            lines.append(f"Plan: {plural(len(actions), 'change', 'changes')}")
+        else:
+            count = applier.execute(actions)
+            lines.append(f"Applied {plural(count, 'change', 'changes')}")
+        return '\n'.join(lines)
+
+
+class AuditWrapper(Wrapper):
+    def audit(self, user, pid, bid, index, output, workers, **kwargs):
+        if not (user or pid or bid or output):
+            raise TurkleClientException("--user, --pid, --bid or --output must be set for 'audit'")
+        if index:
+            audit = AccessAudit.load(index)
+        else:
+            audit = AccessAudit(self.client, max_workers=workers)
+            audit.build()
+        if output:
+            audit.save(output)
+        if user:
+            return audit.access_for_user(user)
+        if bid:
+            return {'batch': int(bid), 'users': audit.users_for_batch(bid)}
+        if pid:
+            return {'project': int(pid), 'users': audit.users_for_project(pid)}
+        return (f"Access index for {plural(len(audit.usernames), 'user', 'users')}, "
+                f"{plural(len(audit.projects), 'project', 'projects')} and "
+                f"{plural(len(audit.batches), 'batch', 'batches')} written to {output}")